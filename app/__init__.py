@@ -1,18 +1,177 @@
-from flask import Flask, current_app
-from flask_cors import CORS
-from flask_socketio import SocketIO
-from dotenv import load_dotenv
+import os
 
-socketio = SocketIO()
-load_dotenv()
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from flask import Flask
+    from flask_socketio import SocketIO
 
-def create_app(config_object="config.DevelopmentConfig") -> Flask:
+    socketio: SocketIO
+
+# Background loops read their settings from app.rooms each tick, so one of
+# each per process is enough however many times create_app runs
+_started: set = set()
+
+
+def _socketio() -> "SocketIO":
+    # Flask-SocketIO (and with it Flask and python-socketio) is only imported
+    # once the server is needed, so tools importing app.utilities and the
+    # like start quickly
+    server = globals().get("socketio")
+    if server is None:
+        from flask_socketio import SocketIO
+
+        globals()["socketio"] = server = SocketIO()
+    return server
+
+
+def __getattr__(name: str):
+    if name == "socketio":
+        return _socketio()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _load_dotenv() -> None:
+    # Same lookup as python-dotenv's (the nearest .env above this package),
+    # without importing it when there is nothing to load
+    here = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(here, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(here)
+        if parent == here:
+            return
+        here = parent
+
+
+def _start_once(target, *args) -> None:
+    if target not in _started:
+        _started.add(target)
+        _socketio().start_background_task(target, *args)
+
+
+def create_app(config_object="config.DevelopmentConfig", background: bool = True) -> "Flask":
+    """Build the Flask app and configure room state.
+
+    ``background=False`` skips starting the update, sweeper, grace and
+    snapshot loops, for a server that runs them itself (app.asgi). Settings
+    are read from the environment (and a .env file) here, not at import,
+    and a missing or invalid one raises config.ConfigError. The validated
+    Settings build everything below and stay on ``app.extensions["settings"]``;
+    their values are copied into ``app.config`` too, which handlers read per
+    request so a test can change one for its app.
+    """
+    from flask import Flask
+    from flask_cors import CORS
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    from config import Settings
+
+    _load_dotenv()
+    socketio = _socketio()
     app: Flask = Flask(__name__)
     app.config.from_object(config_object)
+    settings = Settings.load(app.config)
+    app.config.from_mapping(settings.items())
+    app.extensions["settings"] = settings
+
+    from . import rooms
+    from .delivery import Coalescer
+    from .journal import EventJournal
+    from .metrics import Metrics, bp as metrics_bp
+    from .packets import MsgPackCodec, Packet, json_module
+    from .provision import bp as provision_bp
+    from .ratelimit import RateLimiter, TokenBuckets
+    from .snapshot import SnapshotLog
+    from .store import MemoryRoomStore, ShardedRoomStore, SqliteRoomStore, create_store
+    from .sweeper import AwaySeats, RoomSweeper
+    from .utilities import set_token_key
 
     with app.app_context():
-        CORS(app, origins=[current_app.config["FRONTEND_URL"]])
-        socketio.init_app(app, cors_allowed_origins=current_app.config["FRONTEND_URL"])
+        CORS(app, origins=[settings.FRONTEND_URL])
+        socketio.init_app(
+            app,
+            cors_allowed_origins=settings.FRONTEND_URL,
+            message_queue=settings.SOCKETIO_MESSAGE_QUEUE,
+            serializer=Packet,
+            json=json_module(settings.SOCKETIO_JSON),
+        )
+        if settings.TRUSTED_PROXIES:
+            # Outside the Socket.IO middleware, so sockets see the client too
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=settings.TRUSTED_PROXIES)
+        app.register_blueprint(provision_bp)
+        app.register_blueprint(metrics_bp)
+        if settings.METRICS_ENABLED:
+            rooms.METRICS = Metrics()
+            rooms.METRICS.instrument(socketio.server.eio)
+        else:
+            rooms.METRICS = None
+        # Installed over the metrics so they count what goes on the wire
+        if settings.SOCKETIO_MSGPACK:
+            MsgPackCodec().install(socketio.server)
+        if settings.RATE_LIMIT_ENABLED:
+            rooms.LIMITER = RateLimiter(
+                settings.RATE_LIMITS_SID,
+                settings.RATE_LIMITS_IP if settings.RATE_LIMIT_BY_ADDRESS else {},
+                settings.RATE_LIMIT_MAX_KEYS,
+            )
+        else:
+            rooms.LIMITER = None
+        join_rate = settings.ROOM_JOIN_RATE
+        if join_rate:
+            rooms.JOINS = TokenBuckets(join_rate, settings.ROOM_JOIN_BURST)
+            rooms.ADMITTED = Coalescer(settings.ROOM_ADMISSION_WINDOW)
+        else:
+            rooms.JOINS = None
+            rooms.ADMITTED = Coalescer()
+        if background and rooms.ADMITTED.window:
+            _start_once(rooms.run_admitted, app)
+        journal_path = settings.JOURNAL_PATH
+        if journal_path:
+            rooms.JOURNAL = EventJournal(journal_path, settings.JOURNAL_INTERVAL)
+            if background and rooms.JOURNAL.interval:
+                _start_once(rooms.run_journal)
+        else:
+            rooms.JOURNAL = None
+        snapshot_path = settings.SNAPSHOT_PATH
+        rooms.STORE = create_store(
+            settings.ROOM_STORE,
+            settings.ROOM_STORE_PATH,
+            track_changes=bool(snapshot_path),
+            shards=settings.ROOM_SHARDS,
+            worker=settings.ROOM_WORKER,
+            workers=settings.ROOM_WORKERS,
+        )
+        rooms.UPDATES = Coalescer(settings.ROOM_UPDATE_WINDOW)
+        if background and rooms.UPDATES.window:
+            _start_once(rooms.run_room_updates)
+        rooms.SWEEPER = RoomSweeper(
+            settings.ROOM_TTL,
+            settings.ROOM_FINISHED_TTL,
+            settings.ROOM_SWEEP_INTERVAL,
+        )
+        if background and rooms.SWEEPER.interval:
+            _start_once(rooms.run_sweeper)
+        rooms.AWAY = AwaySeats(settings.RECONNECT_GRACE)
+        set_token_key(settings.SEAT_TOKEN_KEY)
+        if isinstance(rooms.STORE, SqliteRoomStore):
+            # Other workers may have died holding rooms and connections
+            rooms.adopt_stored_rooms()
+        if background and rooms.AWAY.grace:
+            _start_once(rooms.run_away_seats, app)
+        # Snapshots only make sense for the in-memory store
+        if snapshot_path and isinstance(rooms.STORE, (MemoryRoomStore, ShardedRoomStore)):
+            rooms.SNAPSHOTS = SnapshotLog(
+                snapshot_path, settings.SNAPSHOT_INTERVAL
+            )
+            rooms.restore_rooms()
+            if background:
+                _start_once(rooms.run_snapshots)
+        else:
+            rooms.SNAPSHOTS = None
 
     return app
@@ -0,0 +1,135 @@
+"""ASGI entry point serving the same events on python-socketio's AsyncServer.
+
+    uvicorn --factory app.asgi:create_asgi_app
+
+One asyncio process holds many idle websockets far more cheaply than a
+thread per connection. Handlers are the ones in app.rooms, run unchanged
+inside a Flask request context while app.transport queues what they send;
+the queue is awaited in order once the handler returns. Handlers never
+await, so each event still applies to the rooms in one step. HTTP routes
+(provisioning, metrics) are mounted too when asgiref is installed.
+Background ticks that write files run on a worker thread instead, and the
+sqlite store is refused: its writes wait on other workers' locks.
+"""
+
+import asyncio
+import logging
+
+import flask
+import socketio as python_socketio
+
+from config import ConfigError
+
+from . import create_app, rooms, socketio, transport
+from .packets import MsgPackCodec, Packet, json_module
+
+log = logging.getLogger(__name__)
+
+
+async def _flush(sio: python_socketio.AsyncServer, outbox: list[tuple]) -> None:
+    for op, *args in outbox:
+        if op == "emit":
+            event, data, to, skip_sid = args
+            await sio.emit(event, data, to=to, skip_sid=skip_sid)
+        elif op == "enter":
+            await sio.enter_room(*args)
+        elif op == "leave":
+            await sio.leave_room(*args)
+        elif op == "close":
+            await sio.close_room(*args)
+
+
+def _adapt(flask_app: flask.Flask, sio: python_socketio.AsyncServer, event: str, handler):
+    async def on_event(sid, *args):
+        environ = sio.get_environ(sid)
+        if environ is None:
+            return
+        with transport.buffered() as outbox:
+            with flask_app.request_context(environ):
+                flask.request.sid = sid
+                flask.request.namespace = "/"
+                handler(*args)
+        await _flush(sio, outbox)
+
+    return on_event
+
+
+def _loops() -> list[tuple]:
+    """(interval, tick, in_thread) for each loop the Flask server runs as a thread.
+
+    ``in_thread`` ticks encode and write files; they take the same room locks
+    as handlers, so they are safe off the event loop and would stall it on.
+    """
+    return [
+        (lambda: rooms.UPDATES.window, rooms.flush_room_updates, False),
+        (lambda: rooms.ADMITTED.window, rooms.flush_admitted, False),
+        (lambda: rooms.SWEEPER.interval, rooms.sweep_rooms, False),
+        (lambda: min(rooms.AWAY.grace, 1.0), rooms.release_away_seats, False),
+        (lambda: rooms.SNAPSHOTS.interval if rooms.SNAPSHOTS else 0, rooms.snapshot_rooms, True),
+        (lambda: rooms.JOURNAL.interval if rooms.JOURNAL else 0, rooms.flush_journal, True),
+    ]
+
+
+def _tick(flask_app, tick) -> list[tuple]:
+    with transport.buffered() as outbox:
+        with flask_app.app_context():
+            tick()
+    return outbox
+
+
+async def _run_loop(flask_app, sio, interval, tick, in_thread=False) -> None:
+    while interval():
+        await asyncio.sleep(interval())
+        try:
+            if in_thread:
+                outbox = await asyncio.to_thread(_tick, flask_app, tick)
+            else:
+                outbox = _tick(flask_app, tick)
+        except Exception:
+            log.exception("%s failed; will retry", tick.__name__)
+            continue
+        await _flush(sio, outbox)
+
+
+def create_asgi_app(config_object="config.DevelopmentConfig"):
+    flask_app = create_app(config_object, background=False)
+    settings = flask_app.extensions["settings"]
+    if settings.ROOM_STORE == "sqlite":
+        # Handlers run on the event loop, and BEGIN IMMEDIATE can wait out
+        # another worker's write for the whole busy timeout
+        raise ConfigError("ROOM_STORE=sqlite is not supported by the ASGI server")
+
+    queue = settings.SOCKETIO_MESSAGE_QUEUE
+    sio = python_socketio.AsyncServer(
+        async_mode="asgi",
+        cors_allowed_origins=settings.FRONTEND_URL,
+        client_manager=python_socketio.AsyncRedisManager(queue) if queue else None,
+        serializer=Packet,
+        json=json_module(settings.SOCKETIO_JSON),
+    )
+    for event, handler, namespace in socketio.handlers:
+        # Flask-SocketIO's wrapper keeps the handler, every _socket_event layer
+        # included, as __wrapped__
+        sio.on(event, _adapt(flask_app, sio, event, handler.__wrapped__), namespace=namespace)
+    if rooms.METRICS is not None:
+        rooms.METRICS.instrument(sio.eio)
+    if settings.SOCKETIO_MSGPACK:
+        MsgPackCodec().install(sio)
+
+    async def start_loops() -> None:
+        for interval, tick, in_thread in _loops():
+            if interval():
+                sio.start_background_task(_run_loop, flask_app, sio, interval, tick, in_thread)
+
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        http = None
+    else:
+        http = WsgiToAsgi(flask_app)
+
+    asgi_app = python_socketio.ASGIApp(sio, http, on_startup=start_loops)
+    asgi_app.sio = sio
+    asgi_app.flask_app = flask_app
+    return asgi_app
+
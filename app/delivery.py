@@ -0,0 +1,81 @@
+import threading
+
+from collections.abc import Callable, Iterable
+
+from socketio import PubSubManager, packet
+
+from . import socketio
+
+
+# ------------ Bulk delivery ------------
+def emit_each(event: str, payloads: Iterable[tuple[str, dict]], namespace: str = "/") -> int:
+    """Send a different payload to each sid in one pass.
+
+    ``emit(..., to=sid)`` goes through Flask-SocketIO's request lookups and the
+    manager's room resolution for every message. Here each payload is encoded
+    once and written straight to the sid's Engine.IO transport. With a message
+    queue the sid may live on another worker, so it falls back to regular
+    emits there. Returns how many packets were sent.
+    """
+    server = socketio.server
+    manager = server.manager
+
+    if isinstance(manager, PubSubManager):
+        count = 0
+        for sid, data in payloads:
+            socketio.emit(event, data, to=sid, namespace=namespace)
+            count += 1
+        return count
+
+    eio_sid_for = manager.eio_sid_from_sid
+    packet_class = server.packet_class
+    send = server._send_packet
+
+    count = 0
+    for sid, data in payloads:
+        eio_sid = eio_sid_for(sid, namespace)
+        if eio_sid is None:
+            continue
+        send(eio_sid, packet_class(packet.EVENT, namespace=namespace, data=[event, data]))
+        count += 1
+    return count
+
+
+# ------------ Coalescing ------------
+class Coalescer:
+    """Collapses repeated broadcast requests into one send per key per tick.
+
+    With ``window`` at 0 nothing is queued and callers send immediately.
+    Otherwise ``request`` only marks the key dirty and ``flush`` (run every
+    ``window`` seconds by a background task, or called directly in tests)
+    sends each dirty key once with whatever state it has by then.
+    """
+
+    def __init__(self, window: float = 0.0) -> None:
+        self.window = window
+        self.requested = 0
+        self.sent = 0
+        self._pending: dict[str, None] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def coalesced(self) -> int:
+        return self.requested - self.sent - len(self._pending)
+
+    def request(self, key: str) -> bool:
+        """Queue ``key``; False means coalescing is off and the caller sends now."""
+        self.requested += 1
+        if not self.window:
+            self.sent += 1
+            return False
+        with self._lock:
+            self._pending[key] = None
+        return True
+
+    def flush(self, send: Callable[[str], None]) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for key in pending:
+            send(key)
+        self.sent += len(pending)
+        return len(pending)
@@ -0,0 +1,164 @@
+import base64
+import json
+import struct
+import threading
+import time
+import zlib
+
+from collections.abc import Iterator
+from typing import NamedTuple
+
+
+# ------------ Binary record format ------------
+# File:    MAGIC, then records
+# Record:  payload length (u32) | crc32 of payload (u32) | payload
+# Payload: time (f64) | event | sid | rid | args
+# Strings are a u16 byte length followed by UTF-8, except args: the event's
+# arguments as a JSON array behind a u32 length. ``rid`` is the sid's room
+# once the handler returned ("" for none), so a replay can map the room
+# codes it is handed onto the ones the recording used. Seat tokens in the
+# args are blanked; binary args are kept as base64 text, and anything else
+# JSON cannot hold as its repr.
+MAGIC = b"SSJRNL1\n"
+REDACTED = "<redacted>"
+
+_HEADER = struct.Struct("<II")
+_TIME = struct.Struct("<d")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+
+
+class Entry(NamedTuple):
+    time: float
+    event: str
+    sid: str
+    rid: str
+    args: list
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    data = s.encode()
+    out += _U16.pack(len(data))
+    out += data
+
+
+def _get_str(buf: memoryview, pos: int) -> tuple[str, int]:
+    (n,) = _U16.unpack_from(buf, pos)
+    pos += 2
+    return str(buf[pos : pos + n], "utf-8"), pos + n
+
+
+def _jsonable(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode()
+    return repr(value)
+
+
+def _redact(arg):
+    # A seat token reclaims a seat, so it never reaches the file
+    if isinstance(arg, dict) and "token" in arg:
+        return {**arg, "token": REDACTED}
+    return arg
+
+
+def encode_entry(entry: Entry) -> bytes:
+    out = bytearray(_TIME.pack(entry.time))
+    _put_str(out, entry.event)
+    _put_str(out, entry.sid)
+    _put_str(out, entry.rid)
+    args = json.dumps(entry.args, separators=(",", ":"), default=_jsonable).encode()
+    out += _U32.pack(len(args))
+    out += args
+    return _HEADER.pack(len(out), zlib.crc32(out)) + out
+
+
+def _decode_entry(buf: memoryview) -> Entry:
+    (t,) = _TIME.unpack_from(buf, 0)
+    event, pos = _get_str(buf, _TIME.size)
+    sid, pos = _get_str(buf, pos)
+    rid, pos = _get_str(buf, pos)
+    (n,) = _U32.unpack_from(buf, pos)
+    pos += 4
+    return Entry(t, event, sid, rid, json.loads(bytes(buf[pos : pos + n])))
+
+
+def read_journal(path: str) -> Iterator[Entry]:
+    """Yield a journal's entries in order, stopping at a torn or corrupt one."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        return
+    buf = memoryview(data)
+    pos = len(MAGIC)
+    while pos + _HEADER.size <= len(buf):
+        length, crc = _HEADER.unpack_from(buf, pos)
+        start = pos + _HEADER.size
+        payload = buf[start : start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield _decode_entry(payload)
+        pos = start + length
+
+
+# ------------ Append-only journal ------------
+class EventJournal:
+    """Every socket event handled, as an append-only log of records.
+
+    ``record`` runs inside handlers, so it only encodes the entry into an
+    in-memory buffer; ``flush`` (every ``interval`` seconds from a background
+    task) swaps the buffer out and appends it to the file in one write. A
+    crash loses at most the last interval. Only client events are kept:
+    what the sweeper and grace timers do is left to the replaying server.
+
+    A failed write is cut back off the file and its records go back in the
+    buffer for the next flush. While writes keep failing the buffer stops
+    at ``MAX_BUFFERED`` records and later ones are counted in ``dropped``.
+    """
+
+    MAX_BUFFERED = 100_000
+
+    def __init__(self, path: str, interval: float = 1.0) -> None:
+        self.path = path
+        self.interval = interval
+        self.records = 0
+        self.dropped = 0
+        self._buffer: list[bytes] = []
+        self._lock = threading.Lock()
+
+    def record(self, event: str, sid: str, rid: str | None, args: tuple) -> None:
+        args = [_redact(arg) for arg in args]
+        data = encode_entry(Entry(time.time(), event, sid, rid or "", args))
+        with self._lock:
+            if len(self._buffer) < self.MAX_BUFFERED:
+                self._buffer.append(data)
+            else:
+                self.dropped += 1
+
+    def flush(self) -> int:
+        """Write buffered records out; returns how many."""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return 0
+        try:
+            with open(self.path, "ab") as f:
+                start = f.tell()
+                try:
+                    if start == 0:
+                        f.write(MAGIC)
+                    f.write(b"".join(records))
+                    f.flush()
+                except BaseException:
+                    # A torn record would hide everything appended after it
+                    f.truncate(start)
+                    raise
+        except BaseException:
+            with self._lock:
+                self._buffer[:0] = records
+                overflow = len(self._buffer) - self.MAX_BUFFERED
+                if overflow > 0:
+                    self.dropped += overflow
+                    del self._buffer[self.MAX_BUFFERED :]
+            raise
+        self.records += len(records)
+        return len(records)
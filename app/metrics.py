@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+from bisect import bisect_left
+
+from engineio import packet
+from flask import Blueprint, Response, current_app, jsonify
+
+from . import rooms
+from .store import ShardedRoomStore
+from .utilities import RoomCodeAllocator, code_allocator
+
+
+bp = Blueprint("metrics", __name__)
+
+# Handler latency bucket bounds in seconds (Prometheus ``le`` labels)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+# ------------ Instruments ------------
+class Histogram:
+    """Event count, latency sum and per-bucket counts for one handler."""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Metrics:
+    """In-process counters read by ``GET /metrics``.
+
+    Recording is a bisect plus a few plain adds with no lock: a lock alone
+    costs more than the whole per-event budget, and losing an increment
+    takes a thread switch between its read and write, which is rare enough
+    for monitoring. When metrics are off ``rooms.METRICS`` is None and
+    nothing here runs.
+    """
+
+    def __init__(self) -> None:
+        self.events: dict[str, Histogram] = {}
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+
+    def observe(self, event: str, seconds: float) -> None:
+        histogram = self.events.get(event)
+        if histogram is None:
+            with self._lock:
+                histogram = self.events.setdefault(event, Histogram())
+        histogram.observe(seconds)
+
+    def count_sent(self, data) -> None:
+        self.sent_messages += 1
+        if isinstance(data, str) and not data.isascii():
+            data = data.encode()  # bytes on the wire, not characters
+        self.sent_bytes += len(data)
+
+    def instrument(self, eio) -> None:
+        """Count every Engine.IO message ``eio`` sends and its size.
+
+        Emits, broadcasts and ``emit_each`` all end in ``send_packet``, so
+        that is the one method wrapped, sync or async alike.
+        """
+        send_packet = eio.send_packet
+
+        if asyncio.iscoroutinefunction(send_packet):
+
+            async def counted_send_packet(sid, pkt):
+                if pkt.packet_type == packet.MESSAGE:
+                    self.count_sent(pkt.data)
+                return await send_packet(sid, pkt)
+
+        else:
+
+            def counted_send_packet(sid, pkt):
+                if pkt.packet_type == packet.MESSAGE:
+                    self.count_sent(pkt.data)
+                return send_packet(sid, pkt)
+
+        eio.send_packet = counted_send_packet
+
+
+# ------------ Exposition ------------
+@bp.get("/metrics")
+def metrics():
+    if rooms.METRICS is None:
+        return jsonify({"message": "Metrics disabled"}), 404
+    allocator = code_allocator(current_app.config["ROOM_ID_LENGTH"])
+    return Response(render(rooms.METRICS, allocator), mimetype="text/plain; version=0.0.4")
+
+
+def render(m: Metrics, allocator: RoomCodeAllocator):
+    """Prometheus text format, one family at a time."""
+    yield "# TYPE secret_santa_event_seconds histogram\n"
+    for event, h in sorted(m.events.items()):
+        running = 0
+        for bound, n in zip(BUCKETS, h.counts):
+            running += n
+            yield f'secret_santa_event_seconds_bucket{{event="{event}",le="{bound}"}} {running}\n'
+        yield f'secret_santa_event_seconds_bucket{{event="{event}",le="+Inf"}} {h.count}\n'
+        yield f'secret_santa_event_seconds_sum{{event="{event}"}} {h.total}\n'
+        yield f'secret_santa_event_seconds_count{{event="{event}"}} {h.count}\n'
+
+    counters = {
+        "secret_santa_sent_messages_total": m.sent_messages,
+        "secret_santa_sent_bytes_total": m.sent_bytes,
+        "secret_santa_rooms_evicted_total": rooms.SWEEPER.evicted,
+        "secret_santa_away_seats_released_total": rooms.AWAY.released,
+        "secret_santa_room_updates_coalesced_total": rooms.UPDATES.coalesced,
+        "secret_santa_joins_batched_total": rooms.ADMITTED.requested,
+        "secret_santa_rate_limited_total": rooms.LIMITER.rejected if rooms.LIMITER else 0,
+        "secret_santa_journal_records_total": rooms.JOURNAL.records if rooms.JOURNAL else 0,
+        # Room code draws that hit a live room; climbing means codes are too short
+        "secret_santa_room_code_collisions_total": allocator.collisions,
+    }
+    for name, value in counters.items():
+        yield f"# TYPE {name} counter\n{name} {value}\n"
+
+    gauges = {
+        "secret_santa_rooms": len(rooms.STORE),
+        "secret_santa_connected_participants": rooms.STORE.sid_count(),
+        "secret_santa_away_seats": len(rooms.AWAY),
+        # Share of ROOM_ID_LENGTH's keyspace in use; past a few % grow it
+        "secret_santa_room_code_occupancy": allocator.occupancy(len(rooms.STORE)),
+    }
+    for name, value in gauges.items():
+        yield f"# TYPE {name} gauge\n{name} {value}\n"
+
+    if isinstance(rooms.STORE, ShardedRoomStore):
+        stats = rooms.STORE.stats()
+        yield "# TYPE secret_santa_shard_rooms gauge\n"
+        for i, shard in enumerate(stats):
+            yield f'secret_santa_shard_rooms{{shard="{i}"}} {shard["rooms"]}\n'
+        yield "# TYPE secret_santa_shard_ops_total counter\n"
+        for i, shard in enumerate(stats):
+            yield f'secret_santa_shard_ops_total{{shard="{i}"}} {shard["ops"]}\n'
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+from engineio import packet as eio_packet
+from socketio import packet
+
+from .utilities import Encoded
+
+
+# ------------ Packet serialization ------------
+class Packet(packet.Packet):
+    """Socket.IO packet that sends ``Encoded`` payloads without re-encoding.
+
+    python-socketio walks every list item and dict value looking for bytes
+    and then JSON-encodes the whole event for each emit. An ``Encoded``
+    payload already holds its JSON and never holds bytes, so both steps are
+    skipped for it and only the event name is encoded.
+    """
+
+    @classmethod
+    def data_is_binary(cls, data) -> bool:
+        if isinstance(data, Encoded):
+            return False
+        return super().data_is_binary(data)
+
+    def encode(self):
+        data = self.data
+        if (
+            self.packet_type == packet.EVENT
+            and self.id is None
+            and self.namespace in (None, "/")
+            and isinstance(data, list)
+            and len(data) == 2
+            and isinstance(data[1], Encoded)
+        ):
+            return f"{packet.EVENT}[{self.json.dumps(data[0])},{data[1].json}]"
+        return super().encode()
+
+
+class OrjsonModule:
+    """``dumps`` / ``loads`` backed by orjson, for ``SocketIO(json=...)``."""
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj, **kwargs) -> str:
+        # orjson output is always compact, the only separators we ask for
+        return self._orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+
+def json_module(name: str):
+    """The JSON module for packets: ``"json"`` (stdlib) or ``"orjson"``."""
+    if name == "json":
+        return json
+    if name == "orjson":
+        return OrjsonModule()
+    raise ValueError(f"Unknown JSON encoder: {name}")
+
+
+# ------------ MessagePack clients ------------
+class MsgPackCodec:
+    """Speaks MessagePack to the clients that connect with it, JSON to the rest.
+
+    A client using socket.io-msgpack-parser sends even its CONNECT packet as
+    a binary frame, while a JSON client only ever sends binary frames as
+    attachments announced by a text packet. So the first message on each
+    connection picks its codec with no extra client setup. The server still
+    builds every packet as JSON text; on the way out to a MessagePack client
+    it is re-encoded, once per packet however many such clients a broadcast
+    reaches, and on the way in it is turned into the text python-socketio
+    expects.
+    """
+
+    def __init__(self) -> None:
+        import msgpack
+
+        self._msgpack = msgpack
+        self.sids: set[str] = set()
+        self._last: tuple = (None, None)
+
+    def encode(self, eio_pkt):
+        """``eio_pkt`` for a MessagePack client: the same packet, binary."""
+        if eio_pkt.packet_type != eio_packet.MESSAGE or not isinstance(eio_pkt.data, str):
+            return eio_pkt
+        last, binary = self._last
+        if last is eio_pkt:
+            # A broadcast hands every recipient the same packet object
+            return binary
+        pkt = Packet(encoded_packet=eio_pkt.data)
+        fields = {"type": pkt.packet_type, "data": pkt.data, "nsp": pkt.namespace or "/"}
+        if pkt.id is not None:
+            fields["id"] = pkt.id
+        binary = eio_packet.Packet(eio_packet.MESSAGE, data=self._msgpack.dumps(fields))
+        self._last = (eio_pkt, binary)
+        return binary
+
+    def decode(self, sid: str, data, pending) -> list:
+        """The text messages python-socketio should see for ``data`` from ``sid``.
+
+        ``pending`` holds the sids with binary attachments still to come,
+        whose bytes are JSON attachments rather than MessagePack.
+        """
+        if sid not in self.sids:
+            if not isinstance(data, bytes) or sid in pending:
+                return [data]
+            self.sids.add(sid)
+        fields = self._msgpack.loads(data)
+        encoded = Packet(
+            fields["type"], data=fields.get("data"), namespace=fields.get("nsp"), id=fields.get("id")
+        ).encode()
+        return encoded if isinstance(encoded, list) else [encoded]
+
+    def install(self, server) -> None:
+        """Put the codec between python-socketio ``server`` and its Engine.IO."""
+        eio = server.eio
+        on_message = eio.handlers["message"]
+        on_disconnect = eio.handlers["disconnect"]
+        send_packet = eio.send_packet
+
+        if asyncio.iscoroutinefunction(send_packet):
+
+            async def message(sid, data):
+                for text in self.decode(sid, data, server._binary_packet):
+                    await on_message(sid, text)
+
+            async def disconnect(sid, *args):
+                self.sids.discard(sid)
+                return await on_disconnect(sid, *args)
+
+            async def send(sid, pkt):
+                await send_packet(sid, self.encode(pkt) if sid in self.sids else pkt)
+
+        else:
+
+            def message(sid, data):
+                for text in self.decode(sid, data, server._binary_packet):
+                    on_message(sid, text)
+
+            def disconnect(sid, *args):
+                self.sids.discard(sid)
+                return on_disconnect(sid, *args)
+
+            def send(sid, pkt):
+                send_packet(sid, self.encode(pkt) if sid in self.sids else pkt)
+
+        eio.on("message", message)
+        eio.on("disconnect", disconnect)
+        eio.send_packet = send
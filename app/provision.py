@@ -0,0 +1,147 @@
+import json
+import secrets
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from . import rooms
+from .utilities import Participant, Room, code_allocator, seat_token
+
+
+bp = Blueprint("provision", __name__)
+
+
+# ------------ Bulk room provisioning ------------
+@bp.post("/rooms")
+def provision():
+    """Create many rooms in one request (operator token required).
+
+    The body is either ``{"rooms": [spec, ...]}`` or ``{"count": n, **spec}``
+    for n identical rooms, where a spec is ``{"host": name, "participants":
+    [name, ...]}``. Every seat starts away; its owner claims it from a socket
+    with ``join_room`` plus the seat's token. Rooms are streamed back as
+    NDJSON, one ``{"room_id", "host_name", "tokens": {name: token}}`` per line.
+    """
+    token = current_app.config["PROVISION_TOKEN"]
+    if not token:
+        return jsonify({"message": "Provisioning disabled"}), 404
+    auth = request.headers.get("Authorization", "")
+    if not secrets.compare_digest(auth.encode(), f"Bearer {token}".encode()):
+        return jsonify({"message": "Unauthorized"}), 401
+
+    limit = current_app.config["PROVISION_MAX_ROOMS"]
+    data = request.get_json(silent=True)
+    specs = _parse_specs(data, limit) if isinstance(data, dict) else None
+    if specs is None:
+        return jsonify({"message": "Invalid rooms"}), 400
+
+    if not specs or len(specs) > limit:
+        return jsonify({"message": f"Between 1 and {limit} rooms per request"}), 400
+
+    max_rooms = current_app.config["ROOM_MAX_ROOMS"]
+    if max_rooms and len(rooms.STORE) + len(specs) > max_rooms:
+        return jsonify({"message": "Too many rooms"}), 409
+
+    max_members = current_app.config["ROOM_MAX_MEMBERS"]
+    if max_members and any(len(names) > max_members for names in specs):
+        return jsonify({"message": f"At most {max_members} participants per room"}), 400
+
+    created = provision_rooms(specs)
+    if created is None:
+        return jsonify({"message": "No room codes available"}), 503
+
+    return Response(_ndjson(created), mimetype="application/x-ndjson")
+
+
+def provision_rooms(specs: list[list[str]]) -> dict[str, Room] | None:
+    """Insert one room per name list (host first); None if codes run out."""
+    allocator = code_allocator(current_app.config["ROOM_ID_LENGTH"])
+    if len(rooms.STORE) + len(specs) > allocator.keyspace:
+        return None
+
+    batch: dict[str, Room] = {}
+    for names in specs:
+        room = Room(host=Participant(sid=None, name=names[0]))
+        for name in names[1:]:
+            room.add_member(Participant(sid=None, name=name))
+        rid = _free_code(allocator, batch)
+        if rid is None:
+            return None
+        batch[rid] = room
+
+    # Another request may have taken some codes since; move those rooms
+    taken = rooms.STORE.insert_many(batch)
+    for _ in range(allocator.MAX_ATTEMPTS):
+        if not taken:
+            break
+        retry = {}
+        for rid in taken:
+            new_rid = _free_code(allocator, batch)
+            if new_rid is None:
+                return None
+            retry[new_rid] = batch.pop(rid)
+        batch.update(retry)
+        taken = rooms.STORE.insert_many(retry)
+    if taken:
+        return None
+
+    # Seats wait for their owners until the room's TTL, not a reconnect
+    # grace period: nobody has connected to them yet
+    for rid, room in batch.items():
+        rooms.SWEEPER.track(rid, room)
+    return batch
+
+
+def _free_code(allocator, batch: dict[str, Room]) -> str | None:
+    for _ in range(allocator.MAX_ATTEMPTS):
+        try:
+            rid = allocator.allocate(rooms.STORE, rooms.STORE.owns)
+        except RuntimeError:
+            return None
+        if rid not in batch:
+            return rid
+    return None
+
+
+def _parse_specs(data: dict, limit: int) -> list[list[str]] | None:
+    """The name list per room; past ``limit`` rooms only one extra is kept."""
+    if "rooms" in data:
+        raw = data["rooms"]
+        if not isinstance(raw, list):
+            return None
+        specs = [_parse_spec(spec) for spec in raw]
+        return None if None in specs else specs
+
+    count = data.get("count")
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        return None
+    names = _parse_spec(data)
+    # Enough to fail the limit check without building a huge list first
+    return None if names is None else [names] * min(count, limit + 1)
+
+
+def _parse_spec(spec) -> list[str] | None:
+    """Host name first, then the other pre-registered names, deduplicated."""
+    if not isinstance(spec, dict):
+        return None
+    host = spec.get("host")
+    participants = spec.get("participants", [])
+    if not isinstance(host, str) or not host.strip() or not isinstance(participants, list):
+        return None
+    if not all(isinstance(name, str) and name.strip() for name in participants):
+        return None
+    longest = current_app.config["NAME_MAX_LENGTH"]
+    if any(len(name.strip()) > longest for name in [host, *participants]):
+        return None
+
+    names = dict.fromkeys([host.strip()] + [name.strip() for name in participants])
+    return list(names)
+
+
+def _ndjson(created: dict[str, Room]):
+    for rid, room in created.items():
+        line = {
+            "room_id": rid,
+            "host_name": room.host.name,
+            "tokens": {p.name: seat_token(rid, room, p) for p in room.participants},
+        }
+        yield json.dumps(line, separators=(",", ":")) + "\n"
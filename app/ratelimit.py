@@ -0,0 +1,82 @@
+import threading
+import time
+
+from collections.abc import Mapping
+
+
+# ------------ Token buckets ------------
+class TokenBuckets:
+    """Token buckets sharing one ``rate`` (per second) and ``burst``.
+
+    A bucket is just a ``(tokens, stamp)`` tuple and is topped up when its
+    key is next seen, so nothing runs per client between events. Every hit
+    re-inserts the key, keeping the dict ordered from least to most recently
+    seen. Buckets at the front that would have refilled are dropped as new
+    ones come in (a full bucket and no bucket behave the same), and past
+    ``max_keys`` the oldest go regardless. Keys such as addresses and room
+    codes are shared across sids, so each call holds a lock.
+    """
+
+    __slots__ = ("rate", "burst", "max_keys", "_buckets", "_lock")
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: str, now: float) -> bool:
+        buckets = self._buckets
+        with self._lock:
+            entry = buckets.pop(key, None)
+            if entry is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+            allowed = tokens >= 1
+            buckets[key] = (tokens - 1 if allowed else tokens, now)
+
+            # At most one eviction per call keeps this O(1)
+            oldest = next(iter(buckets))
+            tokens, stamp = buckets[oldest]
+            if len(buckets) > self.max_keys or tokens + (now - stamp) * self.rate >= self.burst:
+                del buckets[oldest]
+        return allowed
+
+
+class RateLimiter:
+    """Per-event limits for each sid and each remote address.
+
+    ``sid_limits`` and ``ip_limits`` map an event name to ``(rate, burst)``;
+    events missing from both are never limited. An event must pass both
+    buckets, and the address is only charged once the sid bucket allows it.
+    """
+
+    def __init__(
+        self,
+        sid_limits: Mapping[str, tuple[float, float]],
+        ip_limits: Mapping[str, tuple[float, float]],
+        max_keys: int = 100_000,
+    ) -> None:
+        self.rejected = 0
+        self._sid = {e: TokenBuckets(r, b, max_keys) for e, (r, b) in sid_limits.items()}
+        self._ip = {e: TokenBuckets(r, b, max_keys) for e, (r, b) in ip_limits.items()}
+
+    def __len__(self) -> int:
+        return sum(map(len, self._sid.values())) + sum(map(len, self._ip.values()))
+
+    def allow(self, event: str, sid: str, addr: str | None, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        by_sid = self._sid.get(event)
+        if by_sid is not None and not by_sid.allow(sid, now):
+            self.rejected += 1
+            return False
+        by_ip = self._ip.get(event)
+        if by_ip is not None and addr and not by_ip.allow(addr, now):
+            self.rejected += 1
+            return False
+        return True
@@ -1,136 +1,677 @@
+import functools
+import logging
+import secrets
+import time
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
 from flask import current_app, request
-from flask_socketio import emit, join_room
 
-from .utilities import Room, Participant, knuth_shuffle, new_code
+from .delivery import Coalescer
+from .journal import EventJournal
+from .ratelimit import RateLimiter, TokenBuckets
+from .snapshot import SnapshotLog, delete_record, put_record
+from .store import RoomStore, MemoryRoomStore
+from .sweeper import AwaySeats, RoomSweeper
+from .transport import (
+    close_room,
+    emit,
+    emit_each,
+    join_room,
+    leave_room,
+    start_background_task,
+)
+from .utilities import (
+    Draw,
+    Room,
+    Participant,
+    code_allocator,
+    constrained_derangement,
+    derangement,
+    seat_token,
+)
 from . import socketio
 
+if TYPE_CHECKING:
+    from .metrics import Metrics
+
+log = logging.getLogger(__name__)
+
+
+# ------------ Room state (swapped by create_app per config) ------------
+STORE: RoomStore = MemoryRoomStore()
+UPDATES = Coalescer()
+SWEEPER = RoomSweeper()
+AWAY = AwaySeats()
+SNAPSHOTS: SnapshotLog | None = None
+METRICS: "Metrics | None" = None
+LIMITER: RateLimiter | None = None
+# Per-room join rate; joins over it are announced in ADMITTED batches
+JOINS: TokenBuckets | None = None
+ADMITTED = Coalescer()
+JOURNAL: EventJournal | None = None
+
+
+# ------------ Handler layers ------------
+def _socket_event(handler):
+    """The layers every socket event handler runs in, outermost first.
+
+    Each costs one None check while its feature is off.
+    """
+    return _journaled(_rate_limited(_timed(_per_sid(handler))))
+
+
+def _journaled(handler):
+    """Record each event in the journal once handled, rate limited ones too."""
+    event = handler.__name__.removeprefix("on_")
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        journal = JOURNAL
+        if journal is None:
+            return handler(*args, **kwargs)
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            journal.record(event, request.sid, STORE.rid_for(request.sid), args)
+
+    return wrapper
+
+
+def _rate_limited(handler):
+    """Drop events over the rate limit before any room is looked at."""
+    event = handler.__name__.removeprefix("on_")
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if LIMITER is not None and not LIMITER.allow(
+            event, request.sid, request.remote_addr
+        ):
+            return emit("error", {"message": "Too many requests"})
+        return handler(*args, **kwargs)
+
+    return wrapper
+
+
+def _timed(handler):
+    """Report each event's handling time, lock wait included, to metrics."""
+    event = handler.__name__.removeprefix("on_")
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        metrics = METRICS
+        if metrics is None:
+            return handler(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            metrics.observe(event, time.perf_counter() - start)
+
+    return wrapper
+
+
+# ------------ Locking ------------
+def _per_sid(handler):
+    """Run ``handler`` holding the caller's sid lock.
 
-# ------------ In-memory state (RAM only) ------------
-ROOMS: dict[str, Room] = {}
-SID_TO_RID: dict[str, str] = {}
+    With async handlers one client's events can run concurrently, so this
+    stops e.g. two join_room calls from both passing the "Already in a room"
+    check.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        with STORE.sid_lock(request.sid):
+            return handler(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def _room_of(sid: str) -> Iterator[tuple[str | None, Room | None]]:
+    """Yield the sid's room id and room with that room's lock held."""
+    rid = STORE.rid_for(sid)
+    if not rid:
+        yield None, None
+        return
+    with STORE.room_lock(rid):
+        yield rid, STORE.get(rid)
 
 
 # ------------ Socket events ------------
 @socketio.on("create_room")
+@_socket_event
 def on_create_room(data) -> None:
-    if SID_TO_RID.get(request.sid):
+    if STORE.rid_for(request.sid):
         return emit("error", {"message": "Already in a room"})
 
     name = (data.get("name") or "").strip()
     if not name:
         return emit("error", {"message": "Name required"})
+    if len(name) > current_app.config["NAME_MAX_LENGTH"]:
+        return emit("error", {"message": "Name too long"})
 
-    host = Participant(sid=request.sid, name=name)
+    if _server_full():
+        return emit("error", {"message": "Server full"})
+
+    max_rooms = current_app.config["ROOM_MAX_ROOMS"]
+    if max_rooms and len(STORE) >= max_rooms:
+        sweep_rooms()
+        if len(STORE) >= max_rooms:
+            return emit("error", {"message": "Too many rooms"})
 
-    rid = new_code(current_app.config["ROOM_ID_LENGTH"])
+    host = Participant(sid=request.sid, name=name)
     room = Room(host=host)
 
-    ROOMS[rid] = room
-    SID_TO_RID[request.sid] = rid
+    rid = _insert_room(room)
+    if rid is None:
+        return emit("error", {"message": "No room codes available"})
+    STORE.bind(request.sid, rid)
+    SWEEPER.track(rid, room)
 
     join_room(rid)
-    emit(
-        "room_created",
-        {
-            "room_id": rid,
-            "participants": [p.name for p in room.participants],
-            "host_name": host.name,
-        },
-        to=rid,
-    )
+    emit("room_created", {**room.payload(rid), "token": seat_token(rid, room, host)})
 
 
 @socketio.on("join_room")
+@_socket_event
 def on_join_room(data) -> None:
     rid = (data.get("room_id") or "").strip()
     if not rid:
         return emit("error", {"message": "Room ID required"})
-    if rid not in ROOMS:
-        return emit("error", {"message": "Room not found"})
 
-    if SID_TO_RID.get(request.sid):
-        return emit("error", {"message": "Already in a room"})
+    with STORE.room_lock(rid):
+        room = STORE.get(rid)
+        if room is None:
+            return emit("error", {"message": "Room not found"})
+
+        if STORE.rid_for(request.sid):
+            return emit("error", {"message": "Already in a room"})
+
+        name = (data.get("name") or "").strip()
+        if not name:
+            return emit("error", {"message": "Name required"})
+        if len(name) > current_app.config["NAME_MAX_LENGTH"]:
+            return emit("error", {"message": "Name too long"})
+        seat = room.seat(name)
+        if seat is not None:
+            token = data.get("token")
+            if isinstance(token, str) and secrets.compare_digest(token, seat_token(rid, room, seat)):
+                return _reclaim_seat(rid, room, seat)
+            return emit("error", {"message": "Name already taken"})
+
+        max_members = current_app.config["ROOM_MAX_MEMBERS"]
+        if max_members and len(room) >= max_members:
+            return emit("room_full", {"room_id": rid, "message": "Room full"})
+        if _server_full():
+            return emit("room_full", {"room_id": rid, "message": "Server full"})
+
+        # A fresh generation, so tokens from an earlier seat named alike fail
+        participant = Participant(sid=request.sid, name=name, gen=room.new_gen())
+        room.add_member(participant)
+        room.touch()
+
+        STORE.save(rid, room)
+        STORE.bind(request.sid, rid)
+
+        join_room(rid)
+        emit("joined", {"name": name, "token": seat_token(rid, room, participant)})
+        if JOINS is not None and not JOINS.allow(rid, time.monotonic()):
+            # A burst: seated already, announced with the rest of the batch
+            ADMITTED.request(rid)
+            return
+        if _delta_protocol():
+            emit(
+                "participant_added",
+                {"name": name, "version": room.version},
+                to=rid,
+                skip_sid=request.sid,
+            )
+            emit("resync", room.payload(rid))
+            return
 
-    room = ROOMS[rid]
+        emit("joined", {"name": name}, to=rid, skip_sid=request.sid)
+        _broadcast_room_update(rid, room)
 
-    name = (data.get("name") or "").strip()
-    if not name:
-        return emit("error", {"message": "Name required"})
-    if name in [p.name for p in room.participants]:
-        return emit("error", {"message": "Name already taken"})
 
-    participant = Participant(sid=request.sid, name=name)
-    room.add_member(participant)
+@socketio.on("disconnect")
+@_socket_event
+def on_disconnect(reason=None) -> None:
+    # Takes python-socketio's reason so it runs once instead of failing
+    # and being retried without it
+    _drop_connection(request.sid)
 
-    SID_TO_RID[request.sid] = rid
 
-    join_room(rid)
-    emit("joined", {"name": name}, to=rid)
-    _broadcast_room_update(rid)
+def _drop_connection(sid: str) -> None:
+    """Unbind a connection that is gone, then hold or free its seat."""
+    with _room_of(sid) as (rid, room):
+        if not room:
+            return
+        else:
+            STORE.unbind(sid)
 
+        participant = room.get(sid)
+        if not participant:
+            return
+        room.touch()
 
-@socketio.on("disconnect")
-def on_disconnect() -> None:
+        if AWAY.grace:
+            # Keep the seat (and host) for a reconnect; nobody is told yet
+            room.rebind(participant.name, None)
+            STORE.save(rid, room)
+            AWAY.hold(rid, participant.name)
+            return
+
+        _remove_seat(rid, room, participant.name)
+
+
+@socketio.on("reveal")
+@_socket_event
+def on_reveal(data=None) -> None:
+    """Draw and deliver everyone's giftee (host only).
+
+    The draw is kept, so revealing again re-sends the same giftees; send
+    ``{"reshuffle": true}`` to draw again.
+    """
     sid = request.sid
 
-    rid = SID_TO_RID.get(sid)
-    room = ROOMS.get(rid)
-    if not room:
-        return
+    with _room_of(sid) as (rid, room):
+        if not room:
+            return emit("error", {"message": "Not in a room"})
+
+        if room.host.sid != sid:
+            return emit("error", {"message": "Not the host"})
+
+        draw = room.draw
+        if draw is None or (isinstance(data, dict) and data.get("reshuffle") is True):
+            participants = list(room.participants)
+            if len(participants) < 2:
+                return emit("error", {"message": "Not enough participants"})
+
+            if room.exclusions:
+                giftees = constrained_derangement(
+                    len(participants), room.excluded_indexes(participants)
+                )
+                if giftees is None:
+                    return emit("error", {"message": "No valid assignment"})
+            else:
+                giftees = derangement(
+                    len(participants),
+                    current_app.config["REVEAL_MODE"],
+                    current_app.config["REVEAL_NUMPY"],
+                )
+
+            draw = room.draw = Draw([p.name for p in participants], giftees)
+            room.revealed = True
+            room.touch()
+            STORE.save(rid, room)
+            SWEEPER.track(rid, room)  # finished rooms expire sooner
+
+        # Givers as seated now: some may have reconnected or left since
+        givers = [room.seat(name) for name in draw.names]
+
+    # Deliver outside the room lock; the payloads are already fixed
+    payloads = [
+        (giver.sid, {"giftee_name": draw.names[receiver]})
+        for giver, receiver in zip(givers, draw.giftees)
+        if giver is not None and giver.sid is not None
+    ]
+    if current_app.config["REVEAL_IN_BACKGROUND"]:
+        start_background_task(emit_each, "revealed", payloads)
     else:
-        SID_TO_RID.pop(sid, None)
-
-    participant: Participant | None = None
-    for p in room.participants:
-        if p.sid == sid:
-            participant = p
-            break
-    if not participant:
-        return
+        emit_each("revealed", payloads)
 
-    room.participants.remove(participant)
-    if participant == room.host:
-        if room.participants:
-            room.host = room.participants[0]
-            emit("host_changed", {"host_name": room.host.name}, to=rid)
-        else:
-            ROOMS.pop(rid, None)
-            return
 
-    emit("disconnected", {"name": participant.name}, to=rid)
-    _broadcast_room_update(rid)
+@socketio.on("get_assignment")
+@_socket_event
+def on_get_assignment() -> None:
+    """The caller's giftee from the kept draw, e.g. after a page refresh."""
+    sid = request.sid
 
+    with _room_of(sid) as (rid, room):
+        if not room:
+            return emit("error", {"message": "Not in a room"})
 
-@socketio.on("reveal")
-def on_reveal() -> None:
+        if room.draw is None:
+            return emit("error", {"message": "Not revealed yet"})
+
+        participant = room.get(sid)
+        giftee = room.draw.giftee_of(participant.name) if participant else None
+        if giftee is None:
+            return emit("error", {"message": "Not in the draw"})
+
+    emit("revealed", {"giftee_name": giftee})
+
+
+@socketio.on("set_exclusions")
+@_socket_event
+def on_set_exclusions(data) -> None:
+    """Replace the room's exclusions (host only).
+
+    ``exclusions`` holds directed [giver, receiver] pairs, e.g. last year's
+    draw; ``couples`` holds pairs that must not draw each other either way.
+    """
     sid = request.sid
 
-    rid = SID_TO_RID.get(sid)
-    room = ROOMS.get(rid)
-    if not room:
-        return emit("error", {"message": "Not in a room"})
+    with _room_of(sid) as (rid, room):
+        if not room:
+            return emit("error", {"message": "Not in a room"})
 
-    if room.host.sid != sid:
-        return emit("error", {"message": "Not the host"})
+        if room.host.sid != sid:
+            return emit("error", {"message": "Not the host"})
 
-    participants = room.participants
-    if len(participants) < 2:
-        return emit("error", {"message": "Not enough participants"})
+        pairs = _parse_pairs(data.get("exclusions"))
+        couples = _parse_pairs(data.get("couples"))
+        if pairs is None or couples is None:
+            return emit("error", {"message": "Invalid exclusions"})
 
-    giftees = knuth_shuffle(participants.copy())
-    for i in range(len(participants)):
-        emit("revealed", {"giftee_name": giftees[i].name}, to=participants[i].sid)
+        exclusions: dict[str, set[str]] = {}
+        for giver, receiver in pairs + couples + [(b, a) for a, b in couples]:
+            exclusions.setdefault(giver, set()).add(receiver)
+        room.exclusions = exclusions
+        room.touch()
+
+        STORE.save(rid, room)
+    emit("exclusions_set", {"count": sum(len(rs) for rs in exclusions.values())})
+
+
+@socketio.on("resync")
+@_socket_event
+def on_resync() -> None:
+    """Full snapshot for a client that noticed a version gap."""
+    with _room_of(request.sid) as (rid, room):
+        if not room:
+            return emit("error", {"message": "Not in a room"})
+
+        emit("resync", room.payload(rid))
 
 
 # ------------ Helpers ------------
-def _broadcast_room_update(rid: str) -> None:
-    room = ROOMS[rid]
-    socketio.emit(
-        "room_update",
-        {
-            "room_id": rid,
-            "participants": [p.name for p in room.participants],
-            "host_name": room.host.name,
-        },
-        to=rid,
-    )
+def _reclaim_seat(rid: str, room: Room, seat: Participant) -> None:
+    """Bind an existing seat to the caller; others see no change."""
+    if seat.sid is not None:
+        # The old connection has not noticed it is gone yet
+        STORE.unbind(seat.sid)
+        leave_room(rid, sid=seat.sid)
+    seat = room.rebind(seat.name, request.sid)
+    AWAY.reclaimed(rid, seat.name)
+    room.touch()
+
+    STORE.save(rid, room)
+    STORE.bind(request.sid, rid)
+
+    join_room(rid)
+    emit("rejoined", {**room.payload(rid), "name": seat.name, "token": seat_token(rid, room, seat)})
+
+
+def _remove_seat(rid: str, room: Room, name: str) -> None:
+    """Drop the seat ``name`` and tell the room; the room lock must be held."""
+    participant = room.remove_seat(name)
+    removed_version = room.version
+
+    host_changed = participant == room.host
+    if host_changed and not room.promote_host():
+        STORE.delete(rid)
+        return
+
+    STORE.save(rid, room)
+
+    host_payload = {"host_name": room.host.name, "version": room.version}
+    if _delta_protocol():
+        # Versions must arrive in order, so the removal goes first here
+        emit(
+            "participant_removed",
+            {"name": participant.name, "version": removed_version},
+            to=rid,
+        )
+        if host_changed:
+            emit("host_changed", host_payload, to=rid)
+        return
+
+    if host_changed:
+        emit("host_changed", host_payload, to=rid)
+    emit("disconnected", {"name": participant.name}, to=rid)
+    _broadcast_room_update(rid, room)
+
+
+def _server_full() -> bool:
+    limit = current_app.config["SERVER_MAX_PARTICIPANTS"]
+    return bool(limit) and STORE.sid_count() >= limit
+
+
+def _delta_protocol() -> bool:
+    return current_app.config["ROOM_UPDATE_PROTOCOL"] == "delta"
+
+
+def _parse_pairs(raw) -> list[tuple[str, str]] | None:
+    if raw is None:
+        return []
+    if not isinstance(raw, list):
+        return None
+
+    pairs = []
+    for pair in raw:
+        if not isinstance(pair, list) or len(pair) != 2:
+            return None
+        if not all(isinstance(name, str) and name.strip() for name in pair):
+            return None
+        a, b = pair[0].strip(), pair[1].strip()
+        if max(len(a), len(b)) > current_app.config["NAME_MAX_LENGTH"]:
+            return None
+        if a != b:
+            pairs.append((a, b))
+    return pairs
+
+
+def restore_rooms() -> int:
+    """Load the snapshot log into the store; returns how many rooms came back."""
+    restored = SNAPSHOTS.load()
+    for rid, room in list(restored.items()):
+        if not STORE.owns(rid):
+            del restored[rid]  # pinned to another worker since it was written
+            continue
+        STORE.save(rid, room)
+        SWEEPER.track(rid, room)
+        if AWAY.grace:
+            # Everyone is away after a restart; hold their seats like a drop
+            for p in room.participants:
+                AWAY.hold(rid, p.name)
+    STORE.take_dirty()
+    return len(restored)
+
+
+def snapshot_rooms() -> int:
+    """Append rooms changed since the last snapshot; returns records written.
+
+    Each room is encoded under its own lock, so handlers on other rooms are
+    never held up; the file write happens with no lock held. If anything
+    fails the rooms are marked dirty again for the next try.
+    """
+    dirty = STORE.take_dirty()
+    try:
+        records = []
+        for rid in dirty:
+            with STORE.room_lock(rid):
+                room = STORE.get(rid)
+                records.append(put_record(rid, room) if room else delete_record(rid))
+        SNAPSHOTS.append(records)
+    except Exception:
+        STORE.mark_dirty(dirty)
+        raise
+
+    if SNAPSHOTS.needs_compaction(len(STORE)):
+        live = []
+        for i, rid in enumerate(list(STORE.rooms)):
+            with STORE.room_lock(rid):
+                room = STORE.get(rid)
+                if room:
+                    live.append(put_record(rid, room))
+            if i % 1000 == 999:
+                socketio.sleep(0)
+        SNAPSHOTS.compact(live)
+    return len(records)
+
+
+def run_snapshots() -> None:
+    """Background loop writing snapshots every interval."""
+    while SNAPSHOTS is not None and SNAPSHOTS.interval:
+        socketio.sleep(SNAPSHOTS.interval)
+        if SNAPSHOTS is not None:
+            try:
+                snapshot_rooms()
+            except Exception:
+                log.exception("Snapshot failed; will retry")
+
+
+def flush_journal() -> int:
+    """Write buffered journal records out; returns how many."""
+    return JOURNAL.flush() if JOURNAL is not None else 0
+
+
+def run_journal() -> None:
+    """Background loop writing the journal every interval."""
+    while JOURNAL is not None and JOURNAL.interval:
+        socketio.sleep(JOURNAL.interval)
+        try:
+            flush_journal()
+        except Exception:
+            log.exception("Journal write failed; will retry")
+
+
+def release_away_seats(now: float | None = None) -> int:
+    """Remove away seats whose grace period ran out; returns how many."""
+    released = 0
+    for rid, name in AWAY.due(now):
+        with STORE.room_lock(rid):
+            room = STORE.get(rid)
+            seat = room.seat(name) if room else None
+            if seat is None or seat.sid is not None:
+                continue  # gone already, or reclaimed in time
+            _remove_seat(rid, room, name)
+            released += 1
+    AWAY.released += released
+    return released
+
+
+def run_away_seats(app) -> None:
+    """Background loop releasing expired away seats about once a second."""
+    with app.app_context():
+        while AWAY.grace:
+            socketio.sleep(min(AWAY.grace, 1.0))
+            release_away_seats()
+
+
+def sweep_rooms(now: float | None = None) -> int:
+    """Evict rooms past their TTL; returns how many heap entries were due.
+
+    Connections a dead worker left in a shared store are let go first.
+    """
+    STORE.reap(_drop_connection)
+    return SWEEPER.sweep(_expire_room, now)
+
+
+def adopt_stored_rooms() -> int:
+    """Queue every room already in a shared store for sweeping.
+
+    Only the worker that makes a room queues it, so after a restart nobody
+    would. Rooms that live workers still queue get a second entry, which is
+    harmless: expiry re-checks the room under its lock. Connections dead
+    workers left behind are let go too. Returns how many rooms were queued.
+    """
+    STORE.reap(_drop_connection)
+    stored = STORE.items()
+    for rid, room in stored:
+        SWEEPER.track(rid, room)
+    return len(stored)
+
+
+def run_sweeper() -> None:
+    """Background loop sweeping idle and finished rooms every interval."""
+    while SWEEPER.interval:
+        socketio.sleep(SWEEPER.interval)
+        sweep_rooms()
+
+
+def _expire_room(rid: str, now: float) -> float | None:
+    with STORE.room_lock(rid):
+        room = STORE.get(rid)
+        if room is None:
+            return None
+        deadline = SWEEPER.deadline(room)
+        if deadline > now:
+            return deadline
+
+        for p in room.participants:
+            if p.sid is not None:
+                STORE.unbind(p.sid)
+        STORE.delete(rid)
+        SWEEPER.evicted += 1
+
+    emit("room_closed", {"room_id": rid}, to=rid)
+    close_room(rid)
+    return None
+
+
+def flush_room_updates() -> int:
+    """Send every queued room_update now; returns how many rooms were sent."""
+    return UPDATES.flush(_send_room_update)
+
+
+def run_room_updates() -> None:
+    """Background loop flushing queued room_updates every window."""
+    while UPDATES.window:
+        socketio.sleep(UPDATES.window)
+        flush_room_updates()
+
+
+def flush_admitted() -> int:
+    """Announce every batch of burst joins now; returns how many rooms."""
+    return ADMITTED.flush(_announce_admitted)
+
+
+def run_admitted(app) -> None:
+    """Background loop announcing batched joins every admission window."""
+    with app.app_context():
+        while ADMITTED.window:
+            socketio.sleep(ADMITTED.window)
+            flush_admitted()
+
+
+def _announce_admitted(rid: str) -> None:
+    with STORE.room_lock(rid):
+        room = STORE.get(rid)
+        if room:
+            # Delta clients take a full snapshot as resync
+            emit("resync" if _delta_protocol() else "room_update", room.payload(rid), to=rid)
+
+
+def _send_room_update(rid: str) -> None:
+    with STORE.room_lock(rid):
+        room = STORE.get(rid)
+        if room:
+            _emit_room_update(rid, room)
+
+
+def _insert_room(room: Room) -> str | None:
+    allocator = code_allocator(current_app.config["ROOM_ID_LENGTH"])
+    for _ in range(allocator.MAX_ATTEMPTS):
+        try:
+            rid = allocator.allocate(STORE, STORE.owns)
+        except RuntimeError:
+            return None
+        # Another thread may have taken the same code since the check
+        if STORE.insert(rid, room):
+            return rid
+    return None
+
+
+def _broadcast_room_update(rid: str, room: Room) -> None:
+    if not UPDATES.request(rid):
+        _emit_room_update(rid, room)
+
+
+def _emit_room_update(rid: str, room: Room) -> None:
+    emit("room_update", room.payload(rid), to=rid)
@@ -0,0 +1,202 @@
+import os
+import struct
+import zlib
+
+from .utilities import Draw, Participant, Room
+
+
+# ------------ Binary record format ------------
+# File:    MAGIC, then records
+# Record:  op (u8) | payload length (u32) | crc32 of payload (u32) | payload
+# PUT:     rid | version (u32) | last_active (f64) | flags (u8) | seats (u32)
+#          | salt (u64) | seats issued (u32) | host name
+#          | seats x (name, gen (u32)) | exclusions (u32)
+#          | exclusions x (giver, receivers (u32), receivers x name)
+#          | if flags & DRAWN: names (u32) | names x name | names x giftee (u32)
+# DELETE:  rid
+# Strings are a u16 byte length followed by UTF-8. Sids are not kept: they
+# die with the process, so restored seats wait to be reclaimed by token.
+# Tokens are derived from the room's salt and each seat's name and gen, so
+# they are not kept either.
+MAGIC = b"SSRLOG3\n"
+
+_PUT = 1
+_DELETE = 2
+
+_HEADER = struct.Struct("<BII")
+_ROOM = struct.Struct("<IdBIQI")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+
+_REVEALED = 1
+_DRAWN = 2
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    data = s.encode()
+    out += _U16.pack(len(data))
+    out += data
+
+
+def _get_str(buf: memoryview, pos: int) -> tuple[str, int]:
+    (n,) = _U16.unpack_from(buf, pos)
+    pos += 2
+    return str(buf[pos : pos + n], "utf-8"), pos + n
+
+
+def _frame(op: int, payload: bytes) -> bytes:
+    return _HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+
+
+def put_record(rid: str, room: Room) -> bytes:
+    out = bytearray()
+    _put_str(out, rid)
+    flags = (_REVEALED if room.revealed else 0) | (_DRAWN if room.draw else 0)
+    out += _ROOM.pack(
+        room.version, room.last_active, flags, len(room), room.salt, room.seats_issued
+    )
+    _put_str(out, room.host.name)
+    for p in room.participants:
+        _put_str(out, p.name)
+        out += _U32.pack(p.gen)
+    out += _U32.pack(len(room.exclusions))
+    for giver, receivers in room.exclusions.items():
+        _put_str(out, giver)
+        out += _U32.pack(len(receivers))
+        for r in receivers:
+            _put_str(out, r)
+    if room.draw:
+        out += _U32.pack(len(room.draw))
+        for name in room.draw.names:
+            _put_str(out, name)
+        out += struct.pack(f"<{len(room.draw)}I", *room.draw.giftees)
+    return _frame(_PUT, bytes(out))
+
+
+def delete_record(rid: str) -> bytes:
+    out = bytearray()
+    _put_str(out, rid)
+    return _frame(_DELETE, bytes(out))
+
+
+def _decode_room(buf: memoryview) -> tuple[str, Room]:
+    rid, pos = _get_str(buf, 0)
+    version, last_active, flags, count, salt, seats_issued = _ROOM.unpack_from(buf, pos)
+    pos += _ROOM.size
+    host_name, pos = _get_str(buf, pos)
+
+    room: Room | None = None
+    for _ in range(count):
+        name, pos = _get_str(buf, pos)
+        (gen,) = _U32.unpack_from(buf, pos)
+        pos += 4
+        seat = Participant(sid=None, name=name, gen=gen)
+        if room is None:
+            room = Room(host=seat)
+        else:
+            room.add_member(seat)
+
+    (n_exclusions,) = _U32.unpack_from(buf, pos)
+    pos += 4
+    for _ in range(n_exclusions):
+        giver, pos = _get_str(buf, pos)
+        (k,) = _U32.unpack_from(buf, pos)
+        pos += 4
+        receivers = room.exclusions[giver] = set()
+        for _ in range(k):
+            r, pos = _get_str(buf, pos)
+            receivers.add(r)
+
+    if flags & _DRAWN:
+        (n,) = _U32.unpack_from(buf, pos)
+        pos += 4
+        names = []
+        for _ in range(n):
+            name, pos = _get_str(buf, pos)
+            names.append(name)
+        room.draw = Draw(names, struct.unpack_from(f"<{n}I", buf, pos))
+
+    room.host = room.seat(host_name)
+    room.version = version
+    room.salt = salt
+    room.seats_issued = seats_issued
+    room.last_active = last_active
+    room.revealed = bool(flags & _REVEALED)
+    return rid, room
+
+
+# ------------ Append-only log ------------
+class SnapshotLog:
+    """Room snapshots as an append-only log of PUT / DELETE records.
+
+    ``append`` adds records for rooms changed since the last call, and
+    ``compact`` rewrites the file with one PUT per live room once the log
+    holds many more records than there are rooms. Replay keeps the last
+    record per room and stops at the first torn or corrupt record.
+    """
+
+    COMPACT_RATIO = 4
+
+    def __init__(self, path: str, interval: float = 5.0) -> None:
+        self.path = path
+        self.interval = interval
+        self.records = 0
+
+    def load(self) -> dict[str, Room]:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        if not data.startswith(MAGIC):
+            # Another format (or not a log): set it aside so appends start afresh
+            if data:
+                os.replace(self.path, self.path + ".old")
+            return {}
+
+        rooms: dict[str, Room] = {}
+        buf = memoryview(data)
+        pos = len(MAGIC)
+        records = 0
+        while pos + _HEADER.size <= len(buf):
+            op, length, crc = _HEADER.unpack_from(buf, pos)
+            start = pos + _HEADER.size
+            payload = buf[start : start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            if op == _PUT:
+                rid, room = _decode_room(payload)
+                rooms[rid] = room
+            else:
+                rooms.pop(_get_str(payload, 0)[0], None)
+            pos = start + length
+            records += 1
+        if pos < len(buf):
+            # Drop the torn tail so later appends are not stranded behind it
+            with open(self.path, "r+b") as f:
+                f.truncate(pos)
+        self.records = records
+        return rooms
+
+    def append(self, records: list[bytes]) -> None:
+        if not records:
+            return
+        new = not os.path.exists(self.path)
+        with open(self.path, "ab") as f:
+            if new:
+                f.write(MAGIC)
+            f.write(b"".join(records))
+        self.records += len(records)
+
+    def needs_compaction(self, live_rooms: int) -> bool:
+        return self.records > self.COMPACT_RATIO * max(live_rooms, 256)
+
+    def compact(self, records: list[bytes]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(b"".join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.records = len(records)
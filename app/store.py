@@ -0,0 +1,520 @@
+import functools
+import json
+import os
+import secrets
+import threading
+import zlib
+
+from collections import ChainMap
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks: dead workers' sids are never reaped
+    fcntl = None
+
+from .utilities import Room
+
+
+# ------------ Locks ------------
+class LockStripes:
+    """Fixed pool of re-entrant locks picked by key hash.
+
+    Keys that land on different stripes never contend, and memory stays
+    constant however many rooms or sids come and go.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def __call__(self, key: str) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+
+# ------------ Room store interface ------------
+class RoomStore:
+    """Where rooms and the sid -> room id index live.
+
+    Handlers fetch a room, mutate it, then ``save`` it back. The in-memory store
+    hands out live objects so ``save`` is just a dict write; shared stores
+    serialize the room so every worker sees the same state.
+
+    ``sid_lock`` and ``room_lock`` serialize events inside one process. Take
+    the sid lock first and the room lock second; the two pools are separate
+    so that order can never deadlock.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        self.sid_lock = LockStripes(stripes)
+        self.room_lock = LockStripes(stripes)
+
+    def get(self, rid: str) -> Room | None:
+        raise NotImplementedError
+
+    def insert(self, rid: str, room: Room) -> bool:
+        """Save ``room`` only if ``rid`` is free; False if it was taken."""
+        raise NotImplementedError
+
+    def insert_many(self, rooms: dict[str, Room]) -> list[str]:
+        """``insert`` each room; returns the ids that were already taken."""
+        return [rid for rid, room in rooms.items() if not self.insert(rid, room)]
+
+    def save(self, rid: str, room: Room) -> None:
+        raise NotImplementedError
+
+    def delete(self, rid: str) -> None:
+        raise NotImplementedError
+
+    def rid_for(self, sid: str) -> str | None:
+        raise NotImplementedError
+
+    def bind(self, sid: str, rid: str) -> None:
+        raise NotImplementedError
+
+    def unbind(self, sid: str) -> None:
+        raise NotImplementedError
+
+    def sid_count(self) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, rid: str) -> bool:
+        return self.get(rid) is not None
+
+    def items(self) -> list[tuple[str, Room]]:
+        """Every room held, as (rid, room) pairs."""
+        raise NotImplementedError
+
+    def reap(self, drop: Callable[[str], None]) -> int:
+        """Hand ``drop`` each sid bound by a process that has died.
+
+        Sids die with their process, so only stores shared between processes
+        can be left holding dead ones; the rest have none. ``drop`` should
+        free the sid's seat and unbind it. Returns how many sids were reaped.
+        """
+        return 0
+
+    def owns(self, rid: str) -> bool:
+        """Whether ``rid`` may live in this process's store."""
+        return True
+
+
+class MemoryRoomStore(RoomStore):
+    """Process-local store (single worker only, lost on restart).
+
+    With ``track_changes`` every written room id is remembered until
+    ``take_dirty`` so snapshots only re-encode rooms that changed.
+    """
+
+    def __init__(self, track_changes: bool = False, stripes: int = 64) -> None:
+        super().__init__(stripes)
+        self.rooms: dict[str, Room] = {}
+        self.sids: dict[str, str] = {}
+        self._dirty: set[str] | None = set() if track_changes else None
+
+    def take_dirty(self) -> set[str]:
+        dirty, self._dirty = self._dirty, set()
+        return dirty or set()
+
+    def mark_dirty(self, rids: Iterable[str]) -> None:
+        """Hand ``rids`` out again from the next ``take_dirty``."""
+        if self._dirty is not None:
+            self._dirty.update(rids)
+
+    def get(self, rid: str) -> Room | None:
+        return self.rooms.get(rid)
+
+    def insert(self, rid: str, room: Room) -> bool:
+        if self.rooms.setdefault(rid, room) is not room:
+            return False
+        if self._dirty is not None:
+            self._dirty.add(rid)
+        return True
+
+    def save(self, rid: str, room: Room) -> None:
+        self.rooms[rid] = room
+        if self._dirty is not None:
+            self._dirty.add(rid)
+
+    def delete(self, rid: str) -> None:
+        self.rooms.pop(rid, None)
+        if self._dirty is not None:
+            self._dirty.add(rid)
+
+    def rid_for(self, sid: str) -> str | None:
+        return self.sids.get(sid)
+
+    def bind(self, sid: str, rid: str) -> None:
+        self.sids[sid] = rid
+
+    def unbind(self, sid: str) -> None:
+        self.sids.pop(sid, None)
+
+    def sid_count(self) -> int:
+        return len(self.sids)
+
+    def clear(self) -> None:
+        self.rooms.clear()
+        self.sids.clear()
+
+    def items(self) -> list[tuple[str, Room]]:
+        return list(self.rooms.items())
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def __contains__(self, rid: str) -> bool:
+        return rid in self.rooms
+
+
+# ------------ Sharding ------------
+def shard_of(rid: str, shards: int) -> int:
+    """Shard index for a room code, the same in every process.
+
+    ``hash`` is salted per process, so CRC32 of the code is used instead.
+    """
+    return zlib.crc32(rid.encode()) % shards
+
+
+def worker_for(rid: str, workers: int, shards: int) -> int:
+    """Worker that owns ``rid`` when shards are pinned round-robin.
+
+    Whatever routes connections (a proxy hashing a ``room`` query argument,
+    or the client picking a worker URL) must agree with this, so every
+    member of a room lands on the worker holding it.
+    """
+    return shard_of(rid, shards) % workers
+
+
+class ShardedRoomStore(RoomStore):
+    """In-memory rooms partitioned across ``shards`` by room code.
+
+    Each shard is a MemoryRoomStore with its own dicts, room locks and
+    counters, so rooms on different shards never share a lock or a dict.
+    Sids are partitioned by their own hash, as they are looked up before
+    their room is known.
+
+    With ``workers`` > 1 this process only holds the shards pinned to
+    ``worker`` (shard % workers). Codes owned by other workers count as
+    taken, so code allocation only ever picks local ones; joins for them
+    must be routed elsewhere (see ``worker_for``).
+    """
+
+    def __init__(
+        self,
+        shards: int = 16,
+        stripes: int = 4,
+        track_changes: bool = False,
+        worker: int = 0,
+        workers: int = 1,
+    ) -> None:
+        super().__init__()
+        self.shards = [MemoryRoomStore(track_changes, stripes) for _ in range(shards)]
+        self.worker = worker
+        self.workers = workers
+        self.ops = [0] * shards
+        self.deletes = [0] * shards
+        self.rooms = ChainMap(*(shard.rooms for shard in self.shards))
+        self.room_lock = self._room_lock
+
+    def _shard(self, rid: str) -> int | None:
+        """Index of the shard holding ``rid``, None if another worker owns it."""
+        i = shard_of(rid, len(self.shards))
+        if i % self.workers != self.worker:
+            return None
+        self.ops[i] += 1
+        return i
+
+    def _sid_shard(self, sid: str) -> MemoryRoomStore:
+        return self.shards[zlib.crc32(sid.encode()) % len(self.shards)]
+
+    def _room_lock(self, rid: str) -> threading.RLock:
+        return self.shards[shard_of(rid, len(self.shards))].room_lock(rid)
+
+    def owns(self, rid: str) -> bool:
+        return shard_of(rid, len(self.shards)) % self.workers == self.worker
+
+    def stats(self) -> list[dict[str, int]]:
+        """Rooms, bound sids, room operations and deletes per shard."""
+        return [
+            {"rooms": len(shard), "sids": shard.sid_count(), "ops": ops, "deletes": deletes}
+            for shard, ops, deletes in zip(self.shards, self.ops, self.deletes)
+        ]
+
+    def take_dirty(self) -> set[str]:
+        return set().union(*(shard.take_dirty() for shard in self.shards))
+
+    def mark_dirty(self, rids: Iterable[str]) -> None:
+        for rid in rids:
+            self.shards[shard_of(rid, len(self.shards))].mark_dirty((rid,))
+
+    def get(self, rid: str) -> Room | None:
+        i = self._shard(rid)
+        return None if i is None else self.shards[i].get(rid)
+
+    def insert(self, rid: str, room: Room) -> bool:
+        i = self._shard(rid)
+        return i is not None and self.shards[i].insert(rid, room)
+
+    def save(self, rid: str, room: Room) -> None:
+        i = self._shard(rid)
+        if i is None:
+            raise KeyError(f"Room {rid} belongs to another worker")
+        self.shards[i].save(rid, room)
+
+    def delete(self, rid: str) -> None:
+        i = self._shard(rid)
+        if i is not None:
+            self.deletes[i] += 1
+            self.shards[i].delete(rid)
+
+    def rid_for(self, sid: str) -> str | None:
+        return self._sid_shard(sid).rid_for(sid)
+
+    def bind(self, sid: str, rid: str) -> None:
+        self._sid_shard(sid).bind(sid, rid)
+
+    def unbind(self, sid: str) -> None:
+        self._sid_shard(sid).unbind(sid)
+
+    def sid_count(self) -> int:
+        return sum(shard.sid_count() for shard in self.shards)
+
+    def clear(self) -> None:
+        for shard in self.shards:
+            shard.clear()
+
+    def items(self) -> list[tuple[str, Room]]:
+        return list(self.rooms.items())
+
+    def __len__(self) -> int:
+        return sum(map(len, self.shards))
+
+    def __contains__(self, rid: str) -> bool:
+        # Another worker's code is as good as taken here
+        i = self._shard(rid)
+        return i is None or rid in self.shards[i]
+
+
+class SqliteRoomStore(RoomStore):
+    """Store shared by every worker on a host through one SQLite file.
+
+    WAL mode lets readers in other processes proceed while one writes, and
+    rooms survive a worker restart. ``room_lock`` also holds a write
+    transaction (BEGIN IMMEDIATE), so a handler's get / mutate / save of a
+    room is atomic across workers: a second worker editing the same room
+    waits for the first to commit. As SQLite has one writer per file, edits
+    to different rooms queue too.
+
+    Handlers run on short-lived threads, so connections are not per thread:
+    each call borrows one from a small pool and hands it back, except inside
+    ``room_lock``, where the thread keeps its transaction's connection.
+
+    Each store names itself ``worker`` and stamps the sids it binds with
+    that. It holds an advisory lock on ``<path>.workers/<worker>.lock`` for
+    as long as it lives, so ``reap`` can tell a dead worker's sids by
+    taking that lock.
+    """
+
+    POOL_SIZE = 8
+
+    def __init__(self, path: str) -> None:
+        import sqlite3
+
+        super().__init__()
+        self._connect = functools.partial(
+            sqlite3.connect, path, isolation_level=None, check_same_thread=False
+        )
+        self._pool: list = []
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._stripes = self.room_lock
+        self.room_lock = self._room_transaction
+        with self._conn() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS rooms (rid TEXT PRIMARY KEY, data TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS sids (
+                    sid TEXT PRIMARY KEY, rid TEXT NOT NULL, worker TEXT NOT NULL DEFAULT ''
+                );
+                """
+            )
+            if "worker" not in {row[1] for row in db.execute("PRAGMA table_info(sids)")}:
+                # Files from before workers were tracked; '' rows count as dead
+                db.execute("ALTER TABLE sids ADD COLUMN worker TEXT NOT NULL DEFAULT ''")
+
+        self.worker = secrets.token_hex(8)
+        self._workers = path + ".workers"
+        self._alive = None
+        if fcntl is not None:
+            os.makedirs(self._workers, exist_ok=True)
+            self._alive = open(os.path.join(self._workers, f"{self.worker}.lock"), "w")
+            fcntl.flock(self._alive, fcntl.LOCK_EX)
+
+    def _checkout(self):
+        with self._pool_lock:
+            if self._pool:
+                return self._pool.pop()
+        db = self._connect()
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _checkin(self, db) -> None:
+        with self._pool_lock:
+            if len(self._pool) < self.POOL_SIZE:
+                self._pool.append(db)
+                return
+        db.close()
+
+    @contextmanager
+    def _conn(self):
+        """The thread's transaction connection, else one from the pool."""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            yield db
+            return
+        db = self._checkout()
+        try:
+            yield db
+        finally:
+            self._checkin(db)
+
+    @contextmanager
+    def _room_transaction(self, rid: str) -> Iterator[None]:
+        with self._stripes(rid):
+            if getattr(self._local, "db", None) is not None:
+                yield  # re-entered: the outer lock commits
+                return
+            db = self._local.db = self._checkout()
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    yield
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+                db.execute("COMMIT")
+            finally:
+                self._local.db = None
+                self._checkin(db)
+
+    def _one(self, sql: str, *args):
+        with self._conn() as db:
+            return db.execute(sql, args).fetchone()
+
+    def _all(self, sql: str, *args) -> list:
+        with self._conn() as db:
+            return db.execute(sql, args).fetchall()
+
+    def _run(self, sql: str, *args) -> None:
+        with self._conn() as db:
+            db.execute(sql, args)
+
+    def get(self, rid: str) -> Room | None:
+        row = self._one("SELECT data FROM rooms WHERE rid = ?", rid)
+        return Room.from_dict(json.loads(row[0])) if row else None
+
+    def insert(self, rid: str, room: Room) -> bool:
+        data = json.dumps(room.to_dict(), separators=(",", ":"))
+        with self._conn() as db:
+            cur = db.execute("INSERT OR IGNORE INTO rooms (rid, data) VALUES (?, ?)", (rid, data))
+            return cur.rowcount == 1
+
+    def insert_many(self, rooms: dict[str, Room]) -> list[str]:
+        # One transaction instead of a commit per room
+        rows = [
+            (rid, json.dumps(room.to_dict(), separators=(",", ":")))
+            for rid, room in rooms.items()
+        ]
+        taken = []
+        with self._conn() as db:
+            db.execute("BEGIN")
+            try:
+                for row in rows:
+                    cur = db.execute("INSERT OR IGNORE INTO rooms (rid, data) VALUES (?, ?)", row)
+                    if cur.rowcount != 1:
+                        taken.append(row[0])
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        return taken
+
+    def save(self, rid: str, room: Room) -> None:
+        data = json.dumps(room.to_dict(), separators=(",", ":"))
+        self._run("INSERT OR REPLACE INTO rooms (rid, data) VALUES (?, ?)", rid, data)
+
+    def delete(self, rid: str) -> None:
+        self._run("DELETE FROM rooms WHERE rid = ?", rid)
+
+    def rid_for(self, sid: str) -> str | None:
+        row = self._one("SELECT rid FROM sids WHERE sid = ?", sid)
+        return row[0] if row else None
+
+    def bind(self, sid: str, rid: str) -> None:
+        sql = "INSERT OR REPLACE INTO sids (sid, rid, worker) VALUES (?, ?, ?)"
+        self._run(sql, sid, rid, self.worker)
+
+    def unbind(self, sid: str) -> None:
+        self._run("DELETE FROM sids WHERE sid = ?", sid)
+
+    def sid_count(self) -> int:
+        return self._one("SELECT COUNT(*) FROM sids")[0]
+
+    def clear(self) -> None:
+        with self._conn() as db:
+            db.executescript("DELETE FROM rooms; DELETE FROM sids;")
+
+    def __len__(self) -> int:
+        return self._one("SELECT COUNT(*) FROM rooms")[0]
+
+    def __contains__(self, rid: str) -> bool:
+        return self._one("SELECT 1 FROM rooms WHERE rid = ?", rid) is not None
+
+    def items(self) -> list[tuple[str, Room]]:
+        rows = self._all("SELECT rid, data FROM rooms")
+        return [(rid, Room.from_dict(json.loads(data))) for rid, data in rows]
+
+    def reap(self, drop: Callable[[str], None]) -> int:
+        if fcntl is None:
+            return 0
+        reaped = 0
+        workers = self._all("SELECT DISTINCT worker FROM sids WHERE worker != ?", self.worker)
+        for (worker,) in workers:
+            path = os.path.join(self._workers, f"{worker}.lock")
+            with open(path, "a") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # alive, or another worker is reaping it
+                for (sid,) in self._all("SELECT sid FROM sids WHERE worker = ?", worker):
+                    drop(sid)
+                    reaped += 1
+                self._run("DELETE FROM sids WHERE worker = ?", worker)
+                os.unlink(path)
+        return reaped
+
+
+# ------------ Factory ------------
+def create_store(
+    kind: str,
+    path: str | None = None,
+    track_changes: bool = False,
+    shards: int = 1,
+    worker: int = 0,
+    workers: int = 1,
+) -> RoomStore:
+    if kind == "memory" and (shards > 1 or workers > 1):
+        return ShardedRoomStore(shards, track_changes=track_changes, worker=worker, workers=workers)
+    if kind == "memory":
+        return MemoryRoomStore(track_changes)
+    if kind == "sqlite":
+        return SqliteRoomStore(path or "rooms.sqlite3")
+    raise ValueError(f"Unknown room store: {kind}")
@@ -0,0 +1,117 @@
+import heapq
+import itertools
+import threading
+import time
+
+from collections.abc import Callable
+
+from .utilities import Room
+
+
+# ------------ Idle room eviction ------------
+class RoomSweeper:
+    """Time-ordered heap of room deadlines.
+
+    Each room is pushed once when created. Activity only moves the room's own
+    ``last_active`` stamp; when its heap entry comes due the real deadline is
+    re-checked and the entry is pushed back if the room was touched since.
+    A sweep therefore only touches rooms that are due, never the whole table.
+    """
+
+    def __init__(
+        self, ttl: float = 0.0, finished_ttl: float = 0.0, interval: float = 0.0
+    ) -> None:
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self.interval = interval
+        self.evicted = 0
+        self._heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def deadline(self, room: Room) -> float:
+        ttl = self.finished_ttl if room.revealed else self.ttl
+        return room.last_active + ttl if ttl else float("inf")
+
+    def track(self, rid: str, room: Room) -> None:
+        deadline = self.deadline(room)
+        if deadline != float("inf"):
+            with self._lock:
+                heapq.heappush(self._heap, (deadline, rid))
+
+    def sweep(
+        self, expire: Callable[[str, float], float | None], now: float | None = None
+    ) -> int:
+        """Hand every due room to ``expire``; returns how many were due.
+
+        ``expire(rid, now)`` evicts the room if it really is past its deadline
+        and returns None, or returns the room's new deadline to re-queue it.
+        """
+        now = time.time() if now is None else now
+        due = 0
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now:
+                    return due
+                _, rid = heapq.heappop(self._heap)
+            due += 1
+            deadline = expire(rid, now)
+            if deadline is not None and deadline != float("inf"):
+                with self._lock:
+                    heapq.heappush(self._heap, (deadline, rid))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+# ------------ Reconnect grace ------------
+class AwaySeats:
+    """Seats whose connection dropped, held for ``grace`` seconds.
+
+    Entries are keyed by (room id, name). Only the latest hold for a seat
+    counts, so one that dropped, came back and dropped again is not released
+    by its first, stale deadline.
+    """
+
+    def __init__(self, grace: float = 0.0) -> None:
+        self.grace = grace
+        self.released = 0
+        self._heap: list[tuple[float, int, str, str]] = []
+        self._latest: dict[tuple[str, str], int] = {}
+        self._count = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def hold(self, rid: str, name: str, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            n = next(self._count)
+            self._latest[rid, name] = n
+            heapq.heappush(self._heap, (now + self.grace, n, rid, name))
+
+    def reclaimed(self, rid: str, name: str) -> None:
+        """Stop holding a seat its owner came back to; its deadline is skipped."""
+        with self._lock:
+            self._latest.pop((rid, name), None)
+
+    def due(self, now: float | None = None) -> list[tuple[str, str]]:
+        """Pop every seat whose grace period ran out by ``now``."""
+        now = time.time() if now is None else now
+        out = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, n, rid, name = heapq.heappop(self._heap)
+                if self._latest.get((rid, name)) == n:
+                    del self._latest[rid, name]
+                    out.append((rid, name))
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._latest.clear()
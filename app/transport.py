@@ -0,0 +1,81 @@
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import flask_socketio
+
+from flask import request
+
+from . import socketio
+from . import delivery
+
+
+# ------------ Outgoing side effects ------------
+# app.rooms sends and changes Socket.IO rooms only through these functions.
+# Under Flask-SocketIO they call straight through. The asyncio server
+# (app.asgi) runs each handler inside ``buffered()``: effects are queued in
+# order and awaited once the handler returns, so both servers share the one
+# copy of the event logic.
+_OUTBOX: ContextVar[list[tuple] | None] = ContextVar("outbox", default=None)
+
+
+@contextmanager
+def buffered() -> Iterator[list[tuple]]:
+    """Queue effects made inside the block instead of sending them."""
+    outbox: list[tuple] = []
+    token = _OUTBOX.set(outbox)
+    try:
+        yield outbox
+    finally:
+        _OUTBOX.reset(token)
+
+
+def emit(event: str, data, to: str | None = None, skip_sid: str | None = None) -> None:
+    """Send ``event`` to ``to`` (a sid or room id), the caller by default."""
+    to = to or request.sid
+    outbox = _OUTBOX.get()
+    if outbox is None:
+        socketio.emit(event, data, to=to, skip_sid=skip_sid)
+    else:
+        outbox.append(("emit", event, data, to, skip_sid))
+
+
+def emit_each(event: str, payloads: Iterable[tuple[str, dict]]) -> int:
+    outbox = _OUTBOX.get()
+    if outbox is None:
+        return delivery.emit_each(event, payloads)
+    before = len(outbox)
+    outbox.extend(("emit", event, data, sid, None) for sid, data in payloads)
+    return len(outbox) - before
+
+
+def join_room(rid: str) -> None:
+    outbox = _OUTBOX.get()
+    if outbox is None:
+        flask_socketio.join_room(rid)
+    else:
+        outbox.append(("enter", request.sid, rid))
+
+
+def leave_room(rid: str, sid: str) -> None:
+    outbox = _OUTBOX.get()
+    if outbox is None:
+        flask_socketio.leave_room(rid, sid=sid)
+    else:
+        outbox.append(("leave", sid, rid))
+
+
+def close_room(rid: str) -> None:
+    outbox = _OUTBOX.get()
+    if outbox is None:
+        socketio.close_room(rid)
+    else:
+        outbox.append(("close", rid))
+
+
+def start_background_task(target, *args) -> None:
+    """Run ``target`` off the handler; buffered effects are sent after it anyway."""
+    if _OUTBOX.get() is None:
+        socketio.start_background_task(target, *args)
+    else:
+        target(*args)
@@ -1,38 +1,491 @@
+import base64
+import functools
+import hashlib
+import hmac
+import json
 import secrets
 import string
+import sys
+import time
 
-from dataclasses import dataclass
+from array import array
+from collections.abc import (
+    Callable,
+    Collection,
+    Container,
+    Iterable,
+    Mapping,
+    Sequence,
+    ValuesView,
+)
+from dataclasses import dataclass, replace
 
 
 # ------------ Room & participant classes ------------
-@dataclass
+class Encoded(dict):
+    """A payload dict that carries its own compact JSON.
+
+    app.packets sends ``json`` as-is instead of re-encoding the dict, so
+    treat it as read-only; anything else still sees a plain dict.
+    """
+
+    __slots__ = ("json",)
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.json = json.dumps(self, separators=(",", ":"))
+
+
+# Seat tokens are derived with this key (set from SEAT_TOKEN_KEY by create_app)
+_token_key = secrets.token_bytes(32)
+
+
+def set_token_key(key: str | None) -> None:
+    """Key for ``seat_token``; None draws a random one for this process."""
+    global _token_key
+    _token_key = key.encode() if key else secrets.token_bytes(32)
+
+
+def seat_token(rid: str, room: "Room", seat: "Participant") -> str:
+    """The token that reclaims ``seat`` in room ``rid`` from any connection.
+
+    It is derived rather than stored, so seats cost no memory for it. The
+    room's salt and the seat's generation go in with the name, so a token
+    dies with its seat: a later seat under the same name, or a later room
+    under the same code, gets another one.
+    """
+    message = f"{rid}\0{room.salt}\0{seat.gen}\0{seat.name}".encode()
+    digest = hmac.new(_token_key, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode()
+
+
+@dataclass(frozen=True, slots=True)
 class Participant:
-    sid: str
+    """A seat in a room. ``sid`` is None while nobody is connected to it.
+
+    ``gen`` tells seats that reused a name in one room apart (see
+    ``Room.new_gen``); it stays small, so it is a cached int, not a new one.
+    """
+
+    sid: str | None
     name: str
+    gen: int = 0
+
+    def __post_init__(self) -> None:
+        # Names repeat a lot across rooms ("Alice", "Mom", ...), share one copy
+        object.__setattr__(self, "name", sys.intern(self.name))
+
+
+class Draw:
+    """A reveal result: ``names[i]`` gives to ``names[giftees[i]]``.
+
+    Positions are fixed when the draw is made, so members joining or leaving
+    later never shift anyone's giftee. The name -> position index is only
+    built on the first lookup.
+    """
+
+    __slots__ = ("names", "giftees", "_index")
+
+    def __init__(self, names: Sequence[str], giftees: Iterable[int]) -> None:
+        self.names = tuple(names)
+        self.giftees = array("I", giftees)
+        if len(self.giftees) != len(self.names):
+            raise ValueError("One giftee per name")
+        self._index: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def giftee_of(self, name: str) -> str | None:
+        index = self._index
+        if index is None:
+            index = self._index = {n: i for i, n in enumerate(self.names)}
+        i = index.get(name)
+        return None if i is None else self.names[self.giftees[i]]
 
 
 class Room:
+    """Participants in join order, indexed by name and by connected sid.
+
+    ``_by_name`` is the ordered index: names are unique and survive a
+    reconnect, so the first entry is always the longest-standing member and
+    host promotion only scans past away seats (``sid`` None). ``version``
+    goes up by one on every membership or host change so clients can spot
+    gaps, and doubles as the key for the cached ``payload``. ``draw`` keeps
+    the last reveal so giftees can be sent again without drawing again.
+    ``salt`` and ``seats_issued`` feed ``seat_token``.
+    """
+
+    __slots__ = (
+        "host",
+        "version",
+        "salt",
+        "seats_issued",
+        "exclusions",
+        "last_active",
+        "revealed",
+        "draw",
+        "_by_sid",
+        "_by_name",
+        "_payload",
+    )
+
     def __init__(self, host: Participant) -> None:
         self.host = host
-        self.participants = [host]
+        self._by_sid: dict[str, Participant] = {}
+        self._by_name: dict[str, Participant] = {host.name: host}
+        if host.sid is not None:
+            self._by_sid[host.sid] = host
+        self.version = 0
+        self.salt = secrets.randbits(63)
+        self.seats_issued = host.gen
+        self.last_active = time.time()
+        self.revealed = False
+        self.draw: Draw | None = None
+        # giver name -> names they must not draw; names may not have joined yet
+        self.exclusions: dict[str, set[str]] = {}
+        self._payload: Encoded | None = None
+
+    @property
+    def participants(self) -> ValuesView[Participant]:
+        """Ordered, read-only view of the members."""
+        return self._by_name.values()
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def has_name(self, name: str) -> bool:
+        return name in self._by_name
+
+    def get(self, sid: str) -> Participant | None:
+        return self._by_sid.get(sid)
+
+    def seat(self, name: str) -> Participant | None:
+        return self._by_name.get(name)
 
     def add_member(self, participant: Participant) -> bool:
-        if participant.name not in [p.name for p in self.participants]:
-            self.participants.append(participant)
-            return True
-        else:
+        if participant.name in self._by_name or participant.sid in self._by_sid:
             return False
+        if participant.sid is not None:
+            self._by_sid[participant.sid] = participant
+        self._by_name[participant.name] = participant
+        self.version += 1
+        return True
+
+    def remove_member(self, sid: str) -> Participant | None:
+        participant = self._by_sid.get(sid)
+        return self.remove_seat(participant.name) if participant else None
+
+    def remove_seat(self, name: str) -> Participant | None:
+        participant = self._by_name.pop(name, None)
+        if participant is not None:
+            if participant.sid is not None:
+                del self._by_sid[participant.sid]
+            self.version += 1
+        return participant
+
+    def rebind(self, name: str, sid: str | None) -> Participant:
+        """Move the seat ``name`` to a new sid (or none) keeping its place."""
+        old = self._by_name[name]
+        if old.sid is not None:
+            del self._by_sid[old.sid]
+        seat = replace(old, sid=sid)
+        self._by_name[name] = seat
+        if sid is not None:
+            self._by_sid[sid] = seat
+        if self.host is old:
+            self.host = seat
+        return seat
+
+    def promote_host(self) -> Participant | None:
+        """Hand the room to the earliest connected member, if any.
+
+        Away seats are passed over while someone is connected; a room of only
+        away seats keeps its earliest one as host.
+        """
+        members = self._by_name.values()
+        self.host = next((p for p in members if p.sid is not None), None)
+        if self.host is None:
+            self.host = next(iter(members), None)
+        self.version += 1
+        return self.host
+
+    def new_gen(self) -> int:
+        """A seat generation never handed out in this room before."""
+        self.seats_issued += 1
+        return self.seats_issued
+
+    def touch(self) -> None:
+        self.last_active = time.time()
+
+    def names(self) -> list[str]:
+        return list(self._by_name)
+
+    def payload(self, rid: str) -> Encoded:
+        """The room_update / resync payload, rebuilt only when ``version`` moves."""
+        cached = self._payload
+        if cached is None or cached["version"] != self.version or cached["room_id"] != rid:
+            cached = self._payload = Encoded(
+                room_id=rid,
+                participants=self.names(),
+                host_name=self.host.name,
+                version=self.version,
+            )
+        return cached
+
+    def excluded_indexes(self, participants: list[Participant]) -> dict[int, set[int]]:
+        """``exclusions`` translated to positions in ``participants``."""
+        index = {p.name: i for i, p in enumerate(participants)}
+        out: dict[int, set[int]] = {}
+        for giver, receivers in self.exclusions.items():
+            g = index.get(giver)
+            if g is not None:
+                out[g] = {index[r] for r in receivers if r in index}
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "host": self.host.name,
+            "version": self.version,
+            "salt": self.salt,
+            "seats_issued": self.seats_issued,
+            "last_active": self.last_active,
+            "revealed": self.revealed,
+            "participants": [[p.sid, p.name, p.gen] for p in self.participants],
+            "exclusions": {g: sorted(rs) for g, rs in self.exclusions.items()},
+            "draw": [self.draw.names, self.draw.giftees.tolist()] if self.draw else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Room":
+        participants = []
+        for sid, name, *rest in data["participants"]:
+            # Rooms saved before tokens were derived carry one where ``gen`` goes
+            gen = rest[0] if rest and isinstance(rest[0], int) else 0
+            participants.append(Participant(sid=sid, name=name, gen=gen))
+        room = cls(host=participants[0])
+        for p in participants[1:]:
+            room.add_member(p)
+        room.host = room.seat(data["host"])
+        room.version = data.get("version", 0)
+        room.salt = data.get("salt", room.salt)
+        room.seats_issued = data.get("seats_issued", max(p.gen for p in participants))
+        room.last_active = data.get("last_active", room.last_active)
+        room.revealed = data.get("revealed", False)
+        room.exclusions = {g: set(rs) for g, rs in data.get("exclusions", {}).items()}
+        if data.get("draw"):
+            room.draw = Draw(*data["draw"])
+        return room
+
+
+# ------------ Room codes ------------
+CODE_ALPHABET = string.ascii_letters + string.digits
+
+
+class RoomCodeAllocator:
+    """Hands out room codes that are not already live.
+
+    Entropy is drawn ``batch`` bytes at a time and each byte is mapped onto the
+    alphabet by rejection: bytes at or above the largest multiple of the
+    alphabet size are skipped, so ``byte % size`` stays unbiased.
+    """
+
+    __slots__ = ("length", "alphabet", "keyspace", "collisions", "_batch", "_limit", "_buf", "_pos")
+
+    MAX_ATTEMPTS = 32
+
+    def __init__(self, length: int, alphabet: str = CODE_ALPHABET, batch: int = 4096) -> None:
+        if not 1 < len(alphabet) <= 256:
+            raise ValueError("Alphabet must have between 2 and 256 characters")
+        self.length = length
+        self.alphabet = alphabet
+        self.keyspace = len(alphabet) ** length
+        self.collisions = 0
+        self._batch = max(batch, length)
+        self._limit = 256 - 256 % len(alphabet)
+        self._buf = b""
+        self._pos = 0
+
+    def _code(self) -> str:
+        alphabet, size, limit = self.alphabet, len(self.alphabet), self._limit
+        out = []
+        while len(out) < self.length:
+            if self._pos >= len(self._buf):
+                self._buf = secrets.token_bytes(self._batch)
+                self._pos = 0
+            b = self._buf[self._pos]
+            self._pos += 1
+            if b < limit:
+                out.append(alphabet[b % size])
+        return "".join(out)
+
+    def allocate(
+        self, taken: Container[str] = (), owns: Callable[[str], bool] | None = None
+    ) -> str:
+        """Return a code not in ``taken`` (usually the room store).
+
+        Codes ``owns`` rejects (another worker's) are drawn again without
+        counting as attempts or collisions; it must accept some codes.
+        """
+        attempts = 0
+        while attempts < self.MAX_ATTEMPTS:
+            code = self._code()
+            if owns is not None and not owns(code):
+                continue
+            if code not in taken:
+                return code
+            self.collisions += 1
+            attempts += 1
+        raise RuntimeError("Room code keyspace exhausted")
+
+    def occupancy(self, live: int) -> float:
+        """Fraction of the keyspace used by ``live`` rooms.
+
+        This is also the chance that a fresh draw collides, so a value past a
+        few percent means ``ROOM_ID_LENGTH`` should grow.
+        """
+        return live / self.keyspace
+
+
+@functools.cache
+def code_allocator(length: int) -> RoomCodeAllocator:
+    return RoomCodeAllocator(length)
 
 
 # ------------ Helpers ------------
 def new_code(n) -> str:
-    alphabet = string.ascii_letters + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(n))
+    return "".join(secrets.choice(CODE_ALPHABET) for _ in range(n))
+
+
+# ------------ Derangements ------------
+DERANGEMENT_MODES = ("cycle", "uniform")
+
+
+def _shuffled(n: int) -> list[int]:
+    """Fisher-Yates over range(n) fed by a single CSPRNG read.
+
+    Each step maps a 64-bit draw onto [0, i] with a multiply-shift; the bias is
+    at most n / 2**64, far below anything observable.
+    """
+    perm = list(range(n))
+    draws = array("Q", secrets.token_bytes(8 * n))
+    for i in range(n - 1, 0, -1):
+        j = (draws[i] * (i + 1)) >> 64
+        perm[i], perm[j] = perm[j], perm[i]
+    return perm
+
+
+def _derangement_numpy(n: int, mode: str) -> list[int]:
+    import numpy as np
+
+    rng = np.random.default_rng(secrets.randbits(128))
+    if mode == "cycle":
+        order = rng.permutation(n)
+        out = np.empty(n, dtype=np.intp)
+        out[order] = np.roll(order, -1)
+        return out.tolist()
+    idx = np.arange(n)
+    while True:
+        perm = rng.permutation(n)
+        if not (perm == idx).any():
+            return perm.tolist()
+
+
+def derangement(n: int, mode: str = "cycle", use_numpy: bool = False) -> list[int]:
+    """Random permutation of range(n) with no fixed points (giver -> receiver).
+
+    ``cycle`` links everyone into one loop (what reveal has always done);
+    ``uniform`` picks any derangement with equal probability by rejecting
+    shuffles with a fixed point, about e ≈ 2.72 shuffles on average.
+    """
+    if n < 2:
+        raise ValueError("Need at least 2 participants")
+    if mode not in DERANGEMENT_MODES:
+        raise ValueError(f"Unknown derangement mode: {mode}")
+    if use_numpy:
+        return _derangement_numpy(n, mode)
+
+    if mode == "cycle":
+        # A uniformly shuffled ordering read as a loop is a uniform n-cycle
+        order = _shuffled(n)
+        out = [0] * n
+        for k in range(n):
+            out[order[k - 1]] = order[k]
+        return out
+    while True:
+        perm = _shuffled(n)
+        if not any(p == i for i, p in enumerate(perm)):
+            return perm
+
+
+def constrained_derangement(
+    n: int, excluded: Mapping[int, Collection[int]]
+) -> list[int] | None:
+    """Derangement where giver ``g`` never receives anyone in ``excluded[g]``.
+
+    Starts from a random cycle, keeps every pair that is allowed, and repairs
+    the rest as a bipartite matching. The allowed graph is the complement of
+    the exclusions, so each search is a BFS that visits every receiver once
+    and only re-checks receivers skipped because of an exclusion:
+    O(n + exclusions) per phase, each phase augmenting along every disjoint
+    shortest path it found. Returns None when no valid assignment exists.
+    """
+    start = derangement(n)
+    match_g = [-1] * n
+    match_r = [-1] * n
+    for g, r in enumerate(start):
+        if r not in excluded.get(g, ()):
+            match_g[g] = r
+            match_r[r] = g
+
+    order = _shuffled(n)
+    while True:
+        queue = [g for g in range(n) if match_g[g] == -1]
+        if not queue:
+            return match_g
 
+        # BFS over the complement graph from every free giver
+        parent = [-1] * n
+        free_found = []
+        unvisited = order
+        head = 0
+        while head < len(queue) and unvisited:
+            g = queue[head]
+            head += 1
+            ex = excluded.get(g, ())
+            keep = []
+            for r in unvisited:
+                if r == g or r in ex:
+                    keep.append(r)
+                    continue
+                parent[r] = g
+                h = match_r[r]
+                if h == -1:
+                    free_found.append(r)
+                else:
+                    queue.append(h)
+            unvisited = keep
+        if not free_found:
+            return None
 
-def knuth_shuffle[T](ls: list[T]) -> list[T]:
-    length = len(ls)
-    for i in range(0, length - 1):
-        j = secrets.choice(range(i+1, length))
-        ls[i], ls[j] = ls[j], ls[i]
-    return ls
+        # Augment along the tree paths that do not share a giver
+        used = [False] * n
+        for r in free_found:
+            path = []
+            g = parent[r]
+            while True:
+                if used[g]:
+                    path = None
+                    break
+                path.append(g)
+                if match_g[g] == -1:
+                    break
+                g = parent[match_g[g]]
+            if path is None:
+                continue
+            for g in path:
+                used[g] = True
+                prev = match_g[g]
+                match_g[g] = r
+                match_r[r] = g
+                r = prev
@@ -1,11 +1,217 @@
 import os
 
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType, UnionType
+
+
+class ConfigError(ValueError):
+    """Settings that are missing or invalid, all listed at once."""
+
+
+def _limits(**limits: tuple[float, float]):
+    return field(default_factory=lambda: MappingProxyType(limits))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Every app.config key the app reads, validated once by create_app.
+
+    Each field comes from the environment variable of the same name, else
+    from the config class passed to create_app, else the default below.
+    Nothing is read at import, so ``import config`` never fails.
+    """
+
+    FRONTEND_URL:   str
+    ROOM_ID_LENGTH: int
+
+    # Longest participant name accepted, in characters
+    NAME_MAX_LENGTH: int = 64
+
+    # "memory" (single worker) or "sqlite" (shared by every worker on the host;
+    # Flask-SocketIO servers only, app.asgi refuses it)
+    ROOM_STORE:      str = "memory"
+    ROOM_STORE_PATH: str = "rooms.sqlite3"
+    # The memory store splits rooms across shards by room code. With several
+    # workers each keeps only the shards pinned to it (shard % ROOM_WORKERS
+    # == ROOM_WORKER), and connections must be routed by room code to match
+    # (app.store.worker_for)
+    ROOM_SHARDS:  int = 16
+    ROOM_WORKER:  int = 0
+    ROOM_WORKERS: int = 1
+
+    # e.g. redis://localhost:6379/0 so emits fan out across workers
+    SOCKETIO_MESSAGE_QUEUE: str | None = None
+    # "json" (stdlib) or "orjson" (needs the orjson package)
+    SOCKETIO_JSON: str = "json"
+    # Also accept clients speaking MessagePack (socket.io-msgpack-parser),
+    # told apart from JSON ones by their first packet (needs msgpack)
+    SOCKETIO_MSGPACK: bool = False
+
+    # "cycle" (one loop through everyone) or "uniform" (any derangement)
+    REVEAL_MODE:  str = "cycle"
+    REVEAL_NUMPY: bool = False
+    # Hand reveal delivery to a background task so the handler returns at once
+    REVEAL_IN_BACKGROUND: bool = False
+
+    # Seconds to gather room_update broadcasts per room (0 sends each at once)
+    ROOM_UPDATE_WINDOW: float = 0
+    # "full" room_update snapshots, or "delta" versioned participant_added /
+    # participant_removed events with resync on demand
+    ROOM_UPDATE_PROTOCOL: str = "full"
+
+    # Seconds a room may sit idle / stay around after reveal (0 keeps it
+    # forever), how often the sweeper runs, and a cap on live rooms (0: none)
+    ROOM_TTL:            float = 21600
+    ROOM_FINISHED_TTL:   float = 900
+    ROOM_SWEEP_INTERVAL: float = 60
+    ROOM_MAX_ROOMS:      int = 0
+
+    # Seats per room and connected participants per process (0: no limit);
+    # joins past either get room_full
+    ROOM_MAX_MEMBERS:        int = 0
+    SERVER_MAX_PARTICIPANTS: int = 0
+    # Joins per second (and burst) a room announces one by one; past that
+    # they are seated at once but announced together with one room_update
+    # every ROOM_ADMISSION_WINDOW seconds (0: never batch)
+    ROOM_JOIN_RATE:        float = 0
+    ROOM_JOIN_BURST:       float = 20
+    ROOM_ADMISSION_WINDOW: float = 0.25
+
+    # Seconds a dropped connection keeps its seat "away" so the owner can
+    # reclaim it by token with no broadcasts or host change (0: leave at once)
+    RECONNECT_GRACE: float = 0
+    # Secret key seat tokens are derived from (an HMAC of room code and name);
+    # unset draws a fresh one at start-up, so it is required wherever a token
+    # has to outlive the process: snapshots and the shared sqlite store
+    SEAT_TOKEN_KEY: str | None = None
+
+    # Bearer token for POST /rooms bulk provisioning (unset disables it) and
+    # how many rooms one request may create
+    PROVISION_TOKEN:     str | None = None
+    PROVISION_MAX_ROOMS: int = 10000
+
+    # Serve Prometheus metrics at GET /metrics and time every socket handler
+    METRICS_ENABLED: bool = False
+
+    # Token bucket limits per event as (events per second, burst), for each
+    # sid and, with RATE_LIMIT_BY_ADDRESS, for each client address; unlisted
+    # events are never limited. Address limits are off by default: everyone
+    # behind one NAT (an office joining a 300-person invite) shares a bucket,
+    # and so does everyone behind a reverse proxy unless TRUSTED_PROXIES
+    # says how many X-Forwarded-For hops to read past. Under app.asgi that is
+    # the ASGI server's job instead (uvicorn --proxy-headers).
+    RATE_LIMIT_ENABLED:    bool = False
+    RATE_LIMIT_BY_ADDRESS: bool = False
+    TRUSTED_PROXIES:       int = 0
+    RATE_LIMITS_SID: Mapping[str, tuple[float, float]] = _limits(
+        create_room=(0.2, 3),
+        join_room=(0.5, 5),
+        reveal=(0.2, 3),
+        set_exclusions=(1, 10),
+        resync=(1, 10),
+        get_assignment=(1, 10),
+    )
+    RATE_LIMITS_IP: Mapping[str, tuple[float, float]] = _limits(
+        create_room=(1, 20),
+        join_room=(5, 50),  # unknown room codes cost the same as real ones
+    )
+    RATE_LIMIT_MAX_KEYS: int = 100000
+
+    # Append-only snapshot log of in-memory rooms, restored by create_app
+    # (unset disables snapshots)
+    SNAPSHOT_PATH:     str | None = None
+    SNAPSHOT_INTERVAL: float = 5
+
+    # Append-only journal of every socket event handled, written every
+    # JOURNAL_INTERVAL seconds, for tests/replay_journal.py (unset disables it)
+    JOURNAL_PATH:     str | None = None
+    JOURNAL_INTERVAL: float = 1
+
+    @classmethod
+    def load(cls, defaults: Mapping = MappingProxyType({}), environ: Mapping = os.environ) -> "Settings":
+        values, errors = {}, []
+        for f in fields(cls):
+            if f.name in environ:
+                try:
+                    values[f.name] = _parse(f.type, environ[f.name])
+                except ValueError as e:
+                    errors.append(f"{f.name}={environ[f.name]!r}: {e}")
+            elif f.name in defaults:
+                values[f.name] = defaults[f.name]
+        for name in ("FRONTEND_URL", "ROOM_ID_LENGTH"):
+            if name not in values:
+                errors.append(f"{name} is not set")
+        if not errors:
+            settings = cls(**values)
+            errors = settings.problems()
+        if errors:
+            raise ConfigError("; ".join(errors))
+        return settings
+
+    def problems(self) -> list[str]:
+        errors = [
+            f"{name} must be one of {', '.join(allowed)}"
+            for name, allowed in _CHOICES.items()
+            if getattr(self, name) not in allowed
+        ]
+        if self.ROOM_ID_LENGTH < 1:
+            errors.append("ROOM_ID_LENGTH must be at least 1")
+        if not 1 <= self.NAME_MAX_LENGTH <= 16383:
+            # Snapshots keep names behind a u16 byte length, 4 bytes a character
+            errors.append("NAME_MAX_LENGTH must be between 1 and 16383")
+        if not 1 <= self.ROOM_WORKERS <= self.ROOM_SHARDS:
+            errors.append("ROOM_WORKERS must be between 1 and ROOM_SHARDS")
+        if self.TRUSTED_PROXIES < 0:
+            errors.append("TRUSTED_PROXIES must not be negative")
+        if self.ROOM_JOIN_RATE and not self.ROOM_ADMISSION_WINDOW:
+            errors.append("ROOM_ADMISSION_WINDOW must be set with ROOM_JOIN_RATE")
+        if (self.SNAPSHOT_PATH or self.ROOM_STORE == "sqlite") and not self.SEAT_TOKEN_KEY:
+            errors.append("SEAT_TOKEN_KEY must be set with SNAPSHOT_PATH or the sqlite store")
+        if self.ROOM_WORKER >= self.ROOM_WORKERS:
+            errors.append("ROOM_WORKER must be below ROOM_WORKERS")
+        if self.JOURNAL_PATH and self.JOURNAL_INTERVAL <= 0:
+            # Nothing else would ever write the buffer out
+            errors.append("JOURNAL_INTERVAL must be positive with JOURNAL_PATH")
+        errors += [
+            f"{f.name} must not be negative"
+            for f in fields(self)
+            if f.type in (int, float) and getattr(self, f.name) < 0
+        ]
+        return errors
+
+    def items(self) -> list[tuple[str, object]]:
+        return [(f.name, getattr(self, f.name)) for f in fields(self)]
+
+
+_CHOICES = {
+    "ROOM_STORE": ("memory", "sqlite"),
+    "SOCKETIO_JSON": ("json", "orjson"),
+    "REVEAL_MODE": ("cycle", "uniform"),
+    "ROOM_UPDATE_PROTOCOL": ("full", "delta"),
+}
+
+
+def _parse(kind, raw: str):
+    if isinstance(kind, UnionType):  # str | None
+        return raw
+    if kind is bool:
+        if raw not in ("0", "1"):
+            raise ValueError("expected 0 or 1")
+        return raw == "1"
+    if kind in (int, float):
+        return kind(raw)
+    if kind is str:
+        return raw
+    raise ValueError(f"{kind} cannot be set from the environment")
+
+
 class BaseConfig:
-    FRONTEND_URL   = os.environ.get("FRONTEND_URL")
-    ROOM_ID_LENGTH = int(os.environ.get("ROOM_ID_LENGTH"))
+    """Per-environment defaults for Settings; the environment wins."""
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
 
 class ProductionConfig(BaseConfig):
     DEBUG = False
+    RATE_LIMIT_ENABLED = True
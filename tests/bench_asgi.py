@@ -0,0 +1,111 @@
+"""Idle connection density and event latency: Flask-SocketIO vs app.asgi.
+
+Run with ``python -m tests.bench_asgi [--connections 2000]``. Needs
+ROOM_ID_LENGTH like the test suite, plus uvicorn and websocket-client.
+Each mode is started as its own server process; RSS and thread counts come
+from /proc, so this is Linux only.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import websocket
+
+from tests.bench_load import RealClientDriver, Recorder, small_rooms
+
+SERVERS = {
+    "wsgi (threading)": [
+        sys.executable,
+        "-c",
+        "import sys; from app import create_app, socketio; "
+        "socketio.run(create_app(), port=int(sys.argv[1]), use_reloader=False, "
+        "log_output=False, allow_unsafe_werkzeug=True)",
+    ],
+    "asgi (uvicorn)": [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "--factory",
+        "app.asgi:create_asgi_app",
+        "--log-level",
+        "warning",
+        "--port",
+    ],
+}
+
+
+def _proc_status(pid: int) -> dict[str, str]:
+    with open(f"/proc/{pid}/status") as f:
+        return dict(line.rstrip("\n").split(":\t", 1) for line in f if ":\t" in line)
+
+
+def _rss_kb(pid: int) -> int:
+    return int(_proc_status(pid)["VmRSS"].split()[0])
+
+
+def _open_idle(port: int) -> websocket.WebSocket:
+    ws = websocket.create_connection(
+        f"ws://localhost:{port}/socket.io/?EIO=4&transport=websocket",
+        origin=f"http://localhost:{port}",
+    )
+    ws.recv()  # Engine.IO open
+    ws.send("40")  # Socket.IO connect to "/"
+    ws.recv()
+    return ws
+
+
+def measure(name: str, port: int, connections: int) -> dict:
+    env = {**os.environ, "FRONTEND_URL": f"http://localhost:{port}", "ROOM_SWEEP_INTERVAL": "0"}
+    server = subprocess.Popen(SERVERS[name] + [str(port)], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                _open_idle(port).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+
+        before = _rss_kb(server.pid)
+        sockets = [_open_idle(port) for _ in range(connections)]
+        time.sleep(1)
+        after = _rss_kb(server.pid)
+        threads = int(_proc_status(server.pid)["Threads"])
+
+        # Latency with the idle connections still open
+        rec = Recorder()
+        small_rooms(RealClientDriver(f"http://localhost:{port}"), rec, 25)
+        events = rec.summary(0)["events"]
+
+        for ws in sockets:
+            ws.close()
+        return {
+            "kb_per_connection": (after - before) / connections,
+            "threads": threads,
+            "join_p50_ms": events["join_room"]["p50_ms"],
+            "join_p99_ms": events["join_room"]["p99_ms"],
+            "reveal_p50_ms": events["reveal"]["p50_ms"],
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=3100)
+    args = parser.parse_args()
+
+    print(f"{'server':<18} {'KB/conn':>8} {'threads':>8} {'join p50':>9} {'join p99':>9} {'reveal p50':>11}")
+    for i, name in enumerate(SERVERS):
+        r = measure(name, args.port + i, args.connections)
+        print(
+            f"{name:<18} {r['kb_per_connection']:>8.1f} {r['threads']:>8}"
+            f" {r['join_p50_ms']:>9.2f} {r['join_p99_ms']:>9.2f} {r['reveal_p50_ms']:>11.2f}"
+        )
@@ -0,0 +1,20 @@
+"""Room codes per second: new_code() vs RoomCodeAllocator.
+
+Run with ``python -m tests.bench_codes``.
+"""
+
+import timeit
+
+from app.utilities import RoomCodeAllocator, new_code
+
+N = 100_000
+LENGTHS = (4, 6, 8)
+
+
+if __name__ == "__main__":
+    print(f"{'length':>6} {'new_code/s':>12} {'allocator/s':>12} {'speedup':>8}")
+    for length in LENGTHS:
+        allocator = RoomCodeAllocator(length)
+        old = N / timeit.timeit(lambda: new_code(length), number=N)
+        new = N / timeit.timeit(allocator.allocate, number=N)
+        print(f"{length:>6} {old:>12.0f} {new:>12.0f} {new / old:>7.1f}x")
@@ -0,0 +1,72 @@
+"""Cold start: import time of the app and of create_app, from ``-X importtime``.
+
+Run with ``python -m tests.bench_importtime [--out results.json]``. Needs
+FRONTEND_URL and ROOM_ID_LENGTH like the test suite. Each case runs in a
+fresh interpreter (best of ``--repeat``); ``--compare old.json`` prints the
+change against an earlier run so startup regressions show up across commits.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+CASES = {
+    "import config": "import config",
+    "import app.utilities": "import app.utilities",
+    "import app": "import app",
+    "create_app": "from app import create_app; create_app()",
+}
+
+
+def parse(stderr: str) -> tuple[float, dict[str, float]]:
+    """Total import ms and cumulative ms per top-level import."""
+    total, top = 0.0, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        if not name.startswith("  "):  # one space before top-level names
+            top[name.strip()] = int(cumulative_us) / 1e3
+    return total / 1e3, top
+
+
+def measure(stmt: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", stmt],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(parse(out.stderr))
+    total, top = min(runs, key=lambda r: r[0])
+    heaviest = sorted(top.items(), key=lambda kv: -kv[1])[:5]
+    return {"total_ms": total, "heaviest": dict(heaviest)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {name: measure(stmt, args.repeat) for name, stmt in CASES.items()}
+    print(f"{'case':<22} {'ms':>8} {'vs base':>8}  heaviest top-level imports (ms)")
+    for name, r in results.items():
+        old = baseline.get(name)
+        change = f"{r['total_ms'] / old['total_ms']:.2f}x" if old else ""
+        heaviest = ", ".join(f"{m} {ms:.0f}" for m, ms in r["heaviest"].items())
+        print(f"{name:<22} {r['total_ms']:>8.1f} {change:>8}  {heaviest}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
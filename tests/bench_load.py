@@ -0,0 +1,264 @@
+"""Socket protocol load harness: throughput and p50 / p99 latency per event.
+
+Run with ``python -m tests.bench_load [--out results.json]``. Needs
+FRONTEND_URL and ROOM_ID_LENGTH like the test suite. By default clients are
+``socketio.test_client`` instances, so handlers run inline and latency is
+handler time. With ``--url http://localhost:3000`` (start ``python main.py``
+first) real Socket.IO clients are used and latency is the round trip to the
+event's acknowledgement over a websocket (needs websocket-client, and
+FRONTEND_URL on the server must match the URL, as browsers send it as the
+Origin).
+
+``--compare old.json`` prints the p50 change per event against an earlier
+run, so results can be compared across commits.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+# name -> base size, multiplied by --scale
+WORKLOADS = {
+    "small_rooms": 200,  # rooms of 4: create, 3 joins, reveal, leave
+    "burst_join": 300,  # joins into one room
+    "churn": 20,  # rooms of 5 with 5 leave / rejoin rounds each
+    "large_reveal": 200,  # members revealed in one room
+}
+
+
+# ------------ Drivers ------------
+class TestClientDriver:
+    """In-process ``socketio.test_client`` clients."""
+
+    name = "test_client"
+
+    def __init__(self) -> None:
+        from app import create_app, socketio
+
+        self.app = create_app("config.DevelopmentConfig")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.socketio = socketio
+
+    def connect(self):
+        return self.socketio.test_client(self.app)
+
+    def call(self, client, event: str, data=None) -> None:
+        if data is None:
+            client.emit(event)
+        else:
+            client.emit(event, data)
+
+    def last(self, client, event: str) -> dict | None:
+        for pkt in reversed(client.get_received()):
+            if pkt.get("name") == event:
+                return pkt["args"][0]
+        return None
+
+    def drain(self, client) -> None:
+        client.get_received()
+
+    def disconnect(self, client) -> None:
+        client.disconnect()
+
+    def reset(self) -> None:
+        import app.rooms as rooms
+
+        rooms.STORE.clear()
+
+
+class RealClientDriver:
+    """python-socketio clients against a running server."""
+
+    def __init__(self, url: str) -> None:
+        self.url = self.name = url
+
+    def connect(self):
+        import socketio
+
+        client = socketio.Client()
+        client.events = {}
+        client.on("*", lambda event, data=None: client.events.__setitem__(event, data))
+        client.connect(self.url, transports=["websocket"], wait_timeout=10)
+        return client
+
+    def call(self, client, event: str, data=None) -> None:
+        # Handlers return None, which still comes back as an ack
+        client.call(event, data, timeout=30)
+
+    def last(self, client, event: str) -> dict | None:
+        return client.events.pop(event, None)
+
+    def drain(self, client) -> None:
+        client.events.clear()
+
+    def disconnect(self, client) -> None:
+        client.disconnect()
+
+    def reset(self) -> None:
+        pass
+
+
+# ------------ Recording ------------
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    @contextmanager
+    def timed(self, event: str):
+        start = time.perf_counter()
+        yield
+        self.samples[event].append(time.perf_counter() - start)
+
+    def summary(self, wall: float) -> dict:
+        events = {}
+        for event, samples in sorted(self.samples.items()):
+            samples.sort()
+            events[event] = {
+                "count": len(samples),
+                "per_s": len(samples) / sum(samples) if sum(samples) else None,
+                "p50_ms": _percentile(samples, 0.50) * 1e3,
+                "p99_ms": _percentile(samples, 0.99) * 1e3,
+            }
+        return {"wall_s": wall, "events": events}
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ------------ Workloads ------------
+def _room(driver, rec: Recorder, size: int) -> tuple[str, list]:
+    host = driver.connect()
+    with rec.timed("create_room"):
+        driver.call(host, "create_room", {"name": "Host"})
+    rid = driver.last(host, "room_created")["room_id"]
+
+    members = [host]
+    for i in range(1, size):
+        client = driver.connect()
+        with rec.timed("join_room"):
+            driver.call(client, "join_room", {"room_id": rid, "name": f"Guest {i}"})
+        members.append(client)
+    return rid, members
+
+
+def _reveal(driver, rec: Recorder, members: list) -> None:
+    for client in members:
+        driver.drain(client)
+    with rec.timed("reveal"):
+        driver.call(members[0], "reveal")
+
+
+def _leave(driver, rec: Recorder, members: list) -> None:
+    # Guests first so the host does not hand the room around
+    for client in reversed(members):
+        with rec.timed("disconnect"):
+            driver.disconnect(client)
+
+
+def small_rooms(driver, rec: Recorder, n: int) -> None:
+    for _ in range(n):
+        _, members = _room(driver, rec, 4)
+        _reveal(driver, rec, members)
+        _leave(driver, rec, members)
+
+
+def burst_join(driver, rec: Recorder, n: int) -> None:
+    _, members = _room(driver, rec, n)
+    _leave(driver, rec, members)
+
+
+def churn(driver, rec: Recorder, n: int) -> None:
+    rooms = [_room(driver, rec, 5) for _ in range(n)]
+    for round_ in range(5):
+        for rid, members in rooms:
+            leaving = members.pop()
+            with rec.timed("disconnect"):
+                driver.disconnect(leaving)
+            client = driver.connect()
+            with rec.timed("join_room"):
+                driver.call(client, "join_room", {"room_id": rid, "name": f"Late {round_}"})
+            members.append(client)
+            for member in members:
+                driver.drain(member)
+    for _, members in rooms:
+        _leave(driver, rec, members)
+
+
+def large_reveal(driver, rec: Recorder, n: int) -> None:
+    _, members = _room(driver, rec, n)
+    _reveal(driver, rec, members)
+    _leave(driver, rec, members)
+
+
+# ------------ Reporting ------------
+def run(driver, names: list[str], scale: float) -> dict:
+    results = {}
+    for name in names:
+        driver.reset()
+        rec = Recorder()
+        start = time.perf_counter()
+        globals()[name](driver, rec, max(2, int(WORKLOADS[name] * scale)))
+        results[name] = rec.summary(time.perf_counter() - start)
+    return results
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _print(results: dict, baseline: dict | None) -> None:
+    print(f"{'workload':<14} {'event':<12} {'count':>7} {'per s':>9} {'p50 ms':>8} {'p99 ms':>8} {'p50 vs base':>12}")
+    for workload, result in results.items():
+        for event, r in result["events"].items():
+            change = ""
+            if baseline:
+                old = baseline["workloads"].get(workload, {}).get("events", {}).get(event)
+                if old and old["p50_ms"]:
+                    change = f"{r['p50_ms'] / old['p50_ms']:.2f}x"
+            print(
+                f"{workload:<14} {event:<12} {r['count']:>7} {r['per_s'] or 0:>9.0f}"
+                f" {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {change:>12}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="run against this server instead of test clients")
+    parser.add_argument("--workload", action="append", choices=list(WORKLOADS))
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run")
+    args = parser.parse_args()
+
+    driver = RealClientDriver(args.url) if args.url else TestClientDriver()
+    results = run(driver, args.workload or list(WORKLOADS), args.scale)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print(results, baseline)
+
+    if args.out:
+        report = {
+            "commit": _commit(),
+            "mode": driver.name,
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "workloads": results,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,86 @@
+"""Bytes per room and per seat held by the room model.
+
+Run with ``python -m tests.bench_memory``.
+"""
+
+import random
+import secrets
+import tracemalloc
+
+from app.utilities import Participant, Room
+
+ROOM_SIZE = 10
+SIZES = (1_000, 10_000, 100_000)
+
+FIRST_NAMES = (
+    "Alice", "Bob", "Carol", "Dan", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy",
+    "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil", "Trent", "Victor", "Walter", "Zoë",
+    "Aoife", "Bjørn", "Chidi", "Dmitri", "Esperanza", "Fatima", "Giulia", "Hiroshi", "Ingrid", "José",
+)
+
+
+def _names(count: int, seed: int = 0) -> list:
+    # Players disambiguate with initials, nicknames and numbers, so few names repeat
+    rng = random.Random(seed)
+    names = []
+    for _ in range(count):
+        first = rng.choice(FIRST_NAMES)
+        style = rng.randrange(4)
+        if style == 0:
+            names.append((first,))
+        elif style == 1:
+            names.append((first, " ", chr(rng.randrange(65, 91)), "."))
+        elif style == 2:
+            names.append((first.lower(), "_", str(rng.randrange(1, 10_000))))
+        else:
+            names.append((first, " ", rng.choice(FIRST_NAMES), "son"))
+    return names
+
+
+def _measure(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def measure_room_memory(participants: int, room_size: int = ROOM_SIZE) -> dict:
+    # Sids are owned by the transport, so allocate them outside the measurement;
+    # names are joined inside it, like names decoded from a payload
+    sids = [secrets.token_urlsafe(15) for _ in range(participants)]
+    parts = _names(participants)
+    hosts = range(0, participants, room_size)
+
+    rooms = []
+    room_bytes = _measure(
+        lambda: rooms.extend(Room(host=Participant(sid=sids[i], name="".join(parts[i]))) for i in hosts)
+    )
+
+    def seat_guests():
+        for room, start in zip(rooms, hosts):
+            for i in range(start + 1, min(start + room_size, participants)):
+                room.add_member(Participant(sid=sids[i], name="".join(parts[i])))
+
+    seat_bytes = _measure(seat_guests)
+    seats = participants - len(rooms)
+
+    return {
+        "participants": participants,
+        "rooms": len(rooms),
+        "bytes": room_bytes + seat_bytes,
+        "bytes_per_room": room_bytes / len(rooms),
+        "bytes_per_seat": seat_bytes / seats if seats else 0.0,
+        "bytes_per_participant": (room_bytes + seat_bytes) / participants,
+    }
+
+
+if __name__ == "__main__":
+    print(f"{'participants':>12} {'rooms':>8} {'bytes/room':>12} {'bytes/seat':>12} {'bytes/participant':>18}")
+    for n in SIZES:
+        r = measure_room_memory(n)
+        print(
+            f"{r['participants']:>12} {r['rooms']:>8} {r['bytes_per_room']:>12.0f}"
+            f" {r['bytes_per_seat']:>12.1f} {r['bytes_per_participant']:>18.1f}"
+        )
@@ -0,0 +1,43 @@
+"""Per-event instrumentation overhead, metrics on vs off.
+
+Run with ``python -m tests.bench_metrics``.
+"""
+
+import time
+import timeit
+
+from app.metrics import Metrics
+
+N = 1_000_000
+PAYLOAD = '42["revealed",{"giftee_name":"Bob"}]'
+
+
+def _timed_noop(metrics: Metrics | None):
+    """The shape of rooms._timed around a handler that does nothing."""
+
+    def handler():
+        return None
+
+    def wrapper():
+        if metrics is None:
+            return handler()
+        start = time.perf_counter()
+        try:
+            return handler()
+        finally:
+            metrics.observe("join_room", time.perf_counter() - start)
+
+    return wrapper
+
+
+if __name__ == "__main__":
+    m = Metrics()
+    bare = timeit.timeit(lambda: None, number=N) / N
+    off = timeit.timeit(_timed_noop(None), number=N) / N
+    on = timeit.timeit(_timed_noop(m), number=N) / N
+    sent = timeit.timeit(lambda: m.count_sent(PAYLOAD), number=N) / N
+
+    print(f"{'path':<24} {'ns/event':>10}")
+    print(f"{'off (wrapper)':<24} {(off - bare) * 1e9:>10.0f}")
+    print(f"{'on (wrapper + observe)':<24} {(on - bare) * 1e9:>10.0f}")
+    print(f"{'count_sent':<24} {sent * 1e9:>10.0f}")
@@ -0,0 +1,72 @@
+"""CPU per room_update broadcast: payload rebuilt and encoded vs cached.
+
+Run with ``python -m tests.bench_payload [--members 1000]``. A broadcast is
+built once and encoded once by python-socketio's manager whatever the room
+size, so this is the work one emit does before any socket writes.
+"""
+
+import argparse
+import json
+import time
+
+from socketio import packet
+
+from app.packets import Packet, json_module
+from app.utilities import Participant, Room
+
+RID = "ABC123"
+
+
+def _room(members: int) -> Room:
+    room = Room(host=Participant(sid="s0", name="Host"))
+    for i in range(1, members):
+        room.add_member(Participant(sid=f"s{i}", name=f"Guest {i}"))
+    return room
+
+
+def _rebuilt(room: Room) -> str:
+    """What every broadcast did before: a fresh dict, checked and encoded."""
+    data = {
+        "room_id": RID,
+        "participants": room.names(),
+        "host_name": room.host.name,
+        "version": room.version,
+    }
+    pkt = packet.Packet(packet.EVENT, data=["room_update", data])
+    return pkt.encode()
+
+
+def _cached(room: Room) -> str:
+    return Packet(packet.EVENT, data=["room_update", room.payload(RID)]).encode()
+
+
+def _cpu_per_call(fn, room: Room, seconds: float = 1.0) -> float:
+    n = 0
+    start = time.process_time()
+    while time.process_time() - start < seconds:
+        for _ in range(100):
+            fn(room)
+        n += 100
+    return (time.process_time() - start) / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--json", default="json", help='"json" or "orjson"')
+    args = parser.parse_args()
+
+    packet.Packet.json = Packet.json = json_module(args.json)
+    room = _room(args.members)
+    assert json.loads(_rebuilt(room)[1:]) == json.loads(_cached(room)[1:])
+
+    rebuilt = _cpu_per_call(_rebuilt, room)
+    cached = _cpu_per_call(_cached, room)
+    # A membership change between broadcasts: the cache is rebuilt once
+    changed = _cpu_per_call(lambda r: (r.promote_host(), _cached(r)), room)
+
+    print(f"{'path':<28} {'us/broadcast':>13}")
+    print(f"{'rebuilt + encoded':<28} {rebuilt * 1e6:>13.1f}")
+    print(f"{'cached':<28} {cached * 1e6:>13.1f}")
+    print(f"{'cached, version changed':<28} {changed * 1e6:>13.1f}")
+    print(f"saved per broadcast: {(rebuilt - cached) * 1e6:.1f} us ({rebuilt / cached:.0f}x)")
@@ -0,0 +1,38 @@
+"""POST /rooms time for bulk provisioning, request to last NDJSON line.
+
+Run with ``python -m tests.bench_provision``. Needs FRONTEND_URL and
+ROOM_ID_LENGTH like the test suite.
+"""
+
+import time
+
+from app import create_app
+import app.rooms as rooms
+
+TOKEN = "bench"
+SIZES = (1_000, 10_000)
+
+
+def time_provision(client, count: int) -> float:
+    start = time.perf_counter()
+    response = client.post(
+        "/rooms",
+        json={"count": count, "host": "Organizer", "participants": ["Bob", "Carol"]},
+        headers={"Authorization": f"Bearer {TOKEN}"},
+    )
+    lines = response.get_data(as_text=True).count("\n")
+    elapsed = time.perf_counter() - start
+    assert lines == count
+    return elapsed
+
+
+if __name__ == "__main__":
+    app = create_app("config.DevelopmentConfig", background=False)
+    app.config["PROVISION_TOKEN"] = TOKEN
+    client = app.test_client()
+    print(f"{'rooms':>8} {'seconds':>9} {'rooms/s':>10}")
+    with app.app_context():
+        for count in SIZES:
+            rooms.STORE.clear()
+            elapsed = time_provision(client, count)
+            print(f"{count:>8} {elapsed:>9.3f} {count / elapsed:>10,.0f}")
@@ -0,0 +1,36 @@
+"""Assignment time for reveal at 10 / 1k / 100k participants.
+
+Run with ``python -m tests.bench_reveal``.
+"""
+
+import secrets
+import timeit
+
+from app.utilities import DERANGEMENT_MODES, derangement
+
+SIZES = (10, 1_000, 100_000)
+
+
+def sattolo(n: int) -> list[int]:
+    # The pre-engine reveal: one CSPRNG call and one range object per step
+    ls = list(range(n))
+    for i in range(0, n - 1):
+        j = secrets.choice(range(i + 1, n))
+        ls[i], ls[j] = ls[j], ls[i]
+    return ls
+
+
+def _time(fn, n: int) -> float:
+    number = max(1, 100_000 // n)
+    return timeit.timeit(lambda: fn(n), number=number) / number * 1e3
+
+
+if __name__ == "__main__":
+    variants = {"sattolo (old)": sattolo}
+    for mode in DERANGEMENT_MODES:
+        variants[mode] = lambda n, mode=mode: derangement(n, mode)
+        variants[f"{mode} numpy"] = lambda n, mode=mode: derangement(n, mode, use_numpy=True)
+
+    print(f"{'variant':>16}" + "".join(f"{n:>12}" for n in SIZES) + "   (ms)")
+    for label, fn in variants.items():
+        print(f"{label:>16}" + "".join(f"{_time(fn, n):>12.3f}" for n in SIZES))
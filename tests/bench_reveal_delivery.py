@@ -0,0 +1,46 @@
+"""End-to-end reveal time through socketio.test_client.
+
+Run with ``python -m tests.bench_reveal_delivery``. Needs FRONTEND_URL and
+ROOM_ID_LENGTH like the test suite.
+"""
+
+import time
+
+from app import create_app, socketio
+from app.utilities import Participant
+import app.rooms as rooms
+
+SIZES = (10, 1_000, 3_000)
+
+
+def time_reveal(app, n: int) -> float:
+    clients = [socketio.test_client(app) for _ in range(n)]
+    host = clients[0]
+    host.emit("create_room", {"name": "0"})
+    rid = host.get_received()[0]["args"][0]["room_id"]
+
+    # Seat everyone directly: n join broadcasts through test clients is O(n^3)
+    room = rooms.STORE.get(rid)
+    for i, client in enumerate(clients[1:], start=1):
+        sid = socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+        room.add_member(Participant(sid=sid, name=str(i)))
+        rooms.STORE.bind(sid, rid)
+    rooms.STORE.save(rid, room)
+
+    start = time.perf_counter()
+    host.emit("reveal")
+    elapsed = time.perf_counter() - start
+
+    assert all(c.get_received()[-1]["name"] == "revealed" for c in clients)
+    rooms.STORE.clear()  # skip n leave broadcasts on teardown
+    for client in clients:
+        client.disconnect()
+    return elapsed * 1e3
+
+
+if __name__ == "__main__":
+    app = create_app("config.DevelopmentConfig")
+    with app.app_context():
+        print(f"{'participants':>12} {'reveal ms':>10}")
+        for n in SIZES:
+            print(f"{n:>12} {time_reveal(app, n):>10.2f}")
@@ -0,0 +1,74 @@
+"""Room store throughput by shard count under multithreaded load.
+
+Run with ``python -m tests.bench_shards [--threads 16] [--hold-us 20]``.
+Each thread runs handler-shaped operations on random rooms: take the room
+lock, get, touch, save. ``--hold-us`` sleeps inside the lock, standing in
+for the socket writes handlers make while holding it (the sleep releases
+the GIL, as the writes do). Shards get one room lock each here, so shard
+count is lock count; a 1-shard store is one global lock.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from app.store import ShardedRoomStore
+from app.utilities import Participant, Room, RoomCodeAllocator
+
+SHARDS = (1, 2, 4, 8, 16, 32)
+
+
+def run(shards: int, threads: int, rooms: int, seconds: float, hold: float) -> float:
+    store = ShardedRoomStore(shards, stripes=1)
+    allocator = RoomCodeAllocator(6)
+    rids = []
+    for _ in range(rooms):
+        rid = allocator.allocate(store)
+        store.insert(rid, Room(host=Participant(sid=None, name="Host")))
+        rids.append(rid)
+
+    done = [0] * threads
+    # Each thread watches the clock itself: with the GIL never released a
+    # main thread setting a stop flag can be starved for a long time
+    deadline = time.perf_counter() + seconds
+
+    def worker(n: int) -> None:
+        rng = random.Random(n)
+        ops = 0
+        while time.perf_counter() < deadline:
+            rid = rng.choice(rids)
+            with store.room_lock(rid):
+                room = store.get(rid)
+                room.touch()
+                if hold:
+                    time.sleep(hold)
+                store.save(rid, room)
+            ops += 1
+        done[n] = ops
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(done) / seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rooms", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--hold-us", type=float, default=20.0)
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{args.threads} threads, {args.hold_us:g} us held per operation, GIL {'on' if gil else 'off'}")
+    print(f"{'shards':>6} {'ops/s':>10} {'vs 1 shard':>11}")
+    base = None
+    for shards in SHARDS:
+        rate = run(shards, args.threads, args.rooms, args.seconds, args.hold_us / 1e6)
+        base = base or rate
+        print(f"{shards:>6} {rate:>10.0f} {rate / base:>10.2f}x")
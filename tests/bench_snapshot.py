@@ -0,0 +1,65 @@
+"""Snapshot write and warm-restart restore times.
+
+Run with ``python -m tests.bench_snapshot``.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from app.snapshot import SnapshotLog, put_record
+from app.utilities import Participant, Room
+
+ROOM_SIZE = 10
+SIZES = (10_000, 100_000)
+
+
+def _rooms(participants: int) -> dict[str, Room]:
+    rooms = {}
+    for start in range(0, participants, ROOM_SIZE):
+        room = Room(host=Participant(sid=f"s{start}", name="Guest 0"))
+        for i in range(1, ROOM_SIZE):
+            room.add_member(Participant(sid=f"s{start + i}", name=f"Guest {i}"))
+        rooms[f"r{start}"] = room
+    return rooms
+
+
+def measure_snapshot(participants: int) -> dict:
+    rooms = _rooms(participants)
+    with tempfile.TemporaryDirectory() as tmp:
+        log = SnapshotLog(os.path.join(tmp, "rooms.snapshot"))
+
+        t0 = time.perf_counter()
+        log.compact([put_record(rid, room) for rid, room in rooms.items()])
+        write = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        restored = log.load()
+        restore = time.perf_counter() - t0
+        size = os.path.getsize(log.path)
+    assert len(restored) == len(rooms)
+
+    # The JSON the SQLite store writes, for comparison
+    t0 = time.perf_counter()
+    for data in [json.dumps(room.to_dict()) for room in rooms.values()]:
+        Room.from_dict(json.loads(data))
+    json_roundtrip = time.perf_counter() - t0
+
+    return {
+        "participants": participants,
+        "bytes": size,
+        "write_s": write,
+        "restore_s": restore,
+        "json_roundtrip_s": json_roundtrip,
+    }
+
+
+if __name__ == "__main__":
+    print(f"{'participants':>12} {'bytes':>10} {'write s':>8} {'restore s':>10} {'json s':>8}")
+    for n in SIZES:
+        r = measure_snapshot(n)
+        print(
+            f"{r['participants']:>12} {r['bytes']:>10} {r['write_s']:>8.3f}"
+            f" {r['restore_s']:>10.3f} {r['json_roundtrip_s']:>8.3f}"
+        )
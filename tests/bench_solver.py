@@ -0,0 +1,30 @@
+"""Constrained reveal time for large rooms with dense exclusion graphs.
+
+Run with ``python -m tests.bench_solver``.
+"""
+
+import random
+import time
+
+from app.utilities import constrained_derangement
+
+SIZES = (500, 1_000, 2_000)
+DENSITIES = (0.1, 0.5, 0.9)
+
+
+def _excluded(n: int, density: float, rng: random.Random) -> dict[int, set[int]]:
+    k = int(n * density)
+    return {g: set(rng.sample(range(n), k)) for g in range(n)}
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    print(f"{'n':>6} {'density':>8} {'ms':>10}")
+    for n in SIZES:
+        for density in DENSITIES:
+            excluded = _excluded(n, density, rng)
+            start = time.perf_counter()
+            giftees = constrained_derangement(n, excluded)
+            elapsed = (time.perf_counter() - start) * 1e3
+            assert giftees is not None
+            print(f"{n:>6} {density:>8.1f} {elapsed:>10.2f}")
@@ -0,0 +1,76 @@
+"""Bytes on the wire and encode time per packet: JSON vs MessagePack.
+
+Run with ``python -m tests.bench_wire [--sizes 10 100 1000]``. Needs msgpack.
+``room_update`` is one broadcast to the whole room; ``revealed`` is one
+small packet per member, so its numbers are totals over the room. The
+MessagePack column includes re-encoding the server's JSON packet, which is
+what a MessagePack client costs.
+"""
+
+import argparse
+import time
+
+from engineio import packet as eio_packet
+from socketio import packet
+
+from app.packets import MsgPackCodec, Packet
+from app.utilities import Participant, Room
+
+RID = "ABC123"
+
+
+def _room(members: int) -> Room:
+    room = Room(host=Participant(sid="s0", name="Host"))
+    for i in range(1, members):
+        room.add_member(Participant(sid=f"s{i}", name=f"Guest {i}"))
+    return room
+
+
+def _json_packets(event: str, payloads: list) -> list:
+    return [
+        eio_packet.Packet(
+            eio_packet.MESSAGE, data=Packet(packet.EVENT, data=[event, data]).encode()
+        )
+        for data in payloads
+    ]
+
+
+def _msgpack_packets(codec: MsgPackCodec, event: str, payloads: list) -> list:
+    return [codec.encode(pkt) for pkt in _json_packets(event, payloads)]
+
+
+def _cpu(fn, seconds: float = 0.5) -> float:
+    n = 0
+    start = time.process_time()
+    while time.process_time() - start < seconds:
+        fn()
+        n += 1
+    return (time.process_time() - start) / n
+
+
+def _size(packets: list) -> int:
+    return sum(len(pkt.data) for pkt in packets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    codec = MsgPackCodec()
+    print(f"{'event':<12} {'members':>8} {'json B':>10} {'msgpack B':>10} {'json us':>9} {'msgpack us':>11}")
+    for members in args.sizes:
+        room = _room(members)
+        cases = {
+            "room_update": [room.payload(RID)],
+            "revealed": [{"giftee_name": name} for name in room.names()],
+        }
+        for event, payloads in cases.items():
+            json_bytes = _size(_json_packets(event, payloads))
+            msgpack_bytes = _size(_msgpack_packets(codec, event, payloads))
+            json_time = _cpu(lambda: _json_packets(event, payloads))
+            msgpack_time = _cpu(lambda: _msgpack_packets(codec, event, payloads))
+            print(
+                f"{event:<12} {members:>8} {json_bytes:>10} {msgpack_bytes:>10}"
+                f" {json_time * 1e6:>9.1f} {msgpack_time * 1e6:>11.1f}"
+            )
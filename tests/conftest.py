@@ -35,8 +35,6 @@ def make_sios(app):
 @pytest.fixture(autouse=True)
 def reset_rooms():
     """Clear in-memory state between tests."""
-    rooms.ROOMS.clear()
-    rooms.SID_TO_RID.clear()
+    rooms.STORE.clear()
     yield
-    rooms.ROOMS.clear()
-    rooms.SID_TO_RID.clear()
+    rooms.STORE.clear()
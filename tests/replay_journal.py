@@ -0,0 +1,85 @@
+"""Drive a recorded event journal through socketio.test_client at full speed.
+
+Run with ``python -m tests.replay_journal journal.bin [--repeat 3]``. Needs
+FRONTEND_URL and ROOM_ID_LENGTH like the test suite; record the journal by
+setting JOURNAL_PATH on the server. Each recorded sid gets its own client,
+connected at its first event and dropped at its disconnect. Room codes are
+fresh in the replay, so join_room is pointed at whichever replayed room
+stands in for the recorded one. Draws are fresh too, and so are seat
+tokens, which the journal does not keep: a recorded token rejoin is sent
+with the token the replay was handed for that seat, so it reclaims the
+seat just as it did when recorded.
+"""
+
+import argparse
+import time
+
+from collections import Counter
+
+from app import create_app, socketio
+from app.journal import Entry, read_journal
+import app.rooms as rooms
+
+
+def replay(app, entries: list[Entry]) -> Counter:
+    """Send ``entries`` in order; returns how many of each event were sent."""
+    clients = {}
+    rids: dict[str, str] = {}
+    tokens: dict[tuple[str, str], str] = {}  # (replayed rid, name) -> token
+    sent: Counter = Counter()
+    for entry in entries:
+        client = clients.get(entry.sid)
+        if entry.event == "disconnect":
+            if client is not None:
+                client.disconnect()
+                del clients[entry.sid]
+                sent[entry.event] += 1
+            continue
+        if client is None:
+            client = clients[entry.sid] = socketio.test_client(app)
+
+        args = entry.args
+        data = args[0] if args and isinstance(args[0], dict) else {}
+        if entry.event == "join_room" and data.get("room_id") in rids:
+            rid = rids[data["room_id"]]
+            data = {**data, "room_id": rid}
+            if "token" in data:
+                data["token"] = tokens.get((rid, str(data.get("name")).strip()), data["token"])
+            args = [data, *args[1:]]
+        client.emit(entry.event, *args)
+        received = client.get_received()
+        sent[entry.event] += 1
+
+        if entry.rid:
+            sid = socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+            rid = rooms.STORE.rid_for(sid)
+            if rid:
+                rids.setdefault(entry.rid, rid)
+                for pkt in received:
+                    payload = pkt["args"][0] if pkt["args"] else None
+                    if isinstance(payload, dict) and "token" in payload:
+                        tokens[rid, str(data.get("name")).strip()] = payload["token"]
+
+    for client in clients.values():
+        client.disconnect()
+    return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("journal")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = list(read_journal(args.journal))
+    flask_app = create_app("config.DevelopmentConfig", background=False)
+    with flask_app.app_context():
+        for run in range(args.repeat):
+            rooms.STORE.clear()
+            start = time.perf_counter()
+            sent = replay(flask_app, entries)
+            elapsed = time.perf_counter() - start
+            total = sum(sent.values())
+            print(f"run {run + 1}: {total} events in {elapsed:.3f} s ({total / elapsed:,.0f}/s)")
+        for event, count in sent.most_common():
+            print(f"  {event:<16} {count}")
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import create_app
+from app.asgi import _run_loop, create_asgi_app
+from config import ConfigError
+import app.rooms as rooms
+
+ENVIRON = {
+    "REQUEST_METHOD": "GET",
+    "PATH_INFO": "/socket.io/",
+    "SERVER_NAME": "asgi",
+    "SERVER_PORT": "0",
+    "wsgi.url_scheme": "http",
+}
+
+
+@pytest.fixture
+def server():
+    """AsyncServer from app.asgi with its outgoing calls recorded."""
+    sio = create_asgi_app("config.DevelopmentConfig").sio
+    sio.sent = []
+
+    async def emit(event, data, to=None, skip_sid=None):
+        sio.sent.append((event, data, to, skip_sid))
+
+    async def enter_room(sid, room):
+        sio.sent.append(("enter", sid, room))
+
+    sio.emit = emit
+    sio.enter_room = enter_room
+    sio.get_environ = lambda sid, namespace=None: ENVIRON
+    return sio
+
+
+def _fire(sio, event: str, sid: str, *args) -> list[tuple]:
+    sio.sent = []
+    asyncio.run(sio.handlers["/"][event](sid, *args))
+    return sio.sent
+
+
+# ------------ ASGI adapter tests ------------
+def test_asgi_serves_every_flask_event(server):
+    assert set(server.handlers["/"]) == {
+        "create_room",
+        "join_room",
+        "disconnect",
+        "reveal",
+        "get_assignment",
+        "set_exclusions",
+        "resync",
+    }
+
+
+def test_asgi_runs_shared_handlers(server):
+    # Act
+    created = _fire(server, "create_room", "s1", {"name": "Alice"})
+    rid = created[1][1]["room_id"]
+    joined = _fire(server, "join_room", "s2", {"room_id": rid, "name": "Bob"})
+    revealed = _fire(server, "reveal", "s1")
+
+    # Assert: effects are sent in the order the handler made them
+    assert created[0] == ("enter", "s1", rid)
+    assert created[1][0] == "room_created" and created[1][2] == "s1"
+    assert [e[0] for e in joined] == ["enter", "joined", "joined", "room_update"]
+    assert joined[2] == ("joined", {"name": "Bob"}, rid, "s2")
+    assert sorted((e[0], e[2]) for e in revealed) == [("revealed", "s1"), ("revealed", "s2")]
+    assert rooms.STORE.get(rid).revealed
+
+
+def test_asgi_disconnect_ignores_reason(server):
+    # Setup
+    rid = _fire(server, "create_room", "s1", {"name": "Alice"})[1][1]["room_id"]
+    _fire(server, "join_room", "s2", {"room_id": rid, "name": "Bob"})
+
+    # Act
+    sent = _fire(server, "disconnect", "s1", "client disconnect")
+
+    # Assert
+    assert ("host_changed", {"host_name": "Bob", "version": 3}, rid, None) in sent
+    assert rooms.STORE.get(rid).names() == ["Bob"]
+
+
+# ------------ Background loop tests ------------
+def test_file_ticks_run_off_the_event_loop(server):
+    # Setup
+    ran_on = []
+    intervals = iter([0.001, 0.001])
+
+    def tick():
+        ran_on.append(threading.get_ident())
+
+    # Act: one pass (the interval is read before and for the sleep)
+    app = create_app(background=False)
+    asyncio.run(_run_loop(app, server, lambda: next(intervals, 0), tick, in_thread=True))
+
+    # Assert
+    assert len(ran_on) == 1
+    assert ran_on[0] != threading.get_ident()
+
+
+def test_failed_tick_keeps_the_loop_going(server):
+    # Setup
+    calls = []
+    intervals = iter([0.001] * 4)
+
+    def tick():
+        calls.append(1)
+        raise OSError("disk full")
+
+    # Act: two passes
+    app = create_app(background=False)
+    asyncio.run(_run_loop(app, server, lambda: next(intervals, 0), tick))
+
+    # Assert
+    assert len(calls) == 2
+
+
+def test_asgi_refuses_the_sqlite_store(monkeypatch, tmp_path):
+    # Setup
+    monkeypatch.setenv("ROOM_STORE", "sqlite")
+    monkeypatch.setenv("ROOM_STORE_PATH", str(tmp_path / "rooms.sqlite3"))
+    monkeypatch.setenv("SEAT_TOKEN_KEY", "k")
+
+    # Act / Assert
+    with pytest.raises(ConfigError, match="sqlite"):
+        create_asgi_app("config.DevelopmentConfig")
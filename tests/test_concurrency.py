@@ -0,0 +1,115 @@
+import sys
+import threading
+
+import pytest
+
+import app.rooms as rooms
+from app import socketio
+
+
+@pytest.fixture(autouse=True)
+def fast_thread_switching():
+    """Switch threads far more often than the 5ms default to provoke races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _run_threads(targets) -> None:
+    threads = [threading.Thread(target=t) for t in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def _assert_consistent() -> None:
+    """Every bound sid sits in exactly its room and every host is a member."""
+    store = rooms.STORE
+    members = 0
+    for rid, room in store.rooms.items():
+        assert room.host is not None and room.get(room.host.sid) is room.host
+        for p in room.participants:
+            assert store.rid_for(p.sid) == rid
+        members += len(room)
+    assert members == store.sid_count()
+
+
+def _sid(client) -> str:
+    return socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+
+
+# ------------ Stress tests ------------
+def test_concurrent_joins_into_one_room(make_sios):
+    # Setup
+    host, *guests = make_sios(65)
+    host.emit("create_room", {"name": "Host"})
+    rid = host.get_received()[0]["args"][0]["room_id"]
+
+    # Act
+    _run_threads(
+        lambda c=c, i=i: c.emit("join_room", {"room_id": rid, "name": str(i)})
+        for i, c in enumerate(guests)
+    )
+
+    # Assert
+    assert len(rooms.STORE.get(rid)) == 65
+    _assert_consistent()
+
+
+def test_concurrent_double_join_lands_in_one_room(make_sios):
+    # Setup
+    hosts = make_sios(2)
+    rids = []
+    for host in hosts:
+        host.emit("create_room", {"name": "Host"})
+        rids.append(host.get_received()[0]["args"][0]["room_id"])
+    guests = make_sios(32)
+
+    # Act: each guest races itself into both rooms
+    _run_threads(
+        lambda c=c, rid=rid: c.emit("join_room", {"room_id": rid, "name": "Guest" + _sid(c)})
+        for c in guests
+        for rid in rids
+    )
+
+    # Assert
+    for c in guests:
+        rid = rooms.STORE.rid_for(_sid(c))
+        assert [r for r in rids if rooms.STORE.get(r).get(_sid(c))] == [rid]
+    _assert_consistent()
+
+
+def test_concurrent_churn_across_rooms(make_sios):
+    # Setup
+    hosts = make_sios(8)
+    rids = []
+    for host in hosts:
+        host.emit("create_room", {"name": "Host"})
+        rids.append(host.get_received()[0]["args"][0]["room_id"])
+    guests = make_sios(8 * 16)
+
+    # python-socketio's own pending-disconnect bookkeeping is not thread-safe,
+    # so leaves go one at a time while joins race against them
+    leaving = threading.Lock()
+
+    def leave(client) -> None:
+        with leaving:
+            client.disconnect()
+
+    def churn(i: int) -> None:
+        rid = rids[i % len(rids)]
+        guests[i].emit("join_room", {"room_id": rid, "name": str(i)})
+        if i % 2:
+            leave(guests[i])
+
+    # Act: joins, leaves and host departures all at once
+    _run_threads(
+        [lambda i=i: churn(i) for i in range(len(guests))]
+        + [lambda h=h: leave(h) for h in hosts[::2]]
+    )
+
+    # Assert
+    _assert_consistent()
+    assert rooms.STORE.sid_count() == 8 * 16 // 2 + 4
@@ -0,0 +1,113 @@
+import dataclasses
+
+import pytest
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import create_app
+import app.rooms as rooms
+from config import ConfigError, ProductionConfig, Settings
+
+ENV = {"FRONTEND_URL": "http://localhost:5173", "ROOM_ID_LENGTH": "6"}
+
+
+# ------------ Settings tests ------------
+def test_settings_parse_environment():
+    # Act
+    settings = Settings.load(environ={**ENV, "ROOM_TTL": "60", "METRICS_ENABLED": "1"})
+
+    # Assert
+    assert settings.ROOM_ID_LENGTH == 6
+    assert settings.ROOM_TTL == 60.0
+    assert settings.METRICS_ENABLED is True
+    assert settings.SNAPSHOT_PATH is None
+    assert settings.RATE_LIMITS_SID["join_room"] == (0.5, 5)
+
+
+def test_settings_environment_beats_config_class():
+    # Act
+    from_class = Settings.load(vars(ProductionConfig), ENV)
+    from_env = Settings.load(vars(ProductionConfig), {**ENV, "RATE_LIMIT_ENABLED": "0"})
+
+    # Assert
+    assert from_class.RATE_LIMIT_ENABLED is True
+    assert from_env.RATE_LIMIT_ENABLED is False
+
+
+def test_settings_list_every_problem():
+    # Act
+    with pytest.raises(ConfigError) as e:
+        Settings.load(
+            environ={
+                "ROOM_ID_LENGTH": "six",
+                "ROOM_STORE": "redis",
+                "METRICS_ENABLED": "true",
+                "ROOM_TTL": "-1",
+            }
+        )
+
+    # Assert: parse errors first, then what could not be checked without them
+    message = str(e.value)
+    assert "ROOM_ID_LENGTH='six'" in message
+    assert "METRICS_ENABLED='true': expected 0 or 1" in message
+    assert "FRONTEND_URL is not set" in message
+
+    with pytest.raises(ConfigError, match="ROOM_STORE must be one of memory, sqlite.*ROOM_TTL must not be negative"):
+        Settings.load(environ={**ENV, "ROOM_STORE": "redis", "ROOM_TTL": "-1"})
+    with pytest.raises(ConfigError, match="ROOM_WORKER must be below ROOM_WORKERS"):
+        Settings.load(environ={**ENV, "ROOM_WORKER": "2", "ROOM_WORKERS": "2"})
+    with pytest.raises(ConfigError, match="SEAT_TOKEN_KEY must be set"):
+        Settings.load(environ={**ENV, "SNAPSHOT_PATH": "rooms.log"})
+    with pytest.raises(ConfigError, match="JOURNAL_INTERVAL must be positive"):
+        Settings.load(environ={**ENV, "JOURNAL_PATH": "events.journal", "JOURNAL_INTERVAL": "0"})
+
+
+def test_settings_are_immutable():
+    # Setup
+    settings = Settings.load(environ=ENV)
+
+    # Act / Assert
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.ROOM_ID_LENGTH = 1
+    with pytest.raises(TypeError):
+        settings.RATE_LIMITS_IP["reveal"] = (1, 1)
+
+
+def test_create_app_rejects_missing_room_id_length(monkeypatch):
+    # Setup
+    monkeypatch.delenv("ROOM_ID_LENGTH", raising=False)
+
+    # Act / Assert
+    with pytest.raises(ConfigError, match="ROOM_ID_LENGTH is not set"):
+        create_app("config.DevelopmentConfig")
+
+
+def test_create_app_keeps_its_settings(monkeypatch):
+    # Setup
+    monkeypatch.setenv("ROOM_TTL", "60")
+
+    # Act
+    app = create_app("config.ProductionConfig", background=False)
+
+    # Assert
+    settings = app.extensions["settings"]
+    assert isinstance(settings, Settings)
+    assert settings.ROOM_TTL == 60
+    assert settings.RATE_LIMIT_ENABLED is True
+    assert app.config["ROOM_TTL"] == settings.ROOM_TTL
+
+
+def test_address_limits_are_opt_in(monkeypatch):
+    # Act
+    default = create_app("config.ProductionConfig", background=False)
+    default_ip_buckets = dict(rooms.LIMITER._ip)
+    monkeypatch.setenv("RATE_LIMIT_BY_ADDRESS", "1")
+    monkeypatch.setenv("TRUSTED_PROXIES", "1")
+    proxied = create_app("config.ProductionConfig", background=False)
+
+    # Assert: off unless asked for, and then read past the proxy
+    assert default_ip_buckets == {}
+    assert not isinstance(default.wsgi_app, ProxyFix)
+    assert set(rooms.LIMITER._ip) == {"create_room", "join_room"}
+    assert isinstance(proxied.wsgi_app, ProxyFix)
+    assert proxied.wsgi_app.x_for == 1
@@ -0,0 +1,52 @@
+from app import socketio
+from app.delivery import Coalescer, emit_each
+
+
+# ------------ Bulk delivery tests ------------
+def test_emit_each_sends_one_payload_per_sid(make_sios):
+    # Setup
+    clients = make_sios(3)
+    sids = [socketio.server.manager.sid_from_eio_sid(c.eio_sid, "/") for c in clients]
+
+    # Act
+    sent = emit_each("revealed", [(sid, {"giftee_name": str(i)}) for i, sid in enumerate(sids)])
+
+    # Assert
+    assert sent == 3
+    for i, client in enumerate(clients):
+        assert client.get_received() == [
+            {"name": "revealed", "args": [{"giftee_name": str(i)}], "namespace": "/"}
+        ]
+
+
+def test_emit_each_skips_unknown_sids(sio):
+    sent = emit_each("revealed", [("gone", {"giftee_name": "Bob"})])
+
+    assert sent == 0
+    assert sio.get_received() == []
+
+
+# ------------ Coalescer tests ------------
+def test_coalescer_sends_immediately_without_window():
+    coalescer = Coalescer()
+
+    assert not coalescer.request("abc")
+    assert coalescer.flush(lambda key: None) == 0
+    assert coalescer.coalesced == 0
+
+
+def test_coalescer_sends_each_key_once_per_flush():
+    # Setup
+    coalescer = Coalescer(window=0.05)
+    sent = []
+
+    # Act
+    for key in ["abc", "def", "abc", "abc"]:
+        assert coalescer.request(key)
+    flushed = coalescer.flush(sent.append)
+
+    # Assert
+    assert flushed == 2
+    assert sent == ["abc", "def"]
+    assert coalescer.coalesced == 2
+    assert coalescer.flush(sent.append) == 0
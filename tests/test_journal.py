@@ -0,0 +1,205 @@
+import pytest
+
+import app.rooms as rooms
+
+from app.journal import MAGIC, REDACTED, EventJournal, read_journal
+from tests.replay_journal import replay
+
+
+def _get_packet(received, name):
+    for pkt in received:
+        if pkt["name"] == name:
+            return pkt["args"][0]
+    return None
+
+
+# ------------ Journal file tests ------------
+def test_records_are_buffered_until_flush(tmp_path):
+    # Setup
+    path = tmp_path / "events.journal"
+    journal = EventJournal(str(path))
+
+    # Act
+    journal.record("join_room", "s1", "ABC123", ({"room_id": "ABC123", "name": "Zoë"},))
+    journal.record("resync", "s1", None, ())
+    before_flush = path.exists()
+    flushed = journal.flush()
+
+    # Assert
+    assert not before_flush
+    assert flushed == 2
+    assert journal.flush() == 0
+    entries = list(read_journal(str(path)))
+    assert [(e.event, e.sid, e.rid, e.args) for e in entries] == [
+        ("join_room", "s1", "ABC123", [{"room_id": "ABC123", "name": "Zoë"}]),
+        ("resync", "s1", "", []),
+    ]
+    assert entries[0].time <= entries[1].time
+
+
+def test_torn_journal_tail_is_skipped(tmp_path):
+    # Setup
+    path = tmp_path / "events.journal"
+    journal = EventJournal(str(path))
+    journal.record("create_room", "s1", "ABC123", ({"name": "Alice"},))
+    journal.record("reveal", "s1", "ABC123", ())
+    journal.flush()
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+
+    # Act
+    entries = list(read_journal(str(path)))
+
+    # Assert
+    assert data.startswith(MAGIC)
+    assert [e.event for e in entries] == ["create_room"]
+
+
+def test_seat_tokens_are_not_journaled(tmp_path):
+    # Setup
+    path = tmp_path / "events.journal"
+    journal = EventJournal(str(path))
+    data = {"room_id": "ABC123", "name": "Bob", "token": "secret-token"}
+
+    # Act
+    journal.record("join_room", "s1", "ABC123", (data,))
+    journal.flush()
+
+    # Assert
+    assert b"secret-token" not in path.read_bytes()
+    (entry,) = read_journal(str(path))
+    assert entry.args == [{"room_id": "ABC123", "name": "Bob", "token": REDACTED}]
+    assert data["token"] == "secret-token"
+
+
+def test_binary_args_are_journaled_as_text(tmp_path):
+    # Setup
+    path = tmp_path / "events.journal"
+    journal = EventJournal(str(path))
+
+    # Act
+    journal.record("create_room", "s1", None, (b"\x00\xff", {"name": b"Al"}, {1, 2}))
+    journal.flush()
+
+    # Assert
+    (entry,) = read_journal(str(path))
+    assert entry.args == ["AP8=", {"name": "QWw="}, "{1, 2}"]
+
+
+def test_failed_flush_keeps_records_for_the_next(tmp_path):
+    # Setup: a directory where the file should be makes the write fail
+    path = tmp_path / "events.journal"
+    journal = EventJournal(str(path))
+    journal.record("reveal", "s1", "ABC123", ())
+    path.mkdir()
+
+    # Act
+    with pytest.raises(OSError):
+        journal.flush()
+    journal.record("resync", "s1", "ABC123", ())
+    path.rmdir()
+    flushed = journal.flush()
+
+    # Assert
+    assert flushed == 2
+    assert [e.event for e in read_journal(str(path))] == ["reveal", "resync"]
+
+
+def test_buffer_is_capped(monkeypatch, tmp_path):
+    # Setup
+    monkeypatch.setattr(EventJournal, "MAX_BUFFERED", 2)
+    journal = EventJournal(str(tmp_path / "events.journal"))
+
+    # Act
+    for _ in range(5):
+        journal.record("resync", "s1", None, ())
+
+    # Assert
+    assert journal.flush() == 2
+    assert journal.dropped == 3
+
+
+# ------------ Record and replay tests ------------
+def test_every_handled_event_is_journaled(make_sios, monkeypatch, tmp_path):
+    # Setup
+    path = str(tmp_path / "events.journal")
+    monkeypatch.setattr(rooms, "JOURNAL", EventJournal(path))
+    host, bob = make_sios(2)
+
+    # Act
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})  # rejected, still kept
+    bob.disconnect()
+    rooms.flush_journal()
+
+    # Assert
+    entries = list(read_journal(path))
+    assert [(e.event, e.rid) for e in entries] == [
+        ("create_room", rid),
+        ("join_room", rid),
+        ("join_room", rid),
+        ("disconnect", ""),
+    ]
+    assert entries[0].sid != entries[1].sid == entries[3].sid
+
+
+def test_replay_matches_the_recording(app, make_sios, monkeypatch, tmp_path):
+    # Setup: record a room, then forget it
+    recorded = str(tmp_path / "recorded.journal")
+    monkeypatch.setattr(rooms, "JOURNAL", EventJournal(recorded))
+    host, bob, carol = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+    carol.emit("join_room", {"room_id": rid, "name": "Carol"})
+    bob.disconnect()
+    host.emit("set_exclusions", {"exclusions": [["Alice", "Carol"]]})
+    host.emit("reveal")
+    rooms.flush_journal()
+    for client in (host, carol):
+        client.disconnect()
+    rooms.STORE.clear()
+    replayed = str(tmp_path / "replayed.journal")
+    monkeypatch.setattr(rooms, "JOURNAL", EventJournal(replayed))
+
+    # Act
+    sent = replay(app, list(read_journal(recorded)))
+    rooms.flush_journal()
+
+    # Assert: the same events land in one room under a fresh code
+    before = list(read_journal(recorded))
+    after = list(read_journal(replayed))[: len(before)]
+    assert sum(sent.values()) == len(before)
+    assert [(e.event, e.args) for e in after[1:]] != [(e.event, e.args) for e in before[1:]]
+    assert [e.event for e in after] == [e.event for e in before]
+    assert len({e.rid for e in after if e.rid}) == 1
+    assert after[1].args[0]["room_id"] == after[0].rid != rid
+
+
+def test_replay_sends_token_rejoins_with_replayed_tokens(app, make_sios, monkeypatch, tmp_path):
+    # Setup: Bob reclaims his seat from a second connection
+    recorded = str(tmp_path / "recorded.journal")
+    monkeypatch.setattr(rooms, "JOURNAL", EventJournal(recorded))
+    host, bob, returning = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+    token = _get_packet(bob.get_received(), "joined")["token"]
+    returning.emit("join_room", {"room_id": rid, "name": "Bob", "token": token})
+    rooms.flush_journal()
+    for client in (host, bob, returning):
+        client.disconnect()
+    rooms.STORE.clear()
+    replayed = str(tmp_path / "replayed.journal")
+    monkeypatch.setattr(rooms, "JOURNAL", EventJournal(replayed))
+
+    # Act
+    replay(app, list(read_journal(recorded)))
+    rooms.flush_journal()
+
+    # Assert: the redacted token was swapped for the replay's, so it reclaimed
+    rejoin = list(read_journal(replayed))[2]
+    assert rejoin.args[0]["token"] == REDACTED
+    assert rejoin.rid != ""
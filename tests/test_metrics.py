@@ -0,0 +1,108 @@
+import pytest
+import socketio
+
+from app.metrics import BUCKETS, Metrics, render
+from app.packets import Packet
+from app.utilities import RoomCodeAllocator
+import app.rooms as rooms
+
+from tests.test_rooms import _get_packet
+
+
+@pytest.fixture
+def metrics(app, monkeypatch):
+    m = Metrics()
+    monkeypatch.setattr(rooms, "METRICS", m)
+    return m
+
+
+# ------------ Metrics tests ------------
+def test_histogram_buckets_are_cumulative():
+    # Setup
+    m = Metrics()
+
+    # Act
+    m.observe("join_room", 0.00005)
+    m.observe("join_room", 0.002)
+    m.observe("join_room", 5.0)
+    text = "".join(render(m, RoomCodeAllocator(6)))
+
+    # Assert
+    assert f'secret_santa_event_seconds_bucket{{event="join_room",le="{BUCKETS[0]}"}} 1' in text
+    assert 'secret_santa_event_seconds_bucket{event="join_room",le="0.0025"} 2' in text
+    assert 'secret_santa_event_seconds_bucket{event="join_room",le="1.0"} 2' in text
+    assert 'secret_santa_event_seconds_bucket{event="join_room",le="+Inf"} 3' in text
+    assert 'secret_santa_event_seconds_count{event="join_room"} 3' in text
+
+
+def test_handlers_are_timed(metrics, make_sios):
+    # Setup
+    host, participant = make_sios(2)
+
+    # Act
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    host.emit("reveal")
+    participant.disconnect()
+
+    # Assert: disconnect is timed once, not again for python-socketio's retry
+    assert {e: h.count for e, h in metrics.events.items()} == {
+        "create_room": 1,
+        "join_room": 1,
+        "reveal": 1,
+        "disconnect": 1,
+    }
+
+
+def test_sent_messages_are_counted(metrics):
+    # Setup: a real server with one connected sid, no transport behind it
+    server = socketio.Server(serializer=Packet)
+    metrics.instrument(server.eio)
+    server.manager.initialize()
+    sid = server.manager.connect("eio1", "/")
+    server.manager.enter_room(sid, "/", "ABC123")
+
+    # Act
+    server.emit("room_update", {"version": 1}, to=sid)
+    server.emit("room_update", {"version": 2}, to="ABC123")
+
+    # Assert
+    assert metrics.sent_messages == 2
+    assert metrics.sent_bytes == 2 * len('2["room_update",{"version":1}]')
+
+
+def test_sent_bytes_are_utf8_bytes(metrics):
+    # Act
+    metrics.count_sent('2["joined",{"name":"Zoë"}]')
+    metrics.count_sent(b"\x00\x01")
+
+    # Assert
+    assert metrics.sent_bytes == len('2["joined",{"name":"Zoë"}]'.encode()) + 2
+
+
+def test_metrics_endpoint(app, metrics, sio):
+    # Setup
+    sio.emit("create_room", {"name": "Alice"})
+
+    # Act
+    response = app.test_client().get("/metrics")
+    text = response.get_data(as_text=True)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "secret_santa_rooms 1\n" in text
+    assert "secret_santa_connected_participants 1\n" in text
+    assert "secret_santa_room_code_collisions_total " in text
+    assert f"secret_santa_room_code_occupancy {1 / 62 ** 6}\n" in text
+    assert 'secret_santa_event_seconds_count{event="create_room"} 1' in text
+
+
+def test_metrics_disabled(app):
+    # Act
+    response = app.test_client().get("/metrics")
+
+    # Assert
+    assert rooms.METRICS is None
+    assert response.status_code == 404
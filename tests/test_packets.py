@@ -0,0 +1,155 @@
+import json
+
+import pytest
+
+from engineio import packet as eio_packet
+from socketio import packet
+
+from app.packets import MsgPackCodec, Packet, json_module
+from app.utilities import Encoded
+
+
+# ------------ Packet tests ------------
+@pytest.mark.parametrize(
+    "data",
+    [
+        ["room_update", Encoded(room_id="ABC123", participants=["Al", "Zoë"], version=3)],
+        ["room_update", {"room_id": "ABC123", "participants": ["Al"]}],
+        ["rejoined", {"you": "Al", "room": Encoded(room_id="ABC123")}],
+        ["reveal", {"giftee": "Bob"}, Encoded(extra=1)],
+    ],
+)
+def test_packet_encodes_like_socketio(data):
+    # Act
+    fast = Packet(packet.EVENT, data=data).encode()
+    plain = packet.Packet(packet.EVENT, data=json.loads(json.dumps(data))).encode()
+
+    # Assert
+    assert fast == plain
+    assert packet.Packet(encoded_packet=fast).data == json.loads(json.dumps(data))
+
+
+def test_packet_falls_back_for_namespace_and_ack():
+    # Setup
+    data = ["room_update", Encoded(version=1)]
+
+    # Act / Assert
+    for kwargs in ({"namespace": "/admin"}, {"id": 7}):
+        assert Packet(packet.EVENT, data=data, **kwargs).encode() == packet.Packet(
+            packet.EVENT, data=[data[0], dict(data[1])], **kwargs
+        ).encode()
+
+
+def test_packet_never_binary_for_encoded():
+    assert Packet.data_is_binary(Encoded(room_id="ABC123")) is False
+    assert Packet.data_is_binary(["x", {"b": b"\x00"}]) is True
+
+
+def test_json_module():
+    assert json_module("json") is json
+    with pytest.raises(ValueError):
+        json_module("yaml")
+
+
+# ------------ MessagePack codec tests ------------
+class _FakeEio:
+    def __init__(self) -> None:
+        self.handlers = {"message": self._receive, "disconnect": lambda sid, reason: None}
+        self.received: list = []
+        self.sent: list = []
+
+    def _receive(self, sid, data):
+        self.received.append((sid, data))
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def send_packet(self, sid, pkt):
+        self.sent.append((sid, pkt))
+
+
+class _FakeServer:
+    def __init__(self) -> None:
+        self.eio = _FakeEio()
+        self._binary_packet: dict = {}
+
+
+@pytest.fixture
+def msgpack_server():
+    msgpack = pytest.importorskip("msgpack")
+    server = _FakeServer()
+    MsgPackCodec().install(server)
+    return server, msgpack
+
+
+def test_msgpack_codec_leaves_json_clients_alone(msgpack_server):
+    # Setup
+    server, _ = msgpack_server
+    pkt = eio_packet.Packet(eio_packet.MESSAGE, data='2["room_update",{"version":1}]')
+
+    # Act
+    server.eio.handlers["message"]("json", "0")
+    server.eio.send_packet("json", pkt)
+
+    # Assert
+    assert server.eio.received == [("json", "0")]
+    assert server.eio.sent == [("json", pkt)]
+
+
+def test_msgpack_codec_picks_binary_clients_by_first_packet(msgpack_server):
+    # Setup
+    server, msgpack = msgpack_server
+    connect = msgpack.dumps({"type": packet.CONNECT, "nsp": "/", "data": {"token": "t"}})
+    event = msgpack.dumps({"type": packet.EVENT, "nsp": "/", "data": ["join_room", {"name": "Al"}]})
+
+    # Act
+    server.eio.handlers["message"]("bin", connect)
+    server.eio.handlers["message"]("bin", event)
+    server.eio.send_packet(
+        "bin", eio_packet.Packet(eio_packet.MESSAGE, data='2["joined",{"name":"Al"}]')
+    )
+
+    # Assert
+    assert server.eio.received == [
+        ("bin", '0{"token":"t"}'),
+        ("bin", '2["join_room",{"name":"Al"}]'),
+    ]
+    sent = server.eio.sent[0][1]
+    assert sent.binary
+    assert msgpack.loads(sent.data) == {
+        "type": packet.EVENT,
+        "data": ["joined", {"name": "Al"}],
+        "nsp": "/",
+    }
+
+
+def test_msgpack_codec_encodes_a_broadcast_once(msgpack_server):
+    # Setup
+    server, msgpack = msgpack_server
+    for sid in ("a", "b"):
+        server.eio.handlers["message"](sid, msgpack.dumps({"type": packet.CONNECT, "nsp": "/"}))
+    pkt = eio_packet.Packet(eio_packet.MESSAGE, data='2["room_update",{"version":2}]')
+
+    # Act
+    for sid in ("a", "b", "json"):
+        server.eio.send_packet(sid, pkt)
+    server.eio.handlers["disconnect"]("a", "transport close")
+    server.eio.send_packet("a", pkt)
+
+    # Assert
+    (_, first), (_, second), (_, plain), (_, after) = server.eio.sent
+    assert first is second
+    assert plain is pkt
+    assert after is pkt
+
+
+def test_msgpack_codec_keeps_json_attachments(msgpack_server):
+    # Setup: a JSON client mid binary event sends raw attachment bytes
+    server, _ = msgpack_server
+    server._binary_packet["json"] = object()
+
+    # Act
+    server.eio.handlers["message"]("json", b"\x00\x01")
+
+    # Assert
+    assert server.eio.received == [("json", b"\x00\x01")]
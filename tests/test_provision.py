@@ -0,0 +1,166 @@
+import json
+import time
+
+import pytest
+
+import app.rooms as rooms
+
+from app.sweeper import AwaySeats
+from app.utilities import seat_token
+
+from tests.test_rooms import _get_packet
+
+TOKEN = "operator-secret"
+
+
+@pytest.fixture
+def client(app):
+    app.config["PROVISION_TOKEN"] = TOKEN
+    return app.test_client()
+
+
+def _post(client, body, token=TOKEN):
+    return client.post("/rooms", json=body, headers={"Authorization": f"Bearer {token}"})
+
+
+def _lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+# ------------ Provisioning tests ------------
+def test_provision_count_of_identical_rooms(client):
+    # Act
+    response = _post(client, {"count": 50, "host": "Organizer", "participants": ["Bob", "Carol"]})
+    lines = _lines(response)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert len(lines) == 50
+    assert len({line["room_id"] for line in lines}) == 50
+    assert len(rooms.STORE) == 50
+
+    rid = lines[0]["room_id"]
+    room = rooms.STORE.get(rid)
+    assert room.names() == ["Organizer", "Bob", "Carol"]
+    assert room.host.name == "Organizer"
+    assert all(p.sid is None for p in room.participants)
+    assert lines[0]["tokens"] == {p.name: seat_token(rid, room, p) for p in room.participants}
+
+
+def test_provision_room_list(client):
+    # Act
+    response = _post(
+        client,
+        {"rooms": [{"host": "Alice"}, {"host": " Bob ", "participants": ["Bob", "Dan"]}]},
+    )
+    lines = _lines(response)
+
+    # Assert: names are trimmed and the host is not seated twice
+    assert [line["host_name"] for line in lines] == ["Alice", "Bob"]
+    assert list(lines[1]["tokens"]) == ["Bob", "Dan"]
+
+
+def test_provisioned_seats_are_claimed_by_token(client, make_sios):
+    # Setup
+    line = _lines(_post(client, {"count": 1, "host": "Alice", "participants": ["Bob"]}))[0]
+    rid = line["room_id"]
+    host, participant = make_sios(2)
+
+    # Act
+    host.emit("join_room", {"room_id": rid, "name": "Alice", "token": line["tokens"]["Alice"]})
+    participant.emit("join_room", {"room_id": rid, "name": "Bob", "token": line["tokens"]["Bob"]})
+    host.emit("reveal")
+
+    # Assert: the claimed host can run the draw
+    assert _get_packet(host.get_received(), "revealed")["giftee_name"] == "Bob"
+    assert _get_packet(participant.get_received(), "revealed")["giftee_name"] == "Alice"
+
+
+def test_provisioned_seats_outlive_the_reconnect_grace(client, monkeypatch):
+    # Setup
+    monkeypatch.setattr(rooms, "AWAY", AwaySeats(grace=30))
+    lines = _lines(_post(client, {"count": 3, "host": "Alice", "participants": ["Bob"]}))
+
+    # Act
+    released = rooms.release_away_seats(now=time.time() + 31)
+
+    # Assert
+    assert released == 0
+    assert all(len(rooms.STORE.get(line["room_id"])) == 2 for line in lines)
+
+
+def test_provision_requires_token(app, client):
+    # Act
+    wrong = _post(client, {"count": 1, "host": "Alice"}, token="guess")
+    app.config["PROVISION_TOKEN"] = None
+    disabled = _post(client, {"count": 1, "host": "Alice"})
+
+    # Assert
+    assert wrong.status_code == 401
+    assert disabled.status_code == 404
+    assert len(rooms.STORE) == 0
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"count": 1},
+        {"count": "3", "host": "Alice"},
+        {"count": 0, "host": "Alice"},
+        {"count": 10_001, "host": "Alice"},
+        {"rooms": [{"host": "Alice"}, {"participants": ["Bob"]}]},
+        {"rooms": [{"host": "Alice", "participants": ["Bob", ""]}]},
+        {"rooms": [{"host": "Alice", "participants": ["x" * 65]}]},
+    ],
+)
+def test_provision_rejects_bad_bodies(client, body):
+    # Act
+    response = _post(client, body)
+
+    # Assert
+    assert response.status_code == 400
+    assert len(rooms.STORE) == 0
+
+
+def test_provision_respects_room_cap(app, client):
+    # Setup
+    app.config["ROOM_MAX_ROOMS"] = 10
+
+    # Act
+    response = _post(client, {"count": 11, "host": "Alice"})
+
+    # Assert
+    assert response.status_code == 409
+    assert len(rooms.STORE) == 0
+
+
+def test_provision_rejects_huge_count(client):
+    # Act
+    response = _post(client, {"count": 10**9, "host": "Alice"})
+
+    # Assert
+    assert response.status_code == 400
+    assert len(rooms.STORE) == 0
+
+
+def test_provision_respects_room_capacity(app, client):
+    # Setup
+    app.config["ROOM_MAX_MEMBERS"] = 2
+
+    # Act
+    response = _post(client, {"count": 1, "host": "Alice", "participants": ["Bob", "Carol"]})
+
+    # Assert
+    assert response.status_code == 400
+    assert len(rooms.STORE) == 0
+
+
+def test_provision_ten_thousand_rooms(client):
+    # Act
+    lines = _lines(_post(client, {"count": 10_000, "host": "Organizer"}))
+
+    # Assert
+    assert len(lines) == 10_000
+    assert len({line["room_id"] for line in lines}) == 10_000
+    assert len(rooms.STORE) == 10_000
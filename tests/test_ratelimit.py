@@ -0,0 +1,102 @@
+import threading
+
+from app.ratelimit import RateLimiter, TokenBuckets
+
+
+# ------------ Token bucket tests ------------
+def test_bucket_allows_burst_then_refills_lazily():
+    # Setup
+    buckets = TokenBuckets(rate=1, burst=3)
+
+    # Act
+    burst = [buckets.allow("a", now=0) for _ in range(4)]
+    later = [buckets.allow("a", now=2.5) for _ in range(3)]
+
+    # Assert: 3 up front, then 2.5 s buys two more
+    assert burst == [True, True, True, False]
+    assert later == [True, True, False]
+
+
+def test_bucket_keys_are_independent():
+    # Setup
+    buckets = TokenBuckets(rate=1, burst=1)
+
+    # Act
+    buckets.allow("a", now=0)
+
+    # Assert
+    assert not buckets.allow("a", now=0)
+    assert buckets.allow("b", now=0)
+
+
+def test_idle_buckets_are_evicted():
+    # Setup
+    buckets = TokenBuckets(rate=1, burst=2)
+    for key in ("a", "b", "c"):
+        buckets.allow(key, now=0)
+
+    # Act: "a" refilled long ago, so the next new key pushes it out
+    buckets.allow("d", now=10)
+
+    # Assert
+    assert len(buckets) == 3
+
+
+def test_bucket_memory_is_capped():
+    # Setup
+    buckets = TokenBuckets(rate=0.001, burst=2, max_keys=100)
+
+    # Act
+    for i in range(1_000):
+        buckets.allow(str(i), now=0)
+
+    # Assert
+    assert len(buckets) == 100
+
+
+def test_buckets_are_thread_safe():
+    # Setup: shared keys and constant eviction, as with addresses
+    buckets = TokenBuckets(rate=1, burst=1, max_keys=50)
+    errors = []
+
+    def hammer(n):
+        try:
+            for i in range(20_000):
+                buckets.allow(str((i * n) % 200), now=i * 0.001)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(1, 9)]
+
+    # Act
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Assert
+    assert errors == []
+    assert len(buckets) <= 50
+
+
+# ------------ Rate limiter tests ------------
+def test_limiter_checks_sid_then_address():
+    # Setup
+    limiter = RateLimiter({"join_room": (0, 2)}, {"join_room": (0, 3)})
+
+    # Act: two sids from one address
+    first = [limiter.allow("join_room", "s1", "1.2.3.4", now=0) for _ in range(3)]
+    second = [limiter.allow("join_room", "s2", "1.2.3.4", now=0) for _ in range(2)]
+
+    # Assert: s1's third try never reached the address bucket
+    assert first == [True, True, False]
+    assert second == [True, False]
+    assert limiter.rejected == 2
+
+
+def test_limiter_ignores_unlisted_events():
+    # Setup
+    limiter = RateLimiter({"join_room": (0, 1)}, {})
+
+    # Assert
+    assert all(limiter.allow("disconnect", "s1", None, now=0) for _ in range(10))
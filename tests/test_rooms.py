@@ -1,5 +1,16 @@
+import time
+
+import pytest
+
 import app.rooms as rooms
 
+from app.delivery import Coalescer
+from app.ratelimit import RateLimiter, TokenBuckets
+from app.snapshot import SnapshotLog
+from app.store import MemoryRoomStore, SqliteRoomStore
+from app.sweeper import AwaySeats, RoomSweeper
+from app.utilities import Participant, Room
+
 
 # ------------ Create room tests ------------
 def test_create_room_success(sio):
@@ -14,13 +25,13 @@ def test_create_room_success(sio):
     assert payload["participants"] == ["Alice"]
 
     # Assert: in-memory state updated
-    room = rooms.ROOMS[payload["room_id"]]
-    assert len(rooms.ROOMS) == 1
+    room = rooms.STORE.get(payload["room_id"])
+    assert len(rooms.STORE) == 1
     assert room.host.name == payload["host_name"]
     assert [p.name for p in room.participants] == ["Alice"]
 
-    assert len(rooms.SID_TO_RID) == 1
-    assert rooms.SID_TO_RID[room.host.sid] == payload["room_id"]
+    assert rooms.STORE.sid_count() == 1
+    assert rooms.STORE.rid_for(room.host.sid) == payload["room_id"]
 
 
 def test_create_room_without_name(sio):
@@ -40,7 +51,26 @@ def test_create_room_without_name(sio):
     assert payload["message"] == "Name required"
 
     # Assert: in-memory state not updated
-    assert len(rooms.ROOMS) == 0
+    assert len(rooms.STORE) == 0
+
+
+def test_create_and_join_with_too_long_a_name(app, make_sios):
+    # Setup
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    name = "x" * (app.config["NAME_MAX_LENGTH"] + 1)
+
+    # Act
+    participant.emit("create_room", {"name": name})
+    received_create = participant.get_received()
+    participant.emit("join_room", {"room_id": rid, "name": name})
+    received_join = participant.get_received()
+
+    # Assert
+    assert _get_packet(received_create, "error")["message"] == "Name too long"
+    assert _get_packet(received_join, "error")["message"] == "Name too long"
+    assert len(rooms.STORE) == 1
 
 
 def test_create_emit_does_not_leak(make_sios):
@@ -78,8 +108,24 @@ def test_multiple_create_rooms_success(make_sios):
         assert payload["participants"] == ["Alice"]
 
     # Assert: in-memory state updated w/ 100 unique rooms
-    assert len(rooms.ROOMS) == 100
-    assert len(rooms.SID_TO_RID) == 100
+    assert len(rooms.STORE) == 100
+    assert rooms.STORE.sid_count() == 100
+
+
+def test_create_room_never_reuses_live_code(app, make_sios):
+    # Setup: 62-code keyspace so collisions are frequent
+    app.config["ROOM_ID_LENGTH"] = 1
+    clients = make_sios(20)
+
+    # Act
+    rids = []
+    for sio in clients:
+        sio.emit("create_room", {"name": "Alice"})
+        rids.append(_get_packet(sio.get_received(), "room_created")["room_id"])
+
+    # Assert: no room was overwritten
+    assert len(set(rids)) == 20
+    assert len(rooms.STORE) == 20
 
 
 # ------------ Join room tests ------------
@@ -107,14 +153,14 @@ def test_join_room_success(make_sios):
     assert payload["host_name"] == "Alice"
 
     # Assert: in-memory state updated
-    room = rooms.ROOMS[payload["room_id"]]
-    assert len(rooms.ROOMS) == 1
+    room = rooms.STORE.get(payload["room_id"])
+    assert len(rooms.STORE) == 1
     assert room.host.name == payload["host_name"]
     assert [p.name for p in room.participants] == ["Alice", "Bob"]
 
-    assert len(rooms.SID_TO_RID) == 2
-    for sid in rooms.SID_TO_RID:
-        assert rooms.SID_TO_RID[sid] == payload["room_id"]
+    assert rooms.STORE.sid_count() == 2
+    for p in room.participants:
+        assert rooms.STORE.rid_for(p.sid) == payload["room_id"]
 
 
 def test_join_room_without_rid(sio):
@@ -233,9 +279,98 @@ def test_multiple_join_room_success(make_sios):
         assert payload["host_name"] == "Alice"
 
     # Assert: in-memory state updated w/ 101 unique participants
-    assert len(rooms.ROOMS) == 1
-    assert len(rooms.ROOMS[rid].participants) == 101
-    assert len(rooms.SID_TO_RID) == 101
+    assert len(rooms.STORE) == 1
+    assert len(rooms.STORE.get(rid).participants) == 101
+    assert rooms.STORE.sid_count() == 101
+
+
+def test_join_burst_coalesces_room_updates(make_sios):
+    # Setup
+    rooms.UPDATES.window = 0.05
+    clients = make_sios(11)
+    host = clients[0]
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+
+    # Act
+    for i, sio in enumerate(clients[1:]):
+        sio.emit("join_room", {"room_id": rid, "name": str(i)})
+    before_flush = host.get_received()
+    sent = rooms.flush_room_updates()
+
+    # Assert: joins arrive at once, one room_update carries all of them
+    assert _get_packet(before_flush, "room_update") is None
+    assert len([p for p in before_flush if p["name"] == "joined"]) == 10
+    assert sent == 1
+
+    received = host.get_received()
+    assert len(received) == 1
+    assert _get_packet(received, "room_update")["participants"] == ["Alice"] + [
+        str(i) for i in range(10)
+    ]
+    assert rooms.UPDATES.coalesced == 9
+
+
+def test_join_past_room_capacity(app, make_sios):
+    # Setup
+    app.config["ROOM_MAX_MEMBERS"] = 2
+    host, bob, carol = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+    host.get_received()
+
+    # Act
+    carol.emit("join_room", {"room_id": rid, "name": "Carol"})
+
+    # Assert: turned away before anything is broadcast
+    assert _get_packet(carol.get_received(), "room_full") == {"room_id": rid, "message": "Room full"}
+    assert host.get_received() == []
+    assert len(rooms.STORE.get(rid)) == 2
+
+
+def test_join_and_create_past_server_capacity(app, make_sios):
+    # Setup
+    app.config["SERVER_MAX_PARTICIPANTS"] = 2
+    host, bob, carol = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+
+    # Act
+    carol.emit("join_room", {"room_id": rid, "name": "Carol"})
+    full = carol.get_received()
+    carol.emit("create_room", {"name": "Carol"})
+
+    # Assert
+    assert _get_packet(full, "room_full")["message"] == "Server full"
+    assert _get_packet(carol.get_received(), "error")["message"] == "Server full"
+
+
+def test_join_burst_is_announced_in_one_batch(make_sios, monkeypatch):
+    # Setup: two joins announced one by one, the rest batched
+    monkeypatch.setattr(rooms, "JOINS", TokenBuckets(rate=0, burst=2))
+    monkeypatch.setattr(rooms, "ADMITTED", Coalescer(window=1))
+    clients = make_sios(7)
+    host = clients[0]
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+
+    # Act
+    for i, sio in enumerate(clients[1:]):
+        sio.emit("join_room", {"room_id": rid, "name": str(i)})
+    before_flush = host.get_received()
+    announced = rooms.flush_admitted()
+
+    # Assert: every joiner is seated at once, the burst shares one room_update
+    assert all(_get_packet(c.get_received(), "joined") for c in clients[1:])
+    assert [p["name"] for p in before_flush] == ["joined", "room_update"] * 2
+    assert announced == 1
+    received = host.get_received()
+    assert len(received) == 1
+    assert _get_packet(received, "room_update")["participants"] == ["Alice"] + [
+        str(i) for i in range(6)
+    ]
 
 
 # ------------ Leave room tests ------------
@@ -244,8 +379,8 @@ def test_disconnect_without_a_room(sio):
     sio.disconnect()
 
     # Assert: in-memory state unchanged
-    assert len(rooms.ROOMS) == 0
-    assert len(rooms.SID_TO_RID) == 0
+    assert len(rooms.STORE) == 0
+    assert rooms.STORE.sid_count() == 0
 
 
 def test_leave_room_with_single_participant(sio):
@@ -256,8 +391,8 @@ def test_leave_room_with_single_participant(sio):
     sio.disconnect()
 
     # Assert: in-memory state unchanged
-    assert len(rooms.ROOMS) == 0
-    assert len(rooms.SID_TO_RID) == 0
+    assert len(rooms.STORE) == 0
+    assert rooms.STORE.sid_count() == 0
 
 
 def test_participant_leaves_room(make_sios):
@@ -291,10 +426,10 @@ def test_participant_leaves_room(make_sios):
     assert payload["host_name"] == "Alice"
 
     # Assert: in-memory state updated
-    room = rooms.ROOMS[payload["room_id"]]
-    assert len(rooms.ROOMS) == 1
-    assert len(rooms.ROOMS[rid].participants) == 1
-    assert len(rooms.SID_TO_RID) == 1
+    room = rooms.STORE.get(payload["room_id"])
+    assert len(rooms.STORE) == 1
+    assert len(rooms.STORE.get(rid).participants) == 1
+    assert rooms.STORE.sid_count() == 1
     assert room.host.name == payload["host_name"]
     assert [p.name for p in room.participants] == ["Alice"]
 
@@ -333,10 +468,10 @@ def test_host_leaves_room(make_sios):
     assert payload["host_name"] == "Bob"
 
     # Assert: in-memory state updated
-    room = rooms.ROOMS[payload["room_id"]]
-    assert len(rooms.ROOMS) == 1
-    assert len(rooms.ROOMS[rid].participants) == 1
-    assert len(rooms.SID_TO_RID) == 1
+    room = rooms.STORE.get(payload["room_id"])
+    assert len(rooms.STORE) == 1
+    assert len(rooms.STORE.get(rid).participants) == 1
+    assert rooms.STORE.sid_count() == 1
     assert room.host.name == payload["host_name"]
     assert [p.name for p in room.participants] == ["Bob"]
 
@@ -387,8 +522,8 @@ def test_multiple_disconnects_success(make_sios):
         participant.disconnect()
 
     # Assert: in-memory state unchanged
-    assert len(rooms.ROOMS) == 0
-    assert len(rooms.SID_TO_RID) == 0
+    assert len(rooms.STORE) == 0
+    assert rooms.STORE.sid_count() == 0
 
 
 # ------------ Reveal giftees tests ------------
@@ -483,6 +618,462 @@ def test_reveal_emit_does_not_leak(make_sios):
     assert _get_packet(b_batch, "revealed") is None
 
 
+def _revealed_room(clients) -> dict[str, str]:
+    host = clients[0]
+    host.emit("create_room", {"name": "0"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    for i, client in enumerate(clients[1:], 1):
+        client.emit("join_room", {"room_id": rid, "name": str(i)})
+    host.emit("reveal")
+    return {
+        str(i): _get_packet(client.get_received(), "revealed")["giftee_name"]
+        for i, client in enumerate(clients)
+    }
+
+
+def test_reveal_again_resends_the_same_draw(make_sios):
+    # Setup
+    clients = make_sios(6)
+    first = _revealed_room(clients)
+
+    # Act
+    clients[0].emit("reveal")
+
+    # Assert
+    again = {
+        str(i): _get_packet(c.get_received(), "revealed")["giftee_name"]
+        for i, c in enumerate(clients)
+    }
+    assert again == first
+
+
+def test_reveal_reshuffle_draws_again(make_sios):
+    # Setup
+    clients = make_sios(6)
+    _revealed_room(clients)
+    draws = set()
+
+    # Act
+    for _ in range(20):
+        clients[0].emit("reveal", {"reshuffle": True})
+        draws.add(
+            tuple(_get_packet(c.get_received(), "revealed")["giftee_name"] for c in clients)
+        )
+
+    # Assert: a 6-cycle has 120 orders, 20 draws are all but certain to differ
+    assert len(draws) > 1
+
+
+def test_get_assignment_after_refresh(make_sios):
+    # Setup
+    clients = make_sios(4)
+    giftees = _revealed_room(clients)
+
+    # Act
+    clients[2].emit("get_assignment")
+
+    # Assert: only the caller hears back
+    assert _get_packet(clients[2].get_received(), "revealed")["giftee_name"] == giftees["2"]
+    assert all(c.get_received() == [] for c in clients[:2] + clients[3:])
+
+
+def test_get_assignment_errors(make_sios):
+    # Setup
+    host, bob, late, stranger = make_sios(4)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+
+    # Act / Assert
+    stranger.emit("get_assignment")
+    assert _get_packet(stranger.get_received(), "error")["message"] == "Not in a room"
+
+    bob.emit("get_assignment")
+    assert _get_packet(bob.get_received(), "error")["message"] == "Not revealed yet"
+
+    host.emit("reveal")
+    late.emit("join_room", {"room_id": rid, "name": "Carol"})
+    late.emit("get_assignment")
+    assert _get_packet(late.get_received(), "error")["message"] == "Not in the draw"
+
+
+# ------------ Delta protocol tests ------------
+def test_delta_protocol_join_and_leave(app, make_sios):
+    # Setup
+    app.config["ROOM_UPDATE_PROTOCOL"] = "delta"
+    host, bob, carol = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    created = _get_packet(host.get_received(), "room_created")
+    rid = created["room_id"]
+
+    # Act: joins
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+    carol.emit("join_room", {"room_id": rid, "name": "Carol"})
+    host_batch = host.get_received()
+    carol_batch = carol.get_received()
+
+    # Assert: deltas only, newcomer gets a snapshot
+    assert created["version"] == 0
+    assert _get_packet(host_batch, "room_update") is None
+    assert [p["args"][0] for p in host_batch] == [
+        {"name": "Bob", "version": 1},
+        {"name": "Carol", "version": 2},
+    ]
+    assert _get_packet(carol_batch, "resync") == {
+        "room_id": rid,
+        "participants": ["Alice", "Bob", "Carol"],
+        "host_name": "Alice",
+        "version": 2,
+    }
+
+    # Act: host leaves
+    bob.get_received()
+    host.disconnect()
+    received = bob.get_received()
+
+    # Assert: removal then host change, in version order
+    assert [(p["name"], p["args"][0]) for p in received] == [
+        ("participant_removed", {"name": "Alice", "version": 3}),
+        ("host_changed", {"host_name": "Bob", "version": 4}),
+    ]
+
+
+def test_resync_returns_snapshot(make_sios):
+    # Setup
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    participant.get_received()
+
+    # Act
+    participant.emit("resync")
+    payload = _get_packet(participant.get_received(), "resync")
+
+    # Assert
+    assert payload["participants"] == ["Alice", "Bob"]
+    assert payload["version"] == rooms.STORE.get(rid).version == 1
+
+
+def test_resync_without_room(sio):
+    sio.emit("resync")
+
+    assert _get_packet(sio.get_received(), "error")["message"] == "Not in a room"
+
+
+# ------------ Eviction tests ------------
+def test_idle_room_is_evicted(make_sios):
+    # Setup
+    host, participant, other = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    other.emit("create_room", {"name": "Carol"})
+    other_rid = _get_packet(other.get_received(), "room_created")["room_id"]
+    participant.get_received()
+
+    now = time.time() + rooms.SWEEPER.ttl + 1
+    rooms.STORE.get(other_rid).last_active = now  # still active at that point
+
+    # Act
+    rooms.sweep_rooms(now)
+
+    # Assert: idle room and its sids are gone, the fresh room stays
+    assert rooms.STORE.get(rid) is None
+    assert rooms.STORE.get(other_rid) is not None
+    assert rooms.STORE.sid_count() == 1
+    assert _get_packet(participant.get_received(), "room_closed") == {"room_id": rid}
+    assert _get_packet(other.get_received(), "room_closed") is None
+
+    # Assert: the old members can start over
+    participant.emit("create_room", {"name": "Bob"})
+    assert _get_packet(participant.get_received(), "room_created") is not None
+
+
+def test_revealed_room_expires_sooner(make_sios):
+    # Setup
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    host.emit("reveal")
+
+    # Act
+    rooms.sweep_rooms(now=time.time() + rooms.SWEEPER.finished_ttl + 1)
+
+    # Assert
+    assert rooms.STORE.get(rid) is None
+    assert rooms.SWEEPER.evicted == 1
+
+
+def test_max_rooms_cap(app, make_sios):
+    # Setup
+    app.config["ROOM_MAX_ROOMS"] = 2
+    clients = make_sios(3)
+
+    # Act
+    for sio in clients:
+        sio.emit("create_room", {"name": "Alice"})
+
+    # Assert
+    assert _get_packet(clients[2].get_received(), "error")["message"] == "Too many rooms"
+    assert len(rooms.STORE) == 2
+
+
+def test_restarted_worker_adopts_a_shared_store(app, monkeypatch, tmp_path):
+    # Setup: a worker made two rooms and died with Bob still connected
+    path = str(tmp_path / "rooms.sqlite3")
+    dead = SqliteRoomStore(path)
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.add_member(Participant(sid="s1", name="Bob", gen=room.new_gen()))
+    dead.insert("abc", room)
+    dead.insert("def", Room(host=Participant(sid=None, name="Carol")))
+    dead.bind("s0", "abc")
+    dead.bind("s1", "abc")
+    dead._alive.close()
+    monkeypatch.setattr(rooms, "STORE", SqliteRoomStore(path))
+    monkeypatch.setattr(rooms, "SWEEPER", RoomSweeper(ttl=60))
+
+    # Act
+    adopted = rooms.adopt_stored_rooms()
+    emptied = rooms.STORE.get("abc")
+    rooms.sweep_rooms(now=time.time() + 61)
+
+    # Assert: dead sids freed their seats, and the idle room left is swept
+    assert adopted == 1
+    assert emptied is None
+    assert rooms.STORE.sid_count() == 0
+    assert len(rooms.STORE) == 0
+
+
+# ------------ Exclusion tests ------------
+def test_set_exclusions_shapes_reveal(make_sios):
+    # Setup
+    alice, bob, carol = make_sios(3)
+    alice.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(alice.get_received(), "room_created")["room_id"]
+    bob.emit("join_room", {"room_id": rid, "name": "Bob"})
+    carol.emit("join_room", {"room_id": rid, "name": "Carol"})
+    alice.get_received()
+
+    # Act
+    alice.emit("set_exclusions", {"exclusions": [["Alice", "Bob"]]})
+    payload = _get_packet(alice.get_received(), "exclusions_set")
+    alice.emit("reveal")
+
+    # Assert: only Alice -> Carol -> Bob -> Alice is left
+    assert payload == {"count": 1}
+    assert _get_packet(alice.get_received(), "revealed")["giftee_name"] == "Carol"
+    assert _get_packet(bob.get_received(), "revealed")["giftee_name"] == "Alice"
+    assert _get_packet(carol.get_received(), "revealed")["giftee_name"] == "Bob"
+
+
+def test_set_exclusions_couples_and_infeasible(make_sios):
+    # Setup
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    host.get_received()
+
+    # Act
+    host.emit("set_exclusions", {"couples": [["Alice", "Bob"]]})
+    host.emit("reveal")
+    received = host.get_received()
+
+    # Assert
+    assert _get_packet(received, "exclusions_set") == {"count": 2}
+    assert _get_packet(received, "error")["message"] == "No valid assignment"
+    assert _get_packet(participant.get_received(), "revealed") is None
+
+
+def test_set_exclusions_errors(make_sios):
+    # Setup
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+
+    # Act
+    participant.emit("set_exclusions", {"exclusions": [["Bob", "Alice"]]})
+    not_host = participant.get_received()
+    host.emit("set_exclusions", {"exclusions": [["Bob"]]})
+    invalid = host.get_received()
+
+    # Assert
+    assert _get_packet(not_host, "error")["message"] == "Not the host"
+    assert _get_packet(invalid, "error")["message"] == "Invalid exclusions"
+    assert rooms.STORE.get(rid).exclusions == {}
+
+
+# ------------ Snapshot & reclaim tests ------------
+def test_reclaim_seat_with_token(make_sios):
+    # Setup
+    host, participant, returning = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    token = _get_packet(participant.get_received(), "joined")["token"]
+    host.get_received()
+
+    # Act: Bob comes back on a new connection before the old one drops
+    returning.emit("join_room", {"room_id": rid, "name": "Bob", "token": token})
+    received = returning.get_received()
+
+    # Assert: same seat, new sid, nobody else is told
+    payload = _get_packet(received, "rejoined")
+    assert payload["participants"] == ["Alice", "Bob"]
+    assert payload["token"] == token
+    assert host.get_received() == []
+
+    room = rooms.STORE.get(rid)
+    assert rooms.STORE.sid_count() == 2
+    assert rooms.STORE.rid_for(room.seat("Bob").sid) == rid
+
+
+def test_reclaim_seat_with_wrong_token(make_sios):
+    # Setup
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+
+    # Act
+    participant.emit("join_room", {"room_id": rid, "name": "Alice", "token": "guess"})
+
+    # Assert
+    assert _get_packet(participant.get_received(), "error")["message"] == "Name already taken"
+
+
+def test_token_dies_with_its_seat(make_sios):
+    # Setup: Mallory takes "Carol", keeps the token and leaves
+    host, mallory, carol, returning = make_sios(4)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    mallory.emit("join_room", {"room_id": rid, "name": "Carol"})
+    stale = _get_packet(mallory.get_received(), "joined")["token"]
+    mallory.disconnect()
+
+    # Act: the real Carol joins, then the stale token is tried
+    carol.emit("join_room", {"room_id": rid, "name": "Carol"})
+    token = _get_packet(carol.get_received(), "joined")["token"]
+    seat = rooms.STORE.get(rid).seat("Carol")
+    returning.emit("join_room", {"room_id": rid, "name": "Carol", "token": stale})
+
+    # Assert: Carol keeps her seat
+    assert token != stale
+    assert _get_packet(returning.get_received(), "error")["message"] == "Name already taken"
+    assert rooms.STORE.get(rid).seat("Carol") is seat
+
+
+def test_snapshot_restores_rooms(app, make_sios, tmp_path, monkeypatch):
+    # Setup
+    monkeypatch.setattr(rooms, "STORE", MemoryRoomStore(track_changes=True))
+    monkeypatch.setattr(rooms, "SNAPSHOTS", SnapshotLog(str(tmp_path / "rooms.snapshot")))
+    host, participant, returning = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    payload = _get_packet(host.get_received(), "room_created")
+    rid, token = payload["room_id"], payload["token"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    rooms.snapshot_rooms()
+
+    # Act: a fresh process loads the log
+    rooms.STORE = MemoryRoomStore(track_changes=True)
+    restored = rooms.restore_rooms()
+    returning.emit("join_room", {"room_id": rid, "name": "Alice", "token": token})
+
+    # Assert: the host reclaims the restored seat
+    assert restored == 1
+    assert _get_packet(returning.get_received(), "rejoined")["participants"] == ["Alice", "Bob"]
+    room = rooms.STORE.get(rid)
+    assert room.host.sid is not None
+    assert room.seat("Bob").sid is None
+
+
+def test_failed_snapshot_keeps_rooms_dirty(make_sios, tmp_path, monkeypatch):
+    # Setup
+    monkeypatch.setattr(rooms, "STORE", MemoryRoomStore(track_changes=True))
+    log = SnapshotLog(str(tmp_path / "rooms.snapshot"))
+    monkeypatch.setattr(rooms, "SNAPSHOTS", log)
+    (host,) = make_sios(1)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+
+    def fail(records):
+        raise OSError("disk full")
+
+    # Act
+    log.append = fail
+    with pytest.raises(OSError):
+        rooms.snapshot_rooms()
+    del log.append
+    written = rooms.snapshot_rooms()
+
+    # Assert: the room is written by the next try
+    assert written == 1
+    assert rid in log.load()
+
+
+# ------------ Reconnect grace tests ------------
+def test_grace_drop_and_reclaim_is_silent(make_sios, monkeypatch):
+    # Setup
+    monkeypatch.setattr(rooms, "AWAY", AwaySeats(grace=30))
+    host, participant, returning = make_sios(3)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    token = _get_packet(participant.get_received(), "joined")["token"]
+    host.get_received()
+
+    # Act
+    participant.disconnect()
+    away = rooms.STORE.get(rid).seat("Bob")
+    returning.emit("join_room", {"room_id": rid, "name": "Bob", "token": token})
+
+    # Assert: the seat waited, came back in place, and the host heard nothing
+    assert away.sid is None
+    assert _get_packet(returning.get_received(), "rejoined")["participants"] == ["Alice", "Bob"]
+    assert host.get_received() == []
+    assert len(rooms.AWAY) == 0
+    assert rooms.release_away_seats(now=time.time() + 31) == 0
+    assert rooms.STORE.get(rid).names() == ["Alice", "Bob"]
+
+
+def test_grace_keeps_host_until_it_expires(make_sios, monkeypatch):
+    # Setup
+    monkeypatch.setattr(rooms, "AWAY", AwaySeats(grace=30))
+    host, participant = make_sios(2)
+    host.emit("create_room", {"name": "Alice"})
+    rid = _get_packet(host.get_received(), "room_created")["room_id"]
+    participant.emit("join_room", {"room_id": rid, "name": "Bob"})
+    participant.get_received()
+
+    # Act
+    host.disconnect()
+    during = participant.get_received()
+    released = rooms.release_away_seats(now=time.time() + 31)
+
+    # Assert: no host change during the grace period, then a normal leave
+    assert during == []
+    assert released == 1
+    assert _get_packet(participant.get_received(), "host_changed")["host_name"] == "Bob"
+    assert rooms.STORE.get(rid).names() == ["Bob"]
+
+
+# ------------ Rate limit tests ------------
+def test_join_brute_force_is_rate_limited(make_sios, monkeypatch):
+    # Setup
+    monkeypatch.setattr(rooms, "LIMITER", RateLimiter({"join_room": (0, 3)}, {}))
+    attacker = make_sios(1)[0]
+
+    # Act
+    for code in ("aaaaaa", "bbbbbb", "cccccc", "dddddd", "eeeeee"):
+        attacker.emit("join_room", {"room_id": code, "name": "Mallory"})
+    errors = [p["args"][0]["message"] for p in attacker.get_received()]
+
+    # Assert
+    assert errors == ["Room not found"] * 3 + ["Too many requests"] * 2
+
+
 # ------------ Helpers ------------
 def _get_packet(received, name: str):
     """Gets the first packet from received with specified name"""
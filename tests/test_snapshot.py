@@ -0,0 +1,122 @@
+from app.snapshot import MAGIC, SnapshotLog, delete_record, put_record
+from app.utilities import Draw, Participant, Room
+
+
+def _room(*names: str) -> Room:
+    room = Room(host=Participant(sid="s0", name=names[0]))
+    for i, name in enumerate(names[1:], 1):
+        room.add_member(Participant(sid=f"s{i}", name=name))
+    return room
+
+
+# ------------ Snapshot log tests ------------
+def test_roundtrip_keeps_room_state(tmp_path):
+    # Setup
+    log = SnapshotLog(str(tmp_path / "rooms.snapshot"))
+    room = _room("Alice", "Bob", "Zoë")
+    room.add_member(Participant(sid="s3", name="Dan", gen=room.new_gen()))
+    room.remove_member("s0")
+    room.promote_host()
+    room.revealed = True
+    room.draw = Draw(["Alice", "Bob", "Zoë"], [2, 0, 1])
+    room.exclusions = {"Bob": {"Zoë", "Dan"}}
+
+    # Act
+    log.append([put_record("abc", room)])
+    restored = log.load()["abc"]
+
+    # Assert: everything but the sids comes back
+    assert restored.names() == ["Bob", "Zoë", "Dan"]
+    assert [p.gen for p in restored.participants] == [0, 0, 1]
+    assert (restored.salt, restored.seats_issued) == (room.salt, 1)
+    assert restored.host.name == "Bob"
+    assert restored.version == room.version
+    assert restored.last_active == room.last_active
+    assert restored.revealed
+    assert restored.draw.names == ("Alice", "Bob", "Zoë")
+    assert restored.draw.giftees.tolist() == [2, 0, 1]
+    assert restored.exclusions == {"Bob": {"Zoë", "Dan"}}
+    assert all(p.sid is None for p in restored.participants)
+
+
+def test_later_records_win(tmp_path):
+    # Setup
+    log = SnapshotLog(str(tmp_path / "rooms.snapshot"))
+    room = _room("Alice")
+    log.append([put_record("abc", room), put_record("def", room)])
+    room.add_member(Participant(sid="s1", name="Bob"))
+
+    # Act
+    log.append([put_record("abc", room), delete_record("def")])
+    restored = log.load()
+
+    # Assert
+    assert list(restored) == ["abc"]
+    assert restored["abc"].names() == ["Alice", "Bob"]
+    assert restored["abc"].draw is None
+    assert log.records == 4
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    # Setup
+    path = tmp_path / "rooms.snapshot"
+    log = SnapshotLog(str(path))
+    log.append([put_record("abc", _room("Alice")), put_record("def", _room("Bob"))])
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])  # crash halfway through the last write
+
+    # Act
+    restored = log.load()
+    log.append([put_record("ghi", _room("Carol"))])
+
+    # Assert: the intact prefix survives and new records still land
+    assert list(restored) == ["abc"]
+    assert list(log.load()) == ["abc", "ghi"]
+
+
+def test_corrupt_record_stops_replay(tmp_path):
+    # Setup
+    path = tmp_path / "rooms.snapshot"
+    log = SnapshotLog(str(path))
+    log.append([put_record("abc", _room("Alice")), put_record("def", _room("Bob"))])
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+
+    # Act
+    path.write_bytes(bytes(data))
+
+    # Assert
+    assert list(log.load()) == ["abc"]
+
+
+def test_missing_or_foreign_file_loads_nothing(tmp_path):
+    # Setup
+    path = tmp_path / "rooms.snapshot"
+    log = SnapshotLog(str(path))
+
+    # Act
+    missing = log.load()
+    path.write_bytes(b"not a snapshot")
+
+    # Assert: the foreign file is kept aside rather than appended to
+    assert missing == {}
+    assert log.load() == {}
+    assert not path.exists()
+    assert (tmp_path / "rooms.snapshot.old").read_bytes() == b"not a snapshot"
+
+
+def test_compact_rewrites_live_rooms(tmp_path):
+    # Setup
+    path = tmp_path / "rooms.snapshot"
+    log = SnapshotLog(str(path))
+    room = _room("Alice")
+    log.append([put_record("abc", room)] * (SnapshotLog.COMPACT_RATIO * 256 + 1))
+    assert log.needs_compaction(live_rooms=1)
+
+    # Act
+    log.compact([put_record("abc", room)])
+
+    # Assert
+    assert not log.needs_compaction(live_rooms=1)
+    assert path.read_bytes() == MAGIC + put_record("abc", room)
+    assert not (tmp_path / "rooms.snapshot.tmp").exists()
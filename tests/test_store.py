@@ -0,0 +1,244 @@
+import threading
+import time
+
+import pytest
+
+from app.store import (
+    MemoryRoomStore,
+    ShardedRoomStore,
+    SqliteRoomStore,
+    create_store,
+    shard_of,
+    worker_for,
+)
+from app.utilities import Participant, Room, RoomCodeAllocator
+
+
+@pytest.fixture(params=["memory", "sharded", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sharded":
+        return create_store("memory", shards=4)
+    return create_store(request.param, str(tmp_path / "rooms.sqlite3"))
+
+
+# ------------ Store contract tests ------------
+def test_save_and_get_room(store):
+    # Setup
+    room = Room(host=Participant(sid="s1", name="Alice"))
+    room.add_member(Participant(sid="s2", name="Bob"))
+
+    # Act
+    store.save("abc", room)
+    loaded = store.get("abc")
+
+    # Assert
+    assert loaded is not None
+    assert loaded.host.name == "Alice"
+    assert [p.name for p in loaded.participants] == ["Alice", "Bob"]
+    assert "abc" in store
+    assert len(store) == 1
+
+
+def test_bind_and_unbind_sid(store):
+    # Act
+    store.bind("s1", "abc")
+    store.bind("s2", "abc")
+    store.unbind("s1")
+
+    # Assert
+    assert store.rid_for("s1") is None
+    assert store.rid_for("s2") == "abc"
+    assert store.sid_count() == 1
+
+
+def test_delete_and_clear(store):
+    # Setup
+    store.save("abc", Room(host=Participant(sid="s1", name="Alice")))
+    store.save("def", Room(host=Participant(sid="s2", name="Bob")))
+    store.bind("s1", "abc")
+
+    # Act
+    store.delete("abc")
+
+    # Assert
+    assert store.get("abc") is None
+    assert len(store) == 1
+
+    store.clear()
+    assert len(store) == 0
+    assert store.sid_count() == 0
+
+
+
+def test_insert_many_reports_taken_ids(store):
+    # Setup
+    store.save("abc", Room(host=Participant(sid="s1", name="Alice")))
+    batch = {rid: Room(host=Participant(sid=None, name="Host")) for rid in ("abc", "def", "ghi")}
+
+    # Act
+    taken = store.insert_many(batch)
+
+    # Assert: the live room is left alone
+    assert taken == ["abc"]
+    assert len(store) == 3
+    assert store.get("abc").host.name == "Alice"
+    assert store.get("def").host.name == "Host"
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path):
+    # Setup: two stores on one file stand in for two workers
+    path = str(tmp_path / "rooms.sqlite3")
+    worker_a, worker_b = SqliteRoomStore(path), SqliteRoomStore(path)
+
+    # Act
+    worker_a.save("abc", Room(host=Participant(sid="s1", name="Alice")))
+    worker_a.bind("s1", "abc")
+
+    # Assert
+    assert worker_b.get("abc").host.name == "Alice"
+    assert worker_b.rid_for("s1") == "abc"
+
+
+def test_sqlite_store_reuses_connections_across_threads(tmp_path):
+    # Setup: handlers run each event on a thread of its own
+    store = SqliteRoomStore(str(tmp_path / "rooms.sqlite3"))
+    store.insert("abc", Room(host=Participant(sid=None, name="Alice")))
+    opened = []
+    connect = store._connect
+    store._connect = lambda: opened.append(1) or connect()
+
+    def event():
+        with store.room_lock("abc"):
+            store.save("abc", store.get("abc"))
+        store.rid_for("s1")
+
+    # Act
+    for _ in range(50):
+        thread = threading.Thread(target=event)
+        thread.start()
+        thread.join()
+
+    # Assert: the pooled connection is reused, not one opened per thread
+    assert len(opened) == 0
+    assert store.get("abc").host.name == "Alice"
+
+
+def test_sqlite_store_reaps_only_dead_workers_sids(tmp_path):
+    # Setup
+    path = str(tmp_path / "rooms.sqlite3")
+    dead, alive, reaper = (SqliteRoomStore(path) for _ in range(3))
+    dead.bind("s1", "abc")
+    alive.bind("s2", "abc")
+    reaper.bind("s3", "abc")
+    dead._alive.close()  # what the process exiting does
+    dropped = []
+
+    def drop(sid):
+        dropped.append(sid)
+        reaper.unbind(sid)
+
+    # Act
+    reaped = reaper.reap(drop)
+
+    # Assert
+    assert reaped == 1
+    assert dropped == ["s1"]
+    assert reaper.rid_for("s1") is None
+    assert reaper.sid_count() == 2
+    assert reaper.reap(drop) == 0
+
+
+def test_sqlite_room_edits_from_two_workers_both_land(tmp_path):
+    # Setup: two stores on one file stand in for two workers
+    path = str(tmp_path / "rooms.sqlite3")
+    worker_a, worker_b = SqliteRoomStore(path), SqliteRoomStore(path)
+    worker_a.insert("abc", Room(host=Participant(sid="s0", name="Alice")))
+    a_has_read = threading.Event()
+
+    def join(store, sid, name, read=None):
+        with store.room_lock("abc"):
+            room = store.get("abc")
+            if read is not None:
+                read.set()
+                time.sleep(0.1)  # B would read the same version here
+            room.add_member(Participant(sid=sid, name=name))
+            store.save("abc", room)
+
+    # Act
+    a = threading.Thread(target=join, args=(worker_a, "s1", "Bob", a_has_read))
+    a.start()
+    a_has_read.wait()
+    join(worker_b, "s2", "Carol")
+    a.join()
+
+    # Assert: B waited for A's commit instead of overwriting it
+    assert worker_a.get("abc").names() == ["Alice", "Bob", "Carol"]
+
+
+def test_unknown_store_kind():
+    with pytest.raises(ValueError):
+        create_store("nope")
+
+
+def test_memory_store_hands_out_live_rooms():
+    store = MemoryRoomStore()
+    room = Room(host=Participant(sid="s1", name="Alice"))
+    store.save("abc", room)
+    assert store.get("abc") is room
+
+
+# ------------ Sharded store tests ------------
+def test_sharded_store_spreads_rooms_and_sids():
+    # Setup
+    store = ShardedRoomStore(shards=4)
+    allocator = RoomCodeAllocator(6)
+
+    # Act
+    for i in range(400):
+        rid = allocator.allocate(store)
+        store.insert(rid, Room(host=Participant(sid=f"s{i}", name="Alice")))
+        store.bind(f"s{i}", rid)
+    stats = store.stats()
+
+    # Assert: every shard holds its own share and locks are not shared
+    assert len(store) == 400 and store.sid_count() == 400
+    assert all(50 < shard["rooms"] < 150 for shard in stats)
+    assert sum(shard["sids"] for shard in stats) == 400
+    rid = next(iter(store.rooms))
+    assert store.room_lock(rid) is store.shards[shard_of(rid, 4)].room_lock(rid)
+
+
+def test_sharded_store_pins_shards_to_workers():
+    # Setup
+    workers = [ShardedRoomStore(shards=8, worker=w, workers=2) for w in range(2)]
+    allocator = RoomCodeAllocator(6)
+
+    # Act: each worker allocates only codes it owns
+    created = {
+        w: [allocator.allocate(store, store.owns) for _ in range(50)]
+        for w, store in enumerate(workers)
+    }
+    for w, rids in created.items():
+        for rid in rids:
+            assert workers[w].insert(rid, Room(host=Participant(sid=None, name="Alice")))
+
+    # Assert: routing by code finds the owner, the other worker has nothing
+    for w, rids in created.items():
+        for rid in rids:
+            assert worker_for(rid, 2, 8) == w
+            assert workers[1 - w].get(rid) is None
+            assert rid in workers[1 - w]  # taken, as far as allocation goes
+            assert not workers[1 - w].insert(rid, Room(host=Participant(sid=None, name="Bob")))
+
+
+def test_sharded_store_allocates_for_one_of_many_workers():
+    # Setup: this worker owns 1 of 16 shards of an empty store
+    store = ShardedRoomStore(shards=16, worker=3, workers=16)
+    allocator = RoomCodeAllocator(6)
+
+    # Act
+    codes = [allocator.allocate(store, store.owns) for _ in range(1_000)]
+
+    # Assert: other workers' codes neither fail nor count as collisions
+    assert all(store.owns(code) for code in codes)
+    assert allocator.collisions == 0
@@ -0,0 +1,102 @@
+from app.sweeper import AwaySeats, RoomSweeper
+from app.utilities import Participant, Room
+
+
+def _room(last_active: float, revealed: bool = False) -> Room:
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.last_active = last_active
+    room.revealed = revealed
+    return room
+
+
+# ------------ Sweeper tests ------------
+def test_sweep_only_visits_due_rooms():
+    # Setup
+    sweeper = RoomSweeper(ttl=100)
+    rooms = {f"r{i}": _room(last_active=i * 10) for i in range(10)}
+    for rid, room in rooms.items():
+        sweeper.track(rid, room)
+    visited = []
+
+    # Act: r0..r2 are due at t=125
+    due = sweeper.sweep(lambda rid, now: visited.append(rid), now=125)
+
+    # Assert
+    assert due == 3
+    assert visited == ["r0", "r1", "r2"]
+    assert len(sweeper) == 7
+
+
+def test_sweep_requeues_rooms_touched_since():
+    # Setup
+    sweeper = RoomSweeper(ttl=100)
+    room = _room(last_active=0)
+    sweeper.track("abc", room)
+    room.last_active = 50
+
+    # Act
+    due = sweeper.sweep(lambda rid, now: sweeper.deadline(room), now=120)
+
+    # Assert: pushed back to the new deadline instead of evicted
+    assert due == 1
+    assert len(sweeper) == 1
+    assert sweeper.sweep(lambda rid, now: None, now=149) == 0
+    assert sweeper.sweep(lambda rid, now: None, now=150) == 1
+
+
+def test_deadline_uses_finished_ttl_and_zero_disables():
+    sweeper = RoomSweeper(ttl=100, finished_ttl=10)
+
+    assert sweeper.deadline(_room(last_active=5)) == 105
+    assert sweeper.deadline(_room(last_active=5, revealed=True)) == 15
+    assert RoomSweeper().deadline(_room(last_active=5)) == float("inf")
+
+    sweeper = RoomSweeper()
+    sweeper.track("abc", _room(last_active=5))
+    assert len(sweeper) == 0
+
+
+# ------------ Away seat tests ------------
+def test_away_seats_release_in_deadline_order():
+    # Setup
+    away = AwaySeats(grace=10)
+    away.hold("abc", "Bob", now=0)
+    away.hold("abc", "Carol", now=5)
+
+    # Act
+    first = away.due(now=12)
+    second = away.due(now=20)
+
+    # Assert
+    assert first == [("abc", "Bob")]
+    assert second == [("abc", "Carol")]
+    assert len(away) == 0
+
+
+def test_away_seats_only_latest_hold_counts():
+    # Setup: Bob drops, comes back, and drops again
+    away = AwaySeats(grace=10)
+    away.hold("abc", "Bob", now=0)
+    away.hold("abc", "Bob", now=8)
+
+    # Act
+    stale = away.due(now=12)
+    latest = away.due(now=18)
+
+    # Assert
+    assert stale == []
+    assert latest == [("abc", "Bob")]
+
+
+def test_reclaimed_seats_stop_counting():
+    # Setup
+    away = AwaySeats(grace=10)
+    away.hold("abc", "Bob", now=0)
+    away.hold("abc", "Carol", now=0)
+
+    # Act
+    away.reclaimed("abc", "Bob")
+
+    # Assert
+    assert len(away) == 1
+    assert away.due(now=12) == [("abc", "Carol")]
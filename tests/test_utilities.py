@@ -0,0 +1,329 @@
+import json
+import random
+
+from collections import Counter
+from itertools import permutations
+
+import pytest
+
+from app.utilities import (
+    CODE_ALPHABET,
+    DERANGEMENT_MODES,
+    Draw,
+    Participant,
+    Room,
+    RoomCodeAllocator,
+    constrained_derangement,
+    derangement,
+)
+from tests.bench_memory import measure_room_memory
+
+
+# ------------ Room tests ------------
+def test_room_keeps_join_order():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+
+    # Act
+    for i in range(1, 5):
+        room.add_member(Participant(sid=f"s{i}", name=str(i)))
+    room.remove_member("s2")
+
+    # Assert
+    assert room.names() == ["Alice", "1", "3", "4"]
+    assert [p.sid for p in room.participants] == ["s0", "s1", "s3", "s4"]
+    assert len(room) == 4
+
+
+def test_room_rejects_duplicate_name_and_sid():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+
+    # Act / Assert
+    assert not room.add_member(Participant(sid="s1", name="Alice"))
+    assert not room.add_member(Participant(sid="s0", name="Bob"))
+    assert room.add_member(Participant(sid="s1", name="Bob"))
+    assert room.has_name("Bob")
+    assert room.get("s1").name == "Bob"
+
+
+def test_room_name_is_free_after_leave():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.add_member(Participant(sid="s1", name="Bob"))
+
+    # Act
+    removed = room.remove_member("s1")
+
+    # Assert
+    assert removed.name == "Bob"
+    assert not room.has_name("Bob")
+    assert room.remove_member("s1") is None
+    assert room.add_member(Participant(sid="s2", name="Bob"))
+
+
+def test_room_promotes_earliest_member():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.add_member(Participant(sid="s1", name="Bob"))
+    room.add_member(Participant(sid="s2", name="Carol"))
+
+    # Act
+    room.remove_member("s0")
+    new_host = room.promote_host()
+
+    # Assert
+    assert new_host.name == "Bob"
+    assert room.host is new_host
+
+    room.remove_member("s1")
+    room.remove_member("s2")
+    assert room.promote_host() is None
+
+
+def test_room_promotion_skips_away_seats():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.add_member(Participant(sid="s1", name="Bob"))
+    room.add_member(Participant(sid="s2", name="Carol"))
+    room.rebind("Bob", None)
+
+    # Act
+    room.remove_seat("Alice")
+    new_host = room.promote_host()
+
+    # Assert: Carol is connected, so she wins over Bob
+    assert new_host.name == "Carol"
+
+    room.remove_seat("Carol")
+    assert room.promote_host().name == "Bob"
+
+
+# ------------ Participant tests ------------
+def test_models_are_slotted_and_participant_frozen():
+    p = Participant(sid="s0", name="Alice")
+
+    assert not hasattr(p, "__dict__")
+    assert not hasattr(Room(host=p), "__dict__")
+    with pytest.raises(AttributeError):
+        p.name = "Bob"
+
+
+def test_participant_names_are_interned():
+    a = Participant(sid="s0", name="".join(["Ali", "ce"]))
+    b = Participant(sid="s1", name="".join(["Al", "ice"]))
+
+    assert a.name is b.name
+
+
+def test_room_payload_is_cached_per_version():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.add_member(Participant(sid="s1", name="Bob"))
+
+    # Act
+    first = room.payload("ABC123")
+    again = room.payload("ABC123")
+    room.rebind("Bob", None)
+    away = room.payload("ABC123")
+    room.remove_member("s0")
+    room.promote_host()
+    changed = room.payload("ABC123")
+
+    # Assert: seats moving sid reuse it, membership and host changes do not
+    assert first is again is away
+    assert first.json == json.dumps(dict(first), separators=(",", ":"))
+    assert changed is not first
+    assert changed == {
+        "room_id": "ABC123",
+        "participants": ["Bob"],
+        "host_name": "Bob",
+        "version": room.version,
+    }
+    assert json.loads(changed.json) == changed
+
+
+def test_draw_survives_membership_changes():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    for i, name in enumerate(["Bob", "Carol"], 1):
+        room.add_member(Participant(sid=f"s{i}", name=name))
+    room.draw = Draw(room.names(), [1, 2, 0])
+
+    # Act
+    room.remove_member("s1")
+    room.add_member(Participant(sid="s3", name="Dan"))
+    restored = Room.from_dict(room.to_dict())
+
+    # Assert: positions are the draw's own, not the room's
+    for draw in (room.draw, restored.draw):
+        assert [draw.giftee_of(n) for n in ("Alice", "Bob", "Carol")] == ["Bob", "Carol", "Alice"]
+        assert draw.giftee_of("Dan") is None
+    with pytest.raises(ValueError):
+        Draw(["Alice", "Bob"], [1])
+
+
+def test_room_memory_budget():
+    # ~700 B per host-only room, ~145 B per extra seat with varied names;
+    # seat tokens are derived, not stored
+    result = measure_room_memory(1_000)
+
+    assert result["bytes_per_room"] < 800, result
+    assert result["bytes_per_seat"] < 180, result
+
+
+# ------------ Room code tests ------------
+def test_allocator_codes_use_alphabet_and_length():
+    allocator = RoomCodeAllocator(8)
+
+    codes = [allocator.allocate() for _ in range(1_000)]
+
+    assert all(len(c) == 8 for c in codes)
+    assert set("".join(codes)) <= set(CODE_ALPHABET)
+
+
+def test_allocator_skips_taken_codes():
+    # Setup: two-letter alphabet, one code left
+    allocator = RoomCodeAllocator(1, alphabet="ab")
+
+    # Act
+    code = allocator.allocate({"a"})
+
+    # Assert
+    assert code == "b"
+
+
+def test_allocator_reports_exhaustion_and_occupancy():
+    allocator = RoomCodeAllocator(1, alphabet="ab")
+
+    with pytest.raises(RuntimeError):
+        allocator.allocate({"a", "b"})
+    assert allocator.collisions == RoomCodeAllocator.MAX_ATTEMPTS
+    assert allocator.occupancy(1) == 0.5
+
+
+def test_allocator_redraws_foreign_codes_for_free():
+    # Setup: "a" belongs to another worker
+    allocator = RoomCodeAllocator(1, alphabet="ab")
+
+    def owns(code):
+        return code != "a"
+
+    # Act
+    codes = {allocator.allocate(owns=owns) for _ in range(50)}
+    with pytest.raises(RuntimeError):
+        allocator.allocate({"b"}, owns=owns)
+
+    # Assert: only the taken code counts against the attempts
+    assert codes == {"b"}
+    assert allocator.collisions == RoomCodeAllocator.MAX_ATTEMPTS
+
+
+def test_allocator_is_not_biased():
+    # 62 symbols: a plain byte % 62 would favor the first 8 by ~25%
+    allocator = RoomCodeAllocator(1)
+
+    counts = Counter(allocator.allocate() for _ in range(62_000))
+
+    assert max(counts.values()) < 1_300
+    assert min(counts.values()) > 700
+
+
+# ------------ Derangement tests ------------
+@pytest.mark.parametrize("use_numpy", [False, True])
+@pytest.mark.parametrize("mode", DERANGEMENT_MODES)
+def test_derangement_has_no_fixed_points(mode, use_numpy):
+    for n in (2, 3, 10, 500):
+        giftees = derangement(n, mode, use_numpy)
+
+        assert sorted(giftees) == list(range(n))
+        assert all(g != i for i, g in enumerate(giftees))
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_cycle_mode_is_a_single_cycle(use_numpy):
+    giftees = derangement(50, "cycle", use_numpy)
+
+    seen, i = set(), 0
+    while i not in seen:
+        seen.add(i)
+        i = giftees[i]
+    assert len(seen) == 50
+
+
+def test_uniform_mode_reaches_every_derangement():
+    # n=4 has 9 derangements but only 6 single cycles
+    seen = {tuple(derangement(4, "uniform")) for _ in range(2_000)}
+
+    assert len(seen) == 9
+
+
+def test_derangement_rejects_bad_input():
+    with pytest.raises(ValueError):
+        derangement(1)
+    with pytest.raises(ValueError):
+        derangement(5, "nope")
+
+
+# ------------ Constrained assignment tests ------------
+def _is_valid(giftees, excluded):
+    n = len(giftees)
+    return (
+        sorted(giftees) == list(range(n))
+        and all(g != i for i, g in enumerate(giftees))
+        and all(giftees[g] not in rs for g, rs in excluded.items())
+    )
+
+
+def test_constrained_derangement_respects_exclusions():
+    # Setup: 0 -> 1 excluded forces the cycle 0 -> 2 -> 1 -> 0
+    excluded = {0: {1}}
+
+    # Act / Assert
+    for _ in range(20):
+        assert constrained_derangement(3, excluded) == [2, 0, 1]
+
+
+def test_constrained_derangement_infeasible():
+    assert constrained_derangement(2, {0: {1}}) is None
+    assert constrained_derangement(4, {0: {1, 2, 3}}) is None
+
+
+def test_constrained_derangement_dense_exclusions():
+    # Setup: every giver excludes ~80% of the room
+    rng = random.Random(1)
+    n = 300
+    excluded = {g: set(rng.sample(range(n), int(n * 0.8))) for g in range(n)}
+
+    # Act
+    giftees = constrained_derangement(n, excluded)
+
+    # Assert
+    assert giftees is not None
+    assert _is_valid(giftees, excluded)
+
+
+def test_constrained_derangement_matches_brute_force():
+    rng = random.Random(2)
+    for _ in range(300):
+        n = rng.randint(2, 6)
+        excluded = {g: set(rng.sample(range(n), rng.randint(0, n - 1))) for g in range(n)}
+        feasible = any(_is_valid(list(p), excluded) for p in permutations(range(n)))
+
+        giftees = constrained_derangement(n, excluded)
+
+        assert (giftees is not None) == feasible
+        assert giftees is None or _is_valid(giftees, excluded)
+
+
+def test_room_exclusions_follow_participant_positions():
+    # Setup
+    room = Room(host=Participant(sid="s0", name="Alice"))
+    room.add_member(Participant(sid="s1", name="Bob"))
+    room.exclusions = {"Bob": {"Alice", "Zed"}, "Zed": {"Bob"}}
+
+    # Act
+    excluded = room.excluded_indexes(list(room.participants))
+
+    # Assert: unknown names are ignored
+    assert excluded == {1: {0}}